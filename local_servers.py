@@ -4,428 +4,203 @@ LocalServers - Menubar app to monitor local servers and tunnels
 """
 
 import rumps
+from Foundation import NSObject, NSRunLoop, NSRunLoopCommonModes
+import shlex
 import subprocess
-import re
-import json
+import threading
+import time
 import os
-from pathlib import Path
+
+# Only what drawing the first menu needs: detection, the supervisor and the API
+# are imported by start_detection once the icon is up
+from localservers import lastknown
+from localservers.paths import API_SOCKET, CONFIG_FILE, DISCOVERY_CACHE, HISTORY_FILE, SNAPSHOT_CACHE
+from localservers.prefs import PreferencesStore, category_shown
+from localservers.viewmodel import (
+    Group, bulk_summary, container_rows, diff_rows, history_lines, matches, page, section_layout, server_rows, tunnel_rows
+)
+
+# Projects listed by name in the Discover dialog; the rest are counted
+DISCOVERY_LISTED = 25
+
+# Map categories to display names
+CATEGORY_NAMES = {
+    'deno': 'Deno',
+    'bun': 'Bun',
+    'nextjs': 'Next.js',
+    'nuxt': 'Nuxt',
+    'vite': 'Vite',
+    'astro': 'Astro',
+    'node': 'Node.js',
+    'django': 'Django',
+    'flask': 'Flask',
+    'python': 'Python',
+    'laravel': 'Laravel',
+    'php': 'PHP',
+    'ruby': 'Ruby',
+    'rust': 'Rust',
+    'go': 'Go',
+    'java': 'Java',
+    'electron': 'Electron',
+    'other': 'Other'
+}
+
+
+class MenuOpenObserver(NSObject):
+    """NSMenu delegate that calls back when the menubar menu is opened"""
+
+    def menuWillOpen_(self, menu):
+        self.callback()
+
 
 class LocalServersApp(rumps.App):
     def __init__(self):
         super(LocalServersApp, self).__init__("🌐", quit_button=None)
 
-        # Config file
-        self.config_file = os.path.expanduser("~/.localservers.json")
-        self.load_preferences()
-
-        # Managed servers
-        self.managed_servers = self.prefs.get('managed_servers', {})
-
-        self.menu = ["Refresh", "---"]
-        self.timer = rumps.Timer(self.update_menu, 5)
-        self.timer.start()
+        # Config file, saved behind a debounce and reloaded when edited by hand
+        self.config_file = CONFIG_FILE
+        self.store = PreferencesStore(self.config_file)
+        self.prefs = self.store.prefs
+
+        # Detector, collector, actions and API; set up by start_detection just after launch
+        self.detector = None
+        self.collector = None
+        self.actions = None
+        self.api = None
+        self.history = None
+        self.process_table = None
+        self.last_known_saved = False
+
+        # Bulk "Discover Projects…"; created on first use
+        self.scanner = None
+
+        self.build_menu()
+
+        # Detection runs on a background thread, each source on its own adaptive interval;
+        # the UI timer only renders the snapshots (and changed sections) handed over by on_snapshot
+        self.render_lock = threading.Lock()
+        self.pending_sections = set()
+        self.pending_notifications = []   # posted by the UI timer: AppKit is main-thread only
+        self.rendered_generation = 0
+        self.rendered_snapshot = None
+        self.menu_filter = ""
+        self.rendered_health = None
+        self.rendered_resources = None
+
+        # Draw what the last run saw (every section marked stale) before anything is detected
+        self.pending_snapshot = lastknown.load(SNAPSHOT_CACHE)
+        if self.store.read_only:
+            self.notify("Preferences Not Saved", f"{self.config_file} is from a newer version",
+                        "Changes apply until you quit; the file is left as it is")
         self.update_menu(None)
 
-    def load_preferences(self):
-        """Load user preferences from config file"""
-        defaults = {
-            'show_categories': {},  # Dynamic: category -> bool
-            'managed_servers': {}    # port -> {dir, command, name}
-        }
-
-        if os.path.exists(self.config_file):
-            try:
-                with open(self.config_file, 'r') as f:
-                    self.prefs = {**defaults, **json.load(f)}
-            except:
-                self.prefs = defaults
-        else:
-            self.prefs = defaults
-
-    def save_preferences(self):
-        """Save preferences to config file"""
-        self.prefs['managed_servers'] = self.managed_servers
-        with open(self.config_file, 'w') as f:
-            json.dump(self.prefs, f, indent=2)
-
-    def detect_servers(self):
-        """Detect local servers using lsof"""
-        servers = []
-        categories_found = set()
-
-        try:
-            result = subprocess.run(
-                ['lsof', '-iTCP', '-sTCP:LISTEN', '-nP'],
-                capture_output=True,
-                text=True,
-                timeout=3
-            )
-
-            ports = {}
-            for line in result.stdout.split('\n')[1:]:
-                if not line.strip():
-                    continue
-
-                parts = line.split()
-                if len(parts) < 9:
-                    continue
-
-                command = parts[0]
-                pid = parts[1]
-                address = parts[8]
-
-                port_match = re.search(r':(\d+)$', address)
-                if port_match:
-                    port = int(port_match.group(1))
-
-                    # Skip system ports
-                    if port < 1000:
-                        continue
-
-                    if port not in ports:
-                        server_type, category = self.identify_server_type(command, port)
-                        categories_found.add(category)
-
-                        # Check if should show based on category filter
-                        if not self.should_show_category(category):
-                            continue
-
-                        # Check if it's a managed server
-                        is_managed = str(port) in self.managed_servers
-
-                        # Detect if running from launchd/plist vs terminal
-                        is_service = self.is_launchd_service(pid)
-
-                        ports[port] = {
-                            'port': port,
-                            'type': server_type,
-                            'category': category,
-                            'command': command,
-                            'pid': pid,
-                            'managed': is_managed,
-                            'is_service': is_service
-                        }
-
-            servers = sorted(ports.values(), key=lambda x: x['port'])
-
-        except Exception as e:
-            pass
-
-        return servers, categories_found
-
-    def is_launchd_service(self, pid):
-        """Check if process is running from launchd (plist service)"""
-        try:
-            current_pid = str(pid)
-            max_depth = 20  # Avoid infinite loops
-
-            for _ in range(max_depth):
-                # Get parent process ID
-                result = subprocess.run(
-                    ['ps', '-o', 'ppid=', '-p', current_pid],
-                    capture_output=True,
-                    text=True,
-                    timeout=1
-                )
-
-                ppid = result.stdout.strip()
-                if not ppid or ppid == '0':
-                    return False
-
-                # Found launchd!
-                if ppid == '1':
-                    return True
-
-                # Check if parent command contains launchd
-                parent_result = subprocess.run(
-                    ['ps', '-o', 'comm=', '-p', ppid],
-                    capture_output=True,
-                    text=True,
-                    timeout=1
-                )
-
-                parent_comm = parent_result.stdout.strip().lower()
-                if 'launchd' in parent_comm:
-                    return True
-
-                # Move up the chain
-                current_pid = ppid
-
-            # Additional check: look for LaunchAgent or LaunchDaemon in process environment
-            env_result = subprocess.run(
-                ['ps', 'eww', '-p', str(pid)],
-                capture_output=True,
-                text=True,
-                timeout=1
-            )
-
-            if 'LaunchAgent' in env_result.stdout or 'LaunchDaemon' in env_result.stdout:
-                return True
-
-        except:
-            pass
-
-        return False
-
-    def identify_server_type(self, command, port):
-        """Identify server type and category"""
-        command_lower = command.lower()
+        self.timer = rumps.Timer(self.update_menu, 1)
+        self.timer.start()
 
-        # Deno
-        if 'deno' in command_lower:
-            return ('Deno', 'deno')
+        # Keep rendering while the menu is open (menu tracking runs outside the default run loop mode)
+        NSRunLoop.currentRunLoop().addTimer_forMode_(self.timer._nstimer, NSRunLoopCommonModes)
 
-        # Bun
-        elif 'bun' in command_lower:
-            return ('Bun', 'bun')
+        # Refresh everything the moment the menu is opened
+        self.menu_observer = MenuOpenObserver.alloc().init()
+        self.menu_observer.callback = self.menu_opened
+        self._menu._menu.setDelegate_(self.menu_observer)
 
-        # Next.js (common dev ports)
-        elif 'node' in command_lower:
-            if port in [3000, 3001]:
-                return ('Next.js', 'nextjs')
-            else:
-                return ('Node.js', 'node')
-
-        # Python - Django/Flask
-        elif 'python' in command_lower:
-            if port == 8000:
-                return ('Django', 'django')
-            elif port == 5000:
-                return ('Flask', 'flask')
-            else:
-                return ('Python', 'python')
+        # Fires once the run loop is running, so the icon never waits on detection's imports
+        self.startup_timer = rumps.Timer(self.start_detection, 0.05)
+        self.startup_timer.start()
 
-        # PHP
-        elif 'php' in command_lower:
-            if port == 8000 or 'artisan' in command_lower:
-                return ('Laravel', 'laravel')
-            else:
-                return ('PHP', 'php')
+    def start_detection(self, timer):
+        """Import and start detection, the actions and the API (once)"""
+        timer.stop()
+        if self.collector is not None:
+            return
 
-        # Ruby/Rails
-        elif 'ruby' in command_lower or 'rails' in command_lower:
-            return ('Ruby', 'ruby')
+        from localservers.actions import ServerActions
+        from localservers.core import Detector
+        from localservers.history import History
 
-        # Rust
-        elif 'cargo' in command_lower or 'rust' in command_lower:
-            return ('Rust', 'rust')
+        # Detectors live in the UI-independent core (shared with `python -m localservers`)
+        self.detector = Detector(self.prefs)
+        self.store.metrics = self.detector.metrics
+        collector = self.detector.collector()
+        collector.subscribe(self.on_snapshot)
+        collector.subscribe(self.save_last_known)
 
-        # Go
-        elif command_lower.startswith('go'):
-            return ('Go', 'go')
+        # Up/down intervals kept across runs, for "what was on this port" and uptime
+        self.history = History(HISTORY_FILE, **self.prefs.get('history', {})).start()
+        collector.subscribe(self.history.record)
 
-        # Electron
-        elif 'electron' in command_lower:
-            return ('Electron', 'electron')
+        # Start/Stop/Restart, shared with the local query API
+        self.actions = ServerActions(self.prefs, collector, on_event=self.server_event)
+        collector.subscribe(self.on_server_down, kinds=('server_down',))
 
-        # Java
-        elif 'java' in command_lower:
-            return ('Java', 'java')
+        self.collector = collector
+        collector.start()
+        self.api = self.start_api()
 
-        # Others
-        else:
-            return (command[:20], 'other')
+    def ensure_detection(self):
+        """Start detection now if a handler needs it before the startup timer has fired"""
+        if self.collector is None:
+            self.start_detection(self.startup_timer)
 
-    def should_show_category(self, category):
-        """Check if category should be shown (defaults to True for all)"""
-        return self.prefs.get('show_categories', {}).get(category, True)
+    @property
+    def managed_servers(self):
+        # Looked up each time: a reload replaces it
+        return self.prefs.setdefault('managed_servers', {})
 
-    def detect_tunnels(self):
-        """Detect active tunnels with proper hostname and port mapping"""
-        tunnels = {}
+    def save_preferences(self):
+        """Save preferences to config file (written shortly after, once per burst of changes)"""
+        self.store.save()
 
+    def quit(self, _):
+        """Write pending preferences and history before quitting"""
         try:
-            result = subprocess.run(
-                ['ps', 'aux'],
-                capture_output=True,
-                text=True,
-                timeout=3
-            )
-
-            for line in result.stdout.split('\n'):
-                # Cloudflare tunnels
-                if 'cloudflared tunnel' in line and 'run' in line:
-                    tunnel_name_match = re.search(r'run\s+(\S+)', line)
-                    tunnel_id_or_name = tunnel_name_match.group(1) if tunnel_name_match else None
-
-                    # Find config file
-                    config_match = re.search(r'--config\s+(\S+)', line)
-                    config_paths = []
-
-                    if config_match:
-                        config_paths.append(os.path.expanduser(config_match.group(1)))
-                    else:
-                        config_paths.append(os.path.expanduser('~/.cloudflared/config.yml'))
-
-                    for config_path in config_paths:
-                        if not os.path.exists(config_path):
-                            continue
-
-                        try:
-                            with open(config_path, 'r') as f:
-                                config_content = f.read()
-
-                                ingress_pattern = r'- hostname:\s*(\S+)\s+service:\s*http://(?:localhost|127\.0\.0\.1):(\d+)'
-                                ingress_matches = re.findall(ingress_pattern, config_content)
-
-                                for hostname, port in ingress_matches:
-                                    if 'http_status' in hostname:
-                                        continue
-
-                                    tunnels[hostname] = {
-                                        'type': 'Cloudflare',
-                                        'hostname': hostname,
-                                        'port': port,
-                                        'display': f"{hostname} → :{port}"
-                                    }
-                        except:
-                            pass
-
-                # Tailscale funnel - generic detection
-                elif 'tailscale' in line and 'funnel' in line:
-                    port_match = re.search(r'funnel\s+(\d+)', line)
-                    port = port_match.group(1) if port_match else 'unknown'
-
-                    # Try to get actual Tailscale hostname
-                    try:
-                        ts_status = subprocess.run(
-                            ['tailscale', 'status', '--json'],
-                            capture_output=True,
-                            text=True,
-                            timeout=2
-                        )
-                        if ts_status.returncode == 0:
-                            ts_data = json.loads(ts_status.stdout)
-                            hostname = ts_data.get('Self', {}).get('DNSName', '').rstrip('.')
-                        else:
-                            hostname = 'tailscale-device'
-                    except:
-                        hostname = 'tailscale-device'
-
-                    key = f'tailscale-{port}'
-                    if key not in tunnels:
-                        tunnels[key] = {
-                            'type': 'Tailscale Funnel',
-                            'hostname': hostname,
-                            'port': port,
-                            'display': f"{hostname}:{port}"
-                        }
-
-        except Exception as e:
-            pass
-
-        return list(tunnels.values())
-
-    def detect_docker_containers(self):
-        """Detect running Docker containers with exposed ports"""
-        containers = []
+            self.store.flush()
+        except OSError as e:
+            rumps.alert("Could Not Save Preferences", f"{self.config_file}: {e}")
+        if self.history is not None:
+            self.history.close()
+        rumps.quit_application()
+
+    def start_api(self):
+        """Serve the latest snapshot to other local tools (disable with "api_socket": null)"""
+        from localservers.api import QueryServer
+
+        socket_path = self.prefs.get('api_socket', API_SOCKET)
+        port = self.prefs.get('api_port')
+        if socket_path is None and port is None:
+            return None
 
         try:
-            result = subprocess.run(
-                ['docker', 'ps', '--format', '{{.ID}}|{{.Names}}|{{.Ports}}|{{.Image}}'],
-                capture_output=True,
-                text=True,
-                timeout=3
-            )
-
-            if result.returncode != 0:
-                return containers
-
-            for line in result.stdout.strip().split('\n'):
-                if not line:
-                    continue
-
-                parts = line.split('|')
-                if len(parts) < 4:
-                    continue
-
-                container_id = parts[0][:12]
-                name = parts[1]
-                ports_str = parts[2]
-                image = parts[3]
-
-                # Parse ports
-                port_mappings = []
-                if ports_str:
-                    # Example: 0.0.0.0:3000->3000/tcp, 0.0.0.0:8080->80/tcp
-                    port_matches = re.findall(r'0\.0\.0\.0:(\d+)->(\d+)', ports_str)
-                    for host_port, container_port in port_matches:
-                        port_mappings.append({
-                            'host': host_port,
-                            'container': container_port
-                        })
-
-                if port_mappings:
-                    for mapping in port_mappings:
-                        containers.append({
-                            'name': name,
-                            'image': image.split(':')[0],  # Remove tag
-                            'host_port': mapping['host'],
-                            'container_port': mapping['container'],
-                            'id': container_id
-                        })
-
-        except FileNotFoundError:
-            # Docker not installed
-            pass
-        except Exception as e:
-            pass
-
-        return containers
-
-    def detect_project_type(self, directory):
-        """Auto-detect project type and suggest start command"""
-        directory = Path(directory)
-
-        # Node.js / Next.js
-        if (directory / 'package.json').exists():
-            try:
-                with open(directory / 'package.json', 'r') as f:
-                    package = json.load(f)
-
-                    # Next.js
-                    if 'next' in package.get('dependencies', {}) or 'next' in package.get('devDependencies', {}):
-                        return ('Next.js', 'npm run dev')
-
-                    # Generic Node
-                    scripts = package.get('scripts', {})
-                    if 'dev' in scripts:
-                        return ('Node.js', 'npm run dev')
-                    elif 'start' in scripts:
-                        return ('Node.js', 'npm start')
-            except:
-                pass
-            return ('Node.js', 'npm start')
-
-        # Python
-        if (directory / 'requirements.txt').exists() or (directory / 'pyproject.toml').exists():
-            if (directory / 'manage.py').exists():
-                return ('Django', 'python manage.py runserver')
-            elif (directory / 'app.py').exists():
-                return ('Flask', 'python app.py')
-            return ('Python', 'python main.py')
-
-        # Rust
-        if (directory / 'Cargo.toml').exists():
-            return ('Rust', 'cargo run')
-
-        # Go
-        if (directory / 'go.mod').exists():
-            return ('Go', 'go run .')
-
-        # Ruby
-        if (directory / 'Gemfile').exists():
-            return ('Ruby/Rails', 'rails server')
-
-        return (None, None)
+            return QueryServer(self.collector, self.actions, socket_path=socket_path, port=port).start()
+        except OSError:
+            # Socket or port already taken (e.g. a second instance)
+            return None
+
+    def menu_opened(self):
+        """Poll every source now and show whatever is already finished"""
+        if self.store.reload_if_changed():
+            # Category filters may have been edited in the file
+            self.render_again(('servers',))
+        if self.collector is None:
+            # Opened during the first moments after launch; the last-known snapshot is showing
+            return
+        self.collector.refresh()
+        self.update_menu(None)
+        self.render_diagnostics()
 
     @rumps.clicked("Refresh")
     def refresh(self, _):
         """Manual refresh"""
-        self.update_menu(None)
+        if self.collector is not None:
+            self.collector.refresh()
 
     def add_server_dialog(self, _):
         """Show dialog to add a new server"""
+        from localservers.core import detect_project_type
+
+        self.ensure_detection()
+
         # Use AppleScript to show folder picker
         try:
             result = subprocess.run(
@@ -446,7 +221,7 @@ class LocalServersApp(rumps.App):
                 return
 
             # Detect project type
-            project_type, suggested_command = self.detect_project_type(directory)
+            project_type, suggested_command = detect_project_type(directory)
 
             if not project_type:
                 rumps.alert("Unknown Project", "Could not detect project type. Add manually via terminal.")
@@ -472,7 +247,7 @@ class LocalServersApp(rumps.App):
                     'directory': directory,
                     'command': suggested_command,
                     'type': project_type,
-                    'name': Path(directory).name
+                    'name': os.path.basename(os.path.normpath(directory))
                 }
                 self.save_preferences()
 
@@ -480,62 +255,185 @@ class LocalServersApp(rumps.App):
                 self.start_server(port)
 
                 rumps.alert("Server Added", f"{project_type} on port {port}\nStarting...")
-                self.update_menu(None)
+                self.collector.refresh()
 
         except Exception as e:
             rumps.alert("Error", f"Could not add server: {str(e)}")
 
+    def discover_projects_dialog(self, _):
+        """Scan a folder of repos and add the chosen projects as managed servers, each on a free port"""
+        from localservers.discovery import ProjectScanner, listening_ports, register, select
+
+        self.ensure_detection()
+
+        result = subprocess.run(
+            ['osascript', '-e', 'POSIX path of (choose folder with prompt "Select a folder of projects:")'],
+            capture_output=True,
+            text=True,
+            timeout=60
+        )
+        if result.returncode != 0:
+            # User cancelled
+            return
+
+        if self.scanner is None:
+            # Remembers what it saw, so rescans are cheap
+            self.scanner = ProjectScanner(DISCOVERY_CACHE)
+        projects = self.scanner.scan(result.stdout.strip())
+        managed = {os.path.normpath(server.get('directory', '')) for server in self.managed_servers.values()}
+        projects = [project for project in projects if project['directory'] not in managed]
+        if not projects:
+            rumps.alert("No New Projects", "Everything runnable in that folder is already managed.")
+            return
+
+        listing = [f"{i}. {project['name']} ({project['type']})" for i, project in enumerate(projects[:DISCOVERY_LISTED], 1)]
+        if len(projects) > DISCOVERY_LISTED:
+            listing.append(f"… and {len(projects) - DISCOVERY_LISTED} more")
+        response = rumps.Window(
+            message="\n".join(listing) + "\n\nAdd which? (\"all\", or numbers like 1,3,5-8)",
+            title=f"Found {len(projects)} Projects",
+            default_text="all",
+            ok="Add",
+            cancel="Cancel",
+            dimensions=(320, 24)
+        ).run()
+        if not response.clicked:
+            return
+
+        listening = listening_ports(self.collector.latest() or self.rendered_snapshot)
+        added = register(self.managed_servers, select(projects, response.text), listening)
+        if added:
+            self.save_preferences()
+            self.collector.refresh()
+        rumps.notification("Projects Added", f"{len(added)} managed servers", ", ".join(
+            f"{server['name']} :{port}" for port, server in list(added.items())[:5]
+        ))
+
+    def notify(self, title, subtitle, message):
+        """Any thread: queue a notification for the UI timer to post"""
+        with self.render_lock:
+            self.pending_notifications.append((title, subtitle, message))
+
     def start_server(self, port):
         """Start a managed server"""
-        if port not in self.managed_servers:
-            return
+        self.actions.start(port)
+
+    def on_snapshot(self, events, snapshot):
+        """Collector thread: hand the snapshot, and which sections its events touched, to the UI timer"""
+        with self.render_lock:
+            self.pending_snapshot = snapshot
+            self.pending_sections.update(event.section for event in events)
+
+    def save_last_known(self, events, snapshot):
+        """Collector thread: keep the on-disk snapshot in step (rewritten only when records change)"""
+        if events or not self.last_known_saved:
+            lastknown.save(snapshot, SNAPSHOT_CACHE)
+            self.last_known_saved = True
+
+    def on_server_down(self, events, snapshot):
+        """Tell the user when a managed server they started elsewhere stops listening"""
+        for event in events:
+            port = event.key
+            if not category_shown(self.prefs, event.old.category):
+                # The user hid this category from the menu, so keep quiet about it too
+                continue
+            # Supervised servers report their own crashes, and Stop notifies on its own
+            if self.actions.recently_stopped(port):
+                continue
+            if self.actions.managed(port) and self.actions.supervisor.status(port) is None:
+                self.notify("Server Down", f"{event.old.type} on port {port} stopped listening", "")
+
+    def server_event(self, port, event):
+        """Tell the user when a supervised server crashes (it is restarted with backoff) or can't be started"""
+        if event == 'crashed':
+            self.notify("Server Crashed", f"Server on port {port} exited, restarting", "")
+        elif event == 'failed':
+            self.notify("Server Failed to Start", f"Server on port {port} could not be started", "See Show Logs for why")
+
+    def bulk_action(self, action, category=None, group=None):
+        """Stop or restart every matching server at once, off the UI thread, with one summary notification"""
+        self.ensure_detection()
+        ports = self.actions.ports_matching(category, group)
+
+        def run():
+            if action == 'stop':
+                results = self.actions.stop_many(ports)
+            else:
+                results = self.actions.restart_many(ports)
+            self.notify(*bulk_summary(action, results))
 
-        server = self.managed_servers[port]
-        directory = server['directory']
-        command = server['command']
-
-        # Start in background
-        subprocess.Popen(
-            command,
-            shell=True,
-            cwd=directory,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
+        threading.Thread(target=run, daemon=True).start()
 
     def stop_server(self, sender):
-        """Stop a server by killing its PID"""
+        """Stop a server (SIGTERM, then SIGKILL after a grace period) off the UI thread"""
+        self.ensure_detection()
         port = sender._port
         pid = sender._pid
 
-        try:
-            subprocess.run(['kill', str(pid)])
-            rumps.notification("Server Stopped", f"Stopped server on port {port}", "")
-            self.update_menu(None)
-        except:
-            rumps.alert("Error", "Could not stop server")
+        def stop():
+            try:
+                self.actions.stop(port, pid)
+                self.notify("Server Stopped", f"Stopped server on port {port}", "")
+            except Exception:
+                self.notify("Error", f"Could not stop server on port {port}", "")
+
+        threading.Thread(target=stop, daemon=True).start()
 
     def restart_server(self, sender):
-        """Restart a server"""
+        """Restart a server off the UI thread; notifies once it accepts connections again"""
+        self.ensure_detection()
         port = sender._port
         pid = sender._pid
 
-        # Stop
-        try:
-            subprocess.run(['kill', str(pid)])
-        except:
-            pass
-
-        # Wait a bit
-        import time
-        time.sleep(1)
-
-        # Start if managed
-        if str(port) in self.managed_servers:
-            self.start_server(str(port))
-            rumps.notification("Server Restarted", f"Restarted server on port {port}", "")
-
-        self.update_menu(None)
+        def restart():
+            # Start again if managed
+            if self.actions.restart(port, pid):
+                self.notify("Server Restarted", f"Server on port {port} is ready", "")
+            elif self.actions.managed(port):
+                self.notify("Restart Failed", f"Server on port {port} did not become ready", "")
+
+        threading.Thread(target=restart, daemon=True).start()
+
+    def show_logs(self, port):
+        """Last lines of a managed server's output, with the full log file one click away"""
+        self.ensure_detection()
+        lines = [line['text'] for line in self.actions.tail(port, 20)]
+        response = rumps.alert(
+            title=f"Logs: port {port}",
+            message='\n'.join(lines) or "No output yet",
+            ok="Close",
+            other="Open Log File"
+        )
+        if response == -1:  # the "other" button
+            subprocess.run(['open', self.actions.logs.path(port)])
+
+    def port_history_dialog(self, _):
+        """Ask for a port (listening now or not) and show its history"""
+        response = rumps.Window(
+            message="Show what was on which port?",
+            title="Port History",
+            default_text="3000",
+            ok="Show",
+            cancel="Cancel",
+            dimensions=(320, 24)
+        ).run()
+        if response.clicked and response.text.strip().isdigit():
+            self.show_history(int(response.text.strip()))
+
+    def show_history(self, port):
+        """Uptime over the last day and week, and the latest intervals on a port"""
+        from localservers.history import History
+
+        # Readable before detection has started (or with the recorder off)
+        history = self.history or History(HISTORY_FILE)
+        now = time.time()
+        lines = history_lines(
+            history.uptime(port, now - 86400),
+            history.uptime(port, now - 7 * 86400),
+            history.intervals(port, now - 7 * 86400, limit=12),
+            now
+        )
+        rumps.alert(title=f"History: port {port}", message='\n'.join(lines), ok="Close")
 
     def copy_url(self, sender):
         """Copy localhost URL to clipboard"""
@@ -554,258 +452,472 @@ class LocalServersApp(rumps.App):
         rumps.notification("URL Copied", url, "")
 
     def restart_cloudflare_tunnel(self, sender):
-        """Restart Cloudflare tunnel"""
+        """Restart a Cloudflare tunnel off the UI thread: stop its cloudflared and run the same command again"""
+        from localservers.cloudflared import find_tunnels
+        from localservers.supervisor import terminate
+
         hostname = sender._hostname
 
-        # Find the cloudflared process for this tunnel
+        # Find the cloudflared process for this tunnel (and how it was started) while the table is current
         try:
-            result = subprocess.run(
-                ['ps', 'aux'],
-                capture_output=True,
-                text=True,
-                timeout=3
-            )
+            owner = find_tunnels(self.process_table, self.detector.cloudflared_configs).get(hostname)
+        except Exception as e:
+            rumps.alert("Error", f"Could not restart tunnel: {str(e)}")
+            return
+        if not owner:
+            rumps.alert("Error", "Could not find tunnel process")
+            return
+        pid = owner[2]
+        command = shlex.split(self.process_table.args(pid))
+        cwd = self.process_table.cwd(pid) or None
 
-            pid = None
-            for line in result.stdout.split('\n'):
-                if 'cloudflared tunnel' in line and 'run' in line:
-                    # Check if this process handles this hostname
-                    config_match = re.search(r'--config\s+(\S+)', line)
-                    config_path = None
-
-                    if config_match:
-                        config_path = os.path.expanduser(config_match.group(1))
-                    else:
-                        config_path = os.path.expanduser('~/.cloudflared/config.yml')
-
-                    if config_path and os.path.exists(config_path):
-                        with open(config_path, 'r') as f:
-                            if hostname in f.read():
-                                parts = line.split()
-                                pid = parts[1]
-                                break
-
-            if pid:
-                # Kill process
-                subprocess.run(['kill', pid])
-
-                # Wait a bit
-                import time
-                time.sleep(2)
-
-                # Restart tunnel (need to find the original command)
-                # This is tricky - for now just notify user
-                rumps.notification(
+        def restart():
+            try:
+                # SIGTERM, SIGKILL if it doesn't exit in time
+                if not terminate(pid):
+                    self.notify("Restart Failed", f"Tunnel for {hostname} did not stop", "")
+                    return
+                subprocess.Popen(
+                    command, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL, start_new_session=True
+                )
+                self.notify("Tunnel Restarted", f"Restarted tunnel for {hostname}", "")
+            except (OSError, ValueError):
+                self.notify(
                     "Tunnel Stopped",
                     f"Stopped tunnel for {hostname}. Restart manually with: cloudflared tunnel run",
                     ""
                 )
-            else:
-                rumps.alert("Error", "Could not find tunnel process")
 
-        except Exception as e:
-            rumps.alert("Error", f"Could not restart tunnel: {str(e)}")
+        threading.Thread(target=restart, daemon=True).start()
 
     def toggle_category_filter(self, sender):
         """Toggle category visibility"""
         category = sender._category
 
-        current = self.prefs.get('show_categories', {}).get(category, True)
+        current = category_shown(self.prefs, category)
         self.prefs.setdefault('show_categories', {})[category] = not current
 
         sender.state = not current
         self.save_preferences()
-        self.update_menu(None)
-
-    def update_menu(self, sender):
-        """Update menu with servers, tunnels, and docker containers"""
-        servers, categories_found = self.detect_servers()
-        tunnels = self.detect_tunnels()
-        docker_containers = self.detect_docker_containers()
-
-        menu_items = []
-
-        # Add server button
-        menu_items.append(rumps.MenuItem("➕ Add Server", callback=self.add_server_dialog))
-        menu_items.append("---")
+        # Only the menu filters by category; detection carries on unchanged
+        self.render_again(('servers',))
+
+    def build_menu(self):
+        """Create the fixed menu skeleton; sections are filled in by update_menu"""
+        self.menu.add(rumps.MenuItem("➕ Add Server", callback=self.add_server_dialog))
+        self.menu.add(rumps.MenuItem("🔍 Discover Projects…", callback=self.discover_projects_dialog))
+        self.menu.add(rumps.MenuItem("🕘 Port History…", callback=self.port_history_dialog))
+        self.filter_item = rumps.MenuItem("🔎 Filter…", callback=self.filter_dialog)
+        self.menu.add(self.filter_item)
+        self.menu.add(rumps.separator)
 
         # Legend
         legend_menu = rumps.MenuItem("📖 Legend")
         legend_menu.add("⚙️  = Service (plist/launchd)")
         legend_menu.add("💻 = Terminal process")
         legend_menu.add("⭐ = Managed by LocalServers")
-        menu_items.append(legend_menu)
-        menu_items.append("---")
+        legend_menu.add("⏳ = Stale (source missed the refresh deadline)")
+        legend_menu.add("🟢 / 🟡 / 🔴 = Answering / Slow / Erroring (HTTP check, median latency)")
+        legend_menu.add("▁▃▅ = Memory over the last few samples, ⚠️ = CPU or memory alert")
+        legend_menu.add("📂 = Project or category group (lists over 15), opened to see its servers")
+        self.menu.add(legend_menu)
+        self.menu.add(rumps.separator)
+
+        # One header per section; rows are inserted after it and tracked by key
+        self.sections = {}
+        for name, label in (('servers', "📡 No servers running"),
+                            ('tunnels', "🚇 No tunnels active"),
+                            ('containers', "🐳 No containers running")):
+            header = rumps.MenuItem(label)
+            self.menu.add(header)
+            self.menu.add(rumps.separator)
+            self.sections[name] = {
+                'header': header,
+                'key': label,     # menu key stays the title the item was added with
+                'view': [],       # rows as last rendered
+                'items': {}       # row key -> (MenuItem, menu key)
+            }
+
+        # Stop or restart a category, a managed group or everything at once; contents follow the servers
+        self.bulk_menu = rumps.MenuItem("⏹ Stop / Restart")
+        self.bulk_view = None
+        self.menu.add(self.bulk_menu)
+
+        self.filters_item = None
+        self.filters_view = None
+
+        self.menu.add(rumps.MenuItem("Refresh"))
+
+        # Per-source timings and counters, refreshed whenever the menu opens
+        self.diagnostics_menu = rumps.MenuItem("🩺 Diagnostics")
+        self.diagnostics_menu.add(rumps.MenuItem("Copy Metrics (Prometheus)", callback=self.copy_metrics))
+        self.diagnostics_items = {}  # source name -> MenuItem
+        self.menu.add(self.diagnostics_menu)
+
+        self.menu.add(rumps.separator)
+        self.menu.add(rumps.MenuItem("Quit", callback=self.quit))
+
+    def update_menu(self, sender):
+        """Update menu with servers, tunnels, and docker containers from the latest snapshot"""
+        with self.render_lock:
+            snapshot, self.pending_snapshot = self.pending_snapshot, None
+            changed, self.pending_sections = self.pending_sections, set()
+            notifications, self.pending_notifications = self.pending_notifications, []
+        for notification in notifications:
+            rumps.notification(*notification)
+        if snapshot is None:
+            return
+        self.process_table = snapshot.process_table
+        self.rendered_snapshot = snapshot
+
+        # Rows are only rebuilt for sections with events, or whose badges (health, resources) moved;
+        # the first render, and the first live snapshot replacing the last-known one, rebuild everything
+        if self.rendered_generation == 0:
+            changed.update(self.sections)
+        self.rendered_generation = snapshot.generation
+        health_changed = snapshot.health != self.rendered_health
+        if health_changed or snapshot.resources != self.rendered_resources:
+            changed.add('servers')
+        if health_changed:
+            changed.add('containers')
+        self.rendered_health = snapshot.health
+        self.rendered_resources = snapshot.resources
+
+        # Hidden categories are only left out here: detection, history and the API still see them
+        shown = [server for server in snapshot.servers if category_shown(self.prefs, server.category)]
+        servers = shown
+        tunnels = snapshot.tunnels
+        docker_containers = snapshot.containers
+        if self.menu_filter:
+            servers = [
+                server for server in servers
+                if matches(self.menu_filter, server.port, server.type, server.category, server.command, self.server_group(server))
+            ]
+            docker_containers = [
+                container for container in docker_containers
+                if matches(self.menu_filter, container.host_port, container.name, container.image, container.project)
+            ]
+
+        # Sources that missed the refresh deadline show their previous result, marked stale
+        stale = {name: " ⏳" if name in snapshot.stale else "" for name in ('servers', 'tunnels', 'containers')}
 
-        # Servers section
         if servers:
-            menu_items.append(f"📡 Servers ({len(servers)})")
-            for server in servers:
-                port = server['port']
-                server_type = server['type']
-                pid = server['pid']
-                managed = server['managed']
-                is_service = server.get('is_service', False)
-
-                # Main item with badges
-                badges = []
-                if is_service:
-                    badges.append("⚙️")  # Service/plist
-                else:
-                    badges.append("💻")  # Terminal
-
-                if managed:
-                    badges.append("⭐")  # Managed by LocalServers
-
-                badge_str = " ".join(badges)
-                main_label = f"  {badge_str} localhost:{port} ({server_type})"
-
-                server_item = rumps.MenuItem(main_label)
-
-                # Submenu with actions
-                open_item = rumps.MenuItem("Open in Browser", callback=lambda s, p=port: self.open_localhost(p))
-                copy_item = rumps.MenuItem("Copy URL", callback=self.copy_url)
-                copy_item._port = port
-
-                restart_item = rumps.MenuItem("Restart", callback=self.restart_server)
-                restart_item._port = port
-                restart_item._pid = pid
-
-                stop_item = rumps.MenuItem("Stop", callback=self.stop_server)
-                stop_item._port = port
-                stop_item._pid = pid
-
-                server_item.add(open_item)
-                server_item.add(copy_item)
-                server_item.add("---")
-                server_item.add(restart_item)
-                server_item.add(stop_item)
-
-                menu_items.append(server_item)
+            header = f"📡 Servers ({self.count_text(servers, shown)}){stale['servers']}"
+        elif shown:
+            header = f"📡 No servers match “{self.menu_filter}”"
+        elif snapshot.servers:
+            header = "📡 No servers shown (see ⚙️ Filters)"
         else:
-            menu_items.append("📡 No servers running")
-
-        menu_items.append("---")
+            header = "📡 No servers running"
+        rows = None
+        if 'servers' in changed:
+            # Long lists become one lazily filled submenu per project or category
+            rows = section_layout(
+                server_rows(servers, snapshot.health, snapshot.resources),
+                {server.port: self.server_group(server) for server in servers},
+                "📂"
+            )
+        self.render_section('servers', header, rows, self.build_server_item)
 
-        # Tunnels section
         if tunnels:
-            menu_items.append(f"🚇 Tunnels ({len(tunnels)})")
-            for tunnel in tunnels:
-                tunnel_item = rumps.MenuItem(f"  {tunnel['display']}")
-
-                # Submenu with actions
-                open_tunnel = rumps.MenuItem(
-                    "Open in Browser",
-                    callback=lambda s, h=tunnel['hostname']: subprocess.run(['open', f"https://{h}"])
-                )
-                copy_tunnel = rumps.MenuItem("Copy URL", callback=self.copy_tunnel_url)
-                copy_tunnel._hostname = tunnel['hostname']
-
-                # Restart tunnel (only for managed/known tunnels)
-                if tunnel['type'] == 'Cloudflare':
-                    restart_tunnel = rumps.MenuItem("Restart Tunnel", callback=self.restart_cloudflare_tunnel)
-                    restart_tunnel._hostname = tunnel['hostname']
-                    restart_tunnel._port = tunnel['port']
-
-                    tunnel_item.add(open_tunnel)
-                    tunnel_item.add(copy_tunnel)
-                    tunnel_item.add("---")
-                    tunnel_item.add(restart_tunnel)
-                else:
-                    tunnel_item.add(open_tunnel)
-                    tunnel_item.add(copy_tunnel)
-
-                menu_items.append(tunnel_item)
+            header = f"🚇 Tunnels ({len(tunnels)}){stale['tunnels']}"
         else:
-            menu_items.append("🚇 No tunnels active")
-
-        menu_items.append("---")
+            header = "🚇 No tunnels active"
+        rows = tunnel_rows(tunnels) if 'tunnels' in changed else None
+        self.render_section('tunnels', header, rows, self.build_tunnel_item)
 
-        # Docker containers section
         if docker_containers:
-            menu_items.append(f"🐳 Docker ({len(docker_containers)})")
-            for container in docker_containers:
-                host_port = container['host_port']
-                container_port = container['container_port']
-                name = container['name']
-                image = container['image']
-                container_id = container['id']
-
-                docker_item = rumps.MenuItem(f"  🐳 localhost:{host_port} ({image})")
-
-                # Submenu with actions
-                open_item = rumps.MenuItem("Open in Browser", callback=lambda s, p=host_port: self.open_localhost(p))
-                copy_item = rumps.MenuItem("Copy URL", callback=self.copy_url)
-                copy_item._port = host_port
-
-                info_item = rumps.MenuItem(f"Container: {name}")
-                info_item.set_callback(None)  # Non-clickable info
-
-                port_info = rumps.MenuItem(f"Port mapping: {host_port}→{container_port}")
-                port_info.set_callback(None)
-
-                docker_item.add(open_item)
-                docker_item.add(copy_item)
-                docker_item.add("---")
-                docker_item.add(info_item)
-                docker_item.add(port_info)
-
-                menu_items.append(docker_item)
+            header = f"🐳 Docker ({self.count_text(docker_containers, snapshot.containers)}){stale['containers']}"
+        elif snapshot.containers:
+            header = f"🐳 No containers match “{self.menu_filter}”"
         else:
-            menu_items.append("🐳 No containers running")
+            header = "🐳 No containers running"
+        rows = None
+        if 'containers' in changed:
+            # Grouped by Compose project once there are many
+            rows = section_layout(
+                container_rows(docker_containers, snapshot.health),
+                {container.key: container.project for container in docker_containers},
+                "🐳"
+            )
+        self.render_section('containers', header, rows, self.build_container_item)
 
-        menu_items.append("---")
+        self.render_filters(snapshot.categories)
+        self.render_bulk(snapshot.servers)
 
-        # Dynamic filters based on categories found
-        if categories_found:
-            filters_menu = rumps.MenuItem("⚙️ Filters")
-
-            # Map categories to display names
-            category_names = {
-                'deno': 'Deno',
-                'bun': 'Bun',
-                'nextjs': 'Next.js',
-                'node': 'Node.js',
-                'django': 'Django',
-                'flask': 'Flask',
-                'python': 'Python',
-                'laravel': 'Laravel',
-                'php': 'PHP',
-                'ruby': 'Ruby',
-                'rust': 'Rust',
-                'go': 'Go',
-                'java': 'Java',
-                'electron': 'Electron',
-                'other': 'Other'
-            }
+        # Update icon
+        total = len(shown)
+        title = f"🌐 {total}" if total > 0 else "🌐"
+        if self.title != title:
+            self.title = title
 
-            for category in sorted(categories_found):
-                display_name = category_names.get(category, category.title())
-                item = rumps.MenuItem(
-                    f"Show {display_name}",
-                    callback=self.toggle_category_filter
-                )
-                item._category = category
-                item.state = self.should_show_category(category)
-                filters_menu.add(item)
+    def render_section(self, name, header_label, rows, build_item):
+        """Apply only the inserts, removals and relabels needed to show `rows` (None: header only)"""
+        section = self.sections[name]
+
+        if section['header'].title != header_label:
+            section['header'].title = header_label
 
-            menu_items.append(filters_menu)
+        if rows is None or rows == section['view']:
+            return
 
-        menu_items.append("Refresh")
-        menu_items.append("---")
-        menu_items.append(rumps.MenuItem("Quit", callback=rumps.quit_application))
+        items = section['items']
+        for op in diff_rows(section['view'], rows):
+            kind, row = op[0], op[1]
 
-        # Update menu
-        self.menu.clear()
-        for item in menu_items:
-            self.menu.add(item)
+            if kind == 'remove':
+                del self.menu[items.pop(row)[1]]
 
-        # Update icon
-        total = len(servers)
-        if total > 0:
-            self.title = f"🌐 {total}"
-        else:
-            self.title = "🌐"
+            elif kind == 'relabel':
+                items[row.key][0].title = row.label
+
+            elif kind == 'replace' and isinstance(row.data, Group):
+                # Same group, other members: the submenu is refilled the next time it opens
+                item = items[row.key][0]
+                item.title = row.label
+                item._rows = row.data.rows
+                item._filled = False
+
+            else:
+                if kind == 'replace':
+                    del self.menu[items.pop(row.key)[1]]
+
+                after_key = op[2]
+                anchor = items[after_key][1] if after_key is not None else section['key']
+                item = self.build_row_item(row, build_item)
+                self.menu.insert_after(anchor, item)
+                items[row.key] = (item, item.title)
+
+        section['view'] = rows
+
+    def count_text(self, shown, everything):
+        """'12', or '3 of 150' while the menu is filtered"""
+        return f"{len(shown)} of {len(everything)}" if self.menu_filter else f"{len(shown)}"
+
+    def server_group(self, server):
+        """Group a server is listed under in long lists: its managed project's group, else its category"""
+        managed = self.managed_servers.get(str(server.port)) or {}
+        return managed.get('group') or CATEGORY_NAMES.get(server.category, server.category.title())
+
+    def lazy_submenu(self, item, fill):
+        """Give `item` a submenu that `fill(item)` builds as it first opens, rather than up front"""
+        item._fill = fill
+        item._filled = False
+        item.add(rumps.MenuItem("…"))  # a submenu needs an item before it shows its arrow
+
+        observer = MenuOpenObserver.alloc().init()
+        observer.callback = lambda: self.fill_submenu(item)
+        item._menu.setDelegate_(observer)
+        item._observer = observer  # NSMenu doesn't retain its delegate
+        return item
+
+    def fill_submenu(self, item):
+        if not item._filled:
+            item.clear()
+            item._fill(item)
+            item._filled = True
+
+    def build_row_item(self, row, build_item):
+        """Menu item for a row: a group or "N more…" row becomes a submenu of its rows, filled when opened"""
+        if not isinstance(row.data, Group):
+            return build_item(row)
+
+        def fill(item):
+            for member in page(item._rows):
+                item.add(self.build_row_item(member._replace(label=member.label.strip()), build_item))
+
+        item = self.lazy_submenu(rumps.MenuItem(row.label), fill)
+        item._rows = row.data.rows
+        return item
+
+    def filter_dialog(self, _):
+        """Show only the servers and containers matching some text; empty shows everything again"""
+        response = rumps.Window(
+            message="Show servers and containers matching (port, type, command, category or project; empty for all):",
+            title="Filter",
+            default_text=self.menu_filter,
+            ok="Filter",
+            cancel="Cancel",
+            dimensions=(320, 24)
+        ).run()
+        if not response.clicked:
+            return
+
+        self.menu_filter = response.text.strip()
+        self.filter_item.title = f"🔎 Filter: {self.menu_filter}" if self.menu_filter else "🔎 Filter…"
+        self.render_again(('servers', 'containers'))
+
+    def render_again(self, sections):
+        """Re-render `sections` of what is showing (after a filter change), unless a newer snapshot is waiting"""
+        with self.render_lock:
+            if self.pending_snapshot is None:
+                self.pending_snapshot = self.rendered_snapshot
+            self.pending_sections.update(sections)
+        self.update_menu(None)
+
+    def build_server_item(self, row):
+        port, pid = row.data
+        # Actions are built when the submenu first opens
+        return self.lazy_submenu(rumps.MenuItem(row.label), lambda item: self.fill_server_item(item, port, pid))
+
+    def fill_server_item(self, server_item, port, pid):
+        open_item = rumps.MenuItem("Open in Browser", callback=lambda s, p=port: self.open_localhost(p))
+        copy_item = rumps.MenuItem("Copy URL", callback=self.copy_url)
+        copy_item._port = port
+
+        restart_item = rumps.MenuItem("Restart", callback=self.restart_server)
+        restart_item._port = port
+        restart_item._pid = pid
+
+        stop_item = rumps.MenuItem("Stop", callback=self.stop_server)
+        stop_item._port = port
+        stop_item._pid = pid
+
+        server_item.add(open_item)
+        server_item.add(copy_item)
+        if str(port) in self.managed_servers:
+            # Output captured by the supervisor
+            server_item.add(rumps.MenuItem("Show Logs", callback=lambda s, p=port: self.show_logs(p)))
+        server_item.add(rumps.MenuItem("History", callback=lambda s, p=port: self.show_history(p)))
+        server_item.add(rumps.separator)
+        server_item.add(restart_item)
+        server_item.add(stop_item)
+
+    def build_tunnel_item(self, row):
+        tunnel_type, hostname, port = row.data
+        tunnel_item = rumps.MenuItem(row.label)
+
+        # Submenu with actions
+        open_tunnel = rumps.MenuItem(
+            "Open in Browser",
+            callback=lambda s, h=hostname: subprocess.run(['open', f"https://{h}"])
+        )
+        copy_tunnel = rumps.MenuItem("Copy URL", callback=self.copy_tunnel_url)
+        copy_tunnel._hostname = hostname
+
+        tunnel_item.add(open_tunnel)
+        tunnel_item.add(copy_tunnel)
+
+        # Restart tunnel (only for managed/known tunnels)
+        if tunnel_type == 'Cloudflare':
+            restart_tunnel = rumps.MenuItem("Restart Tunnel", callback=self.restart_cloudflare_tunnel)
+            restart_tunnel._hostname = hostname
+            restart_tunnel._port = port
+
+            tunnel_item.add(rumps.separator)
+            tunnel_item.add(restart_tunnel)
+
+        return tunnel_item
+
+    def build_container_item(self, row):
+        # Actions are built when the submenu first opens
+        return self.lazy_submenu(rumps.MenuItem(row.label), lambda item: self.fill_container_item(item, row.data))
+
+    def fill_container_item(self, docker_item, data):
+        name, image, host_port, container_port, container_id = data
+
+        open_item = rumps.MenuItem("Open in Browser", callback=lambda s, p=host_port: self.open_localhost(p))
+        copy_item = rumps.MenuItem("Copy URL", callback=self.copy_url)
+        copy_item._port = host_port
+
+        info_item = rumps.MenuItem(f"Container: {name}")
+        info_item.set_callback(None)  # Non-clickable info
+
+        port_info = rumps.MenuItem(f"Port mapping: {host_port}→{container_port}")
+        port_info.set_callback(None)
+
+        docker_item.add(open_item)
+        docker_item.add(copy_item)
+        docker_item.add(rumps.separator)
+        docker_item.add(info_item)
+        docker_item.add(port_info)
+
+    def render_filters(self, categories_found):
+        """Rebuild the Filters submenu only when the categories or their states change"""
+        filters_view = tuple((category, category_shown(self.prefs, category)) for category in sorted(categories_found))
+        if filters_view == self.filters_view:
+            return
+        self.filters_view = filters_view
+
+        if self.filters_item is not None:
+            del self.menu[self.filters_item[1]]
+            self.filters_item = None
+
+        # Dynamic filters based on categories found
+        if not filters_view:
+            return
+
+        filters_menu = rumps.MenuItem("⚙️ Filters")
+        for category, shown in filters_view:
+            display_name = CATEGORY_NAMES.get(category, category.title())
+            item = rumps.MenuItem(
+                f"Show {display_name}",
+                callback=self.toggle_category_filter
+            )
+            item._category = category
+            item.state = shown
+            filters_menu.add(item)
+
+        self.menu.insert_before("Refresh", filters_menu)
+        self.filters_item = (filters_menu, filters_menu.title)
+
+    def render_bulk(self, servers):
+        """Rebuild the Stop / Restart submenu when the categories running or the managed groups change"""
+        groups = sorted({server.get('group') for server in self.managed_servers.values()} - {None, ''})
+        categories = sorted({server.category for server in servers})
+        bulk_view = (tuple(categories), tuple(groups))
+        if bulk_view == self.bulk_view:
+            return
+        self.bulk_view = bulk_view
+
+        self.bulk_menu.clear()
+        self.bulk_menu.add(rumps.MenuItem("Stop All", callback=lambda s: self.bulk_action('stop')))
+        self.bulk_menu.add(rumps.MenuItem("Restart All Managed", callback=lambda s: self.bulk_action('restart')))
+
+        if categories:
+            self.bulk_menu.add(rumps.separator)
+        for category in categories:
+            category_menu = rumps.MenuItem(CATEGORY_NAMES.get(category, category.title()))
+            category_menu.add(rumps.MenuItem("Stop All", callback=lambda s, c=category: self.bulk_action('stop', category=c)))
+            category_menu.add(rumps.MenuItem(
+                "Restart Managed", callback=lambda s, c=category: self.bulk_action('restart', category=c)
+            ))
+            self.bulk_menu.add(category_menu)
+
+        if groups:
+            self.bulk_menu.add(rumps.separator)
+        for group in groups:
+            group_menu = rumps.MenuItem(f"Group: {group}")
+            group_menu.add(rumps.MenuItem("Stop", callback=lambda s, g=group: self.bulk_action('stop', group=g)))
+            group_menu.add(rumps.MenuItem("Restart", callback=lambda s, g=group: self.bulk_action('restart', group=g)))
+            self.bulk_menu.add(group_menu)
+
+    def render_diagnostics(self):
+        """One line per source: last/mean duration, runs, forks, errors, timeouts and freshness"""
+        if self.detector is None:
+            return
+        for name, source in self.detector.metrics.to_dict().items():
+            problems = source['errors'] + source['timeouts'] + source['deadline_misses']
+            age = source['last_success_age_s']
+            title = (
+                f"{'⚠️' if problems else '✓'} {name}: {source['last_duration_ms']} ms"
+                f" (avg {source['mean_duration_ms']}) · {source['runs']} runs · {source['subprocesses']} forks"
+                f" · {source['errors']} errors · {source['timeouts']} timeouts · {source['deadline_misses']} late"
+                f" · ok {f'{age:.0f}s ago' if age is not None else 'never'}"
+            )
+
+            item = self.diagnostics_items.get(name)
+            if item is None:
+                item = self.diagnostics_items[name] = rumps.MenuItem(title)
+                self.diagnostics_menu.insert_before("Copy Metrics (Prometheus)", item)
+            elif item.title != title:
+                item.title = title
+
+    def copy_metrics(self, _):
+        """Copy the Prometheus metrics to clipboard"""
+        subprocess.run(['pbcopy'], input=self.detector.metrics.to_prometheus().encode(), check=True)
+        rumps.notification("Metrics Copied", "Prometheus text format", "")
 
     def open_localhost(self, port):
         """Open localhost:port in browser"""
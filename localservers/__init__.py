@@ -0,0 +1,3 @@
+"""
+LocalServers core - detection backends shared by the menubar app
+"""
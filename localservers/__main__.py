@@ -0,0 +1,10 @@
+"""
+python -m localservers - headless JSON output (see localservers.cli)
+"""
+
+import sys
+
+from localservers.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
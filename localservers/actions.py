@@ -0,0 +1,167 @@
+"""
+Server actions - Start, Stop and Restart by port, shared by the menubar and the query API
+"""
+
+import time
+
+from localservers.paths import LOG_DIR
+from localservers.logs import LogCapture
+from localservers.supervisor import Supervisor, terminate, wait_ports_closed
+
+# terminate_all outcomes, as reported for a port
+STOP_OUTCOMES = {'gone': 'stopped', 'terminated': 'stopped', 'killed': 'killed', 'survived': 'survived'}
+
+
+class ServerActions:
+    """Acts on managed servers (from prefs) and on whatever the latest snapshot shows on a port
+
+    Managed servers started here run under the supervisor, which restarts them
+    on crash, with their output captured (last lines in memory, all of it in
+    rotating files under ~/.localservers/logs); anything else is stopped by PID
+    with SIGTERM, then SIGKILL. Bulk actions signal every target at once and
+    wait for them, and for their ports, together.
+    """
+
+    def __init__(self, prefs, collector, on_event=None, grace=5):
+        self.prefs = prefs
+        self.collector = collector
+        self.grace = grace
+        self._on_event = on_event
+        self._stopped_at = {}  # port -> time.monotonic() of the last stop asked for
+        self.logs = LogCapture(LOG_DIR, **prefs.get('log_capture', {}))
+        self.supervisor = Supervisor(on_event=self._supervisor_event, grace=grace, logs=self.logs)
+
+    def managed(self, port):
+        return self.prefs.get('managed_servers', {}).get(str(port))
+
+    def pid_for(self, port):
+        """PID listening on `port` in the latest snapshot, or None"""
+        snapshot = self.collector.latest()
+        for server in snapshot.servers if snapshot else ():
+            if server.port == int(port):
+                return server.pid
+        return None
+
+    def start(self, port, wait=False):
+        """Start a managed server; returns False if `port` is not managed (with `wait`, whether it became ready)"""
+        server = self.managed(port)
+        if server is None:
+            return False
+        return self.supervisor.start(port, server, wait=wait)
+
+    def recently_stopped(self, port, within=30):
+        """True if a stop was asked for `port` in the last `within` seconds (its disappearance is expected)"""
+        at = self._stopped_at.get(int(port))
+        return at is not None and time.monotonic() - at < within
+
+    def groups(self):
+        """{group: [port, ...]} of managed servers that name a "group" """
+        groups = {}
+        for port, server in self.prefs.get('managed_servers', {}).items():
+            if server.get('group') and str(port).isdigit():
+                groups.setdefault(server['group'], []).append(int(port))
+        return {group: sorted(ports) for group, ports in groups.items()}
+
+    def ports_matching(self, category=None, group=None):
+        """Ports a bulk action covers: a managed group's, a category's, or (neither) every server's
+
+        "Every server" leaves out launchd services that aren't managed, so system
+        daemons listening on a port are never swept up with the dev servers.
+        """
+        if group is not None:
+            return self.groups().get(group, [])
+
+        snapshot = self.collector.latest()
+        servers = snapshot.servers if snapshot else ()
+        if category is not None:
+            return sorted(server.port for server in servers if server.category == category)
+
+        ports = {server.port for server in servers if server.managed or not server.is_service}
+        ports.update(int(port) for port, state in self.supervisor.status().items() if state['state'] != 'stopped')
+        return sorted(ports)
+
+    def stop_many(self, ports):
+        """Stop whatever listens on each of `ports`: all signalled at once, escalated and waited for together
+
+        Returns {port: outcome}: 'stopped', 'killed' (needed SIGKILL), 'survived',
+        'port busy' (stopped, but the port is still taken) or 'not running'.
+        """
+        ports = [int(port) for port in ports]
+        supervised = [port for port in ports if self.supervisor.supervises(port)]
+        pids = {port: self.pid_for(port) for port in ports if port not in supervised}
+        pids = {port: pid for port, pid in pids.items() if pid is not None}
+
+        now = time.monotonic()
+        self._stopped_at.update((port, now) for port in (*supervised, *pids))
+        outcomes = self.supervisor.stop_many(supervised, self.grace, [(pid, False, None) for pid in pids.values()])
+
+        results = {}
+        for port in ports:
+            outcome = outcomes.get(str(port)) if port in supervised else outcomes.get(int(pids.get(port, 0)))
+            results[port] = STOP_OUTCOMES.get(outcome, 'not running')
+
+        # Whatever was stopped has to let go of its port before anything can start there again
+        for port in wait_ports_closed([port for port, outcome in results.items() if outcome in ('stopped', 'killed')], self.grace):
+            results[port] = 'port busy'
+
+        self.collector.refresh()
+        return results
+
+    def restart_many(self, ports):
+        """Stop the managed servers on `ports` together, then start them together and wait until they're ready
+
+        Returns {port: outcome}: 'ready', 'not ready', the stop outcome that kept it
+        from starting ('survived', 'port busy'), or 'not managed' (left alone).
+        """
+        ports = [int(port) for port in ports]
+        managed = {port: self.managed(port) for port in ports if self.managed(port) is not None}
+        results = {port: 'not managed' for port in ports if port not in managed}
+
+        started = []
+        for port, outcome in self.stop_many(managed).items():
+            if outcome in ('survived', 'port busy'):
+                results[port] = outcome
+            elif self.supervisor.start(port, managed[port]):
+                started.append(port)
+            else:
+                results[port] = 'failed'
+
+        ready = self.supervisor.wait_ready(started)
+        results.update((port, 'ready' if ready[str(port)] else 'not ready') for port in started)
+        return results
+
+    def stop(self, port, pid=None):
+        """Stop whatever listens on `port`; returns False if nothing does"""
+        self._stopped_at[int(port)] = time.monotonic()
+        if self.supervisor.supervises(port):
+            stopped = self.supervisor.stop(port)
+        else:
+            pid = pid or self.pid_for(port)
+            if pid is None:
+                return False
+            stopped = terminate(pid, self.grace)
+
+        self.collector.refresh()
+        return stopped
+
+    def restart(self, port, pid=None):
+        """Stop, then start again once the port is free; returns True when the managed server is ready again"""
+        server = self.managed(port)
+        if server is None:
+            # Not ours to start again; stopping is all a restart can do
+            self.stop(port, pid)
+            return False
+
+        if not self.supervisor.supervises(port):
+            # Started outside LocalServers: stop it by PID, then let the supervisor own the new one
+            self.stop(port, pid)
+        return self.supervisor.restart(port, server)
+
+    def tail(self, port, lines=50):
+        """Last lines a managed server wrote to stdout/stderr"""
+        return self.logs.tail(port, lines)
+
+    def _supervisor_event(self, port, event):
+        self.collector.refresh()
+        if self._on_event is not None:
+            self._on_event(port, event)
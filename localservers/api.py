@@ -0,0 +1,268 @@
+"""
+Local query API - serves the collector's latest snapshot over a unix socket or loopback HTTP
+
+    GET  /snapshot[?wait=SECONDS]      whole snapshot; ETag + If-None-Match long-poll
+    GET  /ports/<port>                 what is listening on one port
+    GET  /metrics, /metrics.json       per-source instrumentation (Prometheus text or JSON)
+    GET  /servers/<port>/logs[?lines=N]  last lines a managed server wrote to stdout/stderr
+    POST /servers/<port>/start|stop|restart
+    POST /servers/stop|restart[?category=C|group=G]  every server (of a category or managed group) at once
+"""
+
+import errno
+import json
+import os
+import re
+import socket
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from localservers.core import snapshot_to_dict
+from localservers.paths import API_SOCKET
+
+MAX_WAIT = 60
+MAX_LOG_LINES = 1000
+LOOPBACK_HOSTS = ('localhost', '127.0.0.1', '[::1]')
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    # Set on the server: collector and actions
+    @property
+    def collector(self):
+        return self.server.collector
+
+    @property
+    def actions(self):
+        return self.server.actions
+
+    def address_string(self):
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if not self._allowed():
+            return
+
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+
+        if url.path == '/snapshot':
+            return self._snapshot(query)
+
+        match = re.fullmatch(r'/ports/(\d+)', url.path)
+        if match:
+            return self._port(int(match.group(1)))
+
+        match = re.fullmatch(r'/servers/(\d+)/logs', url.path)
+        if match:
+            return self._logs(int(match.group(1)), query)
+
+        metrics = self.collector.metrics
+        if url.path == '/metrics' and metrics is not None:
+            return self._send(200, metrics.to_prometheus().encode('utf-8'), {
+                'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'
+            })
+        if url.path == '/metrics.json' and metrics is not None:
+            return self._send_json(200, metrics.to_dict())
+
+        self._send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        if not self._allowed():
+            return
+
+        url = urlsplit(self.path)
+        bulk = re.fullmatch(r'/servers/(stop|restart)', url.path)
+        match = re.fullmatch(r'/servers/(\d+)/(start|stop|restart)', url.path)
+        if not (match or bulk):
+            return self._send_json(404, {'error': 'not found'})
+        if self.actions is None:
+            return self._send_json(501, {'error': 'actions are not available'})
+
+        # Drain any request body so the keep-alive connection stays usable
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+
+        if bulk:
+            return self._bulk(bulk.group(1), parse_qs(url.query))
+
+        port, action = match.group(1), match.group(2)
+        if action in ('start', 'restart') and self.actions.managed(port) is None:
+            return self._send_json(404, {'error': 'not a managed server'})
+
+        # start and restart answer once the server accepts connections (or gives up)
+        try:
+            if action == 'start':
+                ok = self.actions.start(port, wait=True)
+            else:
+                ok = getattr(self.actions, action)(port)
+        except Exception as e:
+            return self._send_json(500, {'error': str(e)})
+
+        if action == 'stop' and not ok:
+            return self._send_json(404, {'error': 'nothing is listening on that port'})
+        self._send_json(200, {
+            'ok': ok,
+            'port': int(port),
+            'action': action,
+            'supervisor': self.actions.supervisor.status(port)
+        })
+
+    def _bulk(self, action, query):
+        """Stop or restart a category, a managed group or every server together; answers when all are done"""
+        category = query.get('category', [None])[0]
+        group = query.get('group', [None])[0]
+        ports = self.actions.ports_matching(category, group)
+        try:
+            if action == 'stop':
+                results = self.actions.stop_many(ports)
+            else:
+                results = self.actions.restart_many(ports)
+        except Exception as e:
+            return self._send_json(500, {'error': str(e)})
+
+        self._send_json(200, {
+            'action': action,
+            'category': category,
+            'group': group,
+            'results': {str(port): outcome for port, outcome in results.items()}
+        })
+
+    def _allowed(self):
+        """Refuse browser cross-origin requests and DNS-rebinding hosts on the loopback listener"""
+        host = (self.headers.get('Host') or '').rsplit(':', 1)[0] if self.client_address else 'localhost'
+        if self.headers.get('Origin') or host not in LOOPBACK_HOSTS:
+            self._send_json(403, {'error': 'forbidden'})
+            return False
+        return True
+
+    def _snapshot(self, query):
+        snapshot = self.collector.latest()
+        etag = self.headers.get('If-None-Match')
+
+        if snapshot is not None and etag == self._etag(snapshot) and 'wait' in query:
+            try:
+                wait = min(float(query['wait'][0]), MAX_WAIT)
+            except ValueError:
+                wait = 0
+            snapshot = self.collector.wait_for_update(snapshot.generation, wait)
+        elif snapshot is None:
+            snapshot = self.collector.wait_for_update(None, MAX_WAIT)
+
+        if snapshot is None:
+            return self._send_json(503, {'error': 'no snapshot yet'})
+        if etag == self._etag(snapshot):
+            return self._send(304, b'', {'ETag': etag})
+
+        body = {'generation': snapshot.generation, **snapshot_to_dict(snapshot)}
+        self._send_json(200, body, {'ETag': self._etag(snapshot)})
+
+    def _port(self, port):
+        snapshot = self.collector.latest()
+        if snapshot is None:
+            return self._send_json(503, {'error': 'no snapshot yet'})
+
+        body = snapshot_to_dict(snapshot)
+        servers = [s for s in body['servers'] if s['port'] == port]
+        self._send_json(200, {
+            'port': port,
+            'servers': servers,
+            'containers': [c for c in body['containers'] if c['host_port'] == port],
+            'tunnels': [t for t in body['tunnels'] if t['port'] == port],
+            'health': body['health'].get(str(port)),
+            'resources': {s['pid']: body['resources'][s['pid']] for s in servers if s['pid'] in body['resources']}
+        })
+
+    def _logs(self, port, query):
+        if self.actions is None:
+            return self._send_json(501, {'error': 'actions are not available'})
+        try:
+            lines = min(int(query.get('lines', ['50'])[0]), MAX_LOG_LINES)
+        except ValueError:
+            return self._send_json(400, {'error': 'lines must be a number'})
+
+        self._send_json(200, {
+            'port': port,
+            'path': self.actions.logs.path(port),
+            'lines': self.actions.tail(port, lines)
+        })
+
+    def _etag(self, snapshot):
+        return f'"{snapshot.generation}"'
+
+    def _send_json(self, status, body, headers=None):
+        self._send(status, json.dumps(body, ensure_ascii=False).encode('utf-8'), {
+            'Content-Type': 'application/json; charset=utf-8', **(headers or {})
+        })
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    _bound = False
+
+    def server_bind(self):
+        # A stale socket from a previous run would make bind() fail, but a live one belongs to
+        # another instance (the app or --serve) and is left alone
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.server_address)
+        except (ConnectionRefusedError, FileNotFoundError):
+            try:
+                os.unlink(self.server_address)
+            except FileNotFoundError:
+                pass
+        else:
+            raise OSError(errno.EADDRINUSE, f"{self.server_address} is already being served")
+        finally:
+            probe.close()
+        super(UnixHTTPServer, self).server_bind()
+        self._bound = True
+        os.chmod(self.server_address, 0o600)
+
+    def server_close(self):
+        super(UnixHTTPServer, self).server_close()
+        if self._bound:
+            try:
+                os.unlink(self.server_address)
+            except OSError:
+                pass
+
+
+class QueryServer:
+    """Runs the query API on a background thread"""
+
+    def __init__(self, collector, actions=None, socket_path=API_SOCKET, port=None):
+        if port is not None:
+            self.httpd = ThreadingHTTPServer(('127.0.0.1', port), QueryHandler)
+            self.httpd.daemon_threads = True
+            self.address = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        else:
+            self.httpd = UnixHTTPServer(os.path.expanduser(socket_path), QueryHandler)
+            self.address = f"unix:{self.httpd.server_address}"
+
+        self.httpd.collector = collector
+        self.httpd.actions = actions
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='localservers-api', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,194 @@
+"""
+Detection benchmarks - per-detector wall time, subprocess count and allocations on replayed fixtures
+
+    python3 -m localservers.bench                          # every scenario
+    python3 -m localservers.bench --scenario 1k --repeat 10
+    python3 -m localservers.bench --save-baseline bench.json
+    python3 -m localservers.bench --baseline bench.json    # exit 1 on a regression (for CI)
+    python3 -m localservers.bench --record fixtures.json   # capture this machine's real output
+    python3 -m localservers.bench --fixtures fixtures.json # benchmark a recording
+"""
+
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from localservers.core import Detector
+from localservers.docker import CliDockerSource
+from localservers.fixtures import CommandFixtures, synthesize
+from localservers.proctable import ProcessTable
+
+# name -> synthesize() arguments
+SCENARIOS = {
+    '10': {'listeners': 10, 'depth': 3, 'containers': 2, 'tunnels': 1},
+    '1k': {'listeners': 1000, 'depth': 10, 'containers': 50, 'tunnels': 20},
+    '10k': {'listeners': 10000, 'depth': 10, 'containers': 200, 'tunnels': 50},
+    'deep': {'listeners': 100, 'depth': 500, 'containers': 0, 'tunnels': 0},
+}
+
+STEPS = ('process_table', 'servers', 'launchd', 'tunnels', 'containers')
+
+# A step regresses when it is this much slower (or bigger) than the baseline, and by more than the floor
+DEFAULT_TOLERANCE = 0.25
+WALL_FLOOR_MS = 1.0
+PEAK_FLOOR_KIB = 64
+
+# Forces ProcessTable onto the `ps` path (and its cwd/environ lookups onto `lsof`/`ps`),
+# so Linux and macOS replay the same fixtures and nothing reads the real /proc
+NO_PROC = '/nonexistent-proc'
+
+
+def make_detector():
+    """Detector wired to the subprocess-based backends, with cold caches"""
+    detector = Detector({'listener_backend': 'lsof', 'health_checks': False})
+    detector.docker = CliDockerSource()
+    return detector
+
+
+def run_steps(detector):
+    """Yield (step name, callable) for one refresh, in dependency order"""
+    state = {}
+
+    def process_table():
+        state['table'] = ProcessTable.snapshot(proc_root=NO_PROC)
+
+    def launchd():
+        # Fresh table so the ancestor memo detect_servers filled doesn't hide the walk
+        table = ProcessTable(state['table'].processes(), proc_root=NO_PROC)
+        for listener in state['listeners']:
+            detector.is_launchd_service(listener, table)
+
+    def servers():
+        found, _ = detector.detect_servers(state['table'])
+        state['listeners'] = [server.pid for server in found]
+
+    yield 'process_table', process_table
+    yield 'servers', servers
+    yield 'launchd', launchd
+    yield 'tunnels', lambda: detector.detect_tunnels(state['table'])
+    yield 'containers', detector.detect_docker_containers
+
+
+def measure(fixtures, repeat):
+    """{step: {'wall_ms', 'subprocesses', 'peak_kib'}} over `repeat` cold refreshes"""
+    walls = {step: [] for step in STEPS}
+    calls = {}
+    peaks = {}
+
+    with fixtures.replay():
+        for _ in range(repeat):
+            for step, fn in run_steps(make_detector()):
+                before = fixtures.total_calls
+                started = time.perf_counter()
+                fn()
+                walls[step].append((time.perf_counter() - started) * 1000)
+                calls[step] = fixtures.total_calls - before
+
+        # Allocations in a separate pass; tracing would skew the timings
+        for step, fn in run_steps(make_detector()):
+            tracemalloc.start()
+            try:
+                fn()
+                peaks[step] = tracemalloc.get_traced_memory()[1] / 1024
+            finally:
+                tracemalloc.stop()
+
+    return {
+        step: {
+            'wall_ms': round(statistics.median(walls[step]), 3),
+            'subprocesses': calls[step],
+            'peak_kib': round(peaks[step], 1),
+        }
+        for step in STEPS
+    }
+
+
+def record(path):
+    """Run one real refresh and save every command's output"""
+    fixtures = CommandFixtures()
+    with fixtures.record():
+        for _, fn in run_steps(make_detector()):
+            try:
+                fn()
+            except Exception as e:
+                print(f"warning: {e}", file=sys.stderr)
+    fixtures.save(path)
+    return fixtures
+
+
+def compare(results, baseline, tolerance):
+    """List of human-readable regressions of `results` against `baseline`"""
+    regressions = []
+    for scenario, steps in results.items():
+        for step, now in steps.items():
+            before = baseline.get(scenario, {}).get(step)
+            if before is None:
+                continue
+
+            if now['subprocesses'] > before['subprocesses']:
+                regressions.append(f"{scenario}/{step}: {before['subprocesses']} -> {now['subprocesses']} subprocesses")
+            if now['wall_ms'] > before['wall_ms'] * (1 + tolerance) + WALL_FLOOR_MS:
+                regressions.append(f"{scenario}/{step}: {before['wall_ms']} -> {now['wall_ms']} ms")
+            if now['peak_kib'] > before['peak_kib'] * (1 + tolerance) + PEAK_FLOOR_KIB:
+                regressions.append(f"{scenario}/{step}: {before['peak_kib']} -> {now['peak_kib']} KiB peak")
+    return regressions
+
+
+def print_table(results, out):
+    out.write(f"{'scenario':<10} {'step':<14} {'wall ms':>10} {'subprocs':>9} {'peak KiB':>10}\n")
+    for scenario, steps in results.items():
+        for step, row in steps.items():
+            out.write(f"{scenario:<10} {step:<14} {row['wall_ms']:>10.3f} {row['subprocesses']:>9} {row['peak_kib']:>10.1f}\n")
+
+
+def main(argv=None, out=sys.stdout):
+    parser = argparse.ArgumentParser(prog='localservers.bench', description='Benchmark detection on replayed command output.')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='run only these synthetic scenarios')
+    parser.add_argument('--fixtures', help='benchmark a recorded fixture file instead of the synthetic scenarios')
+    parser.add_argument('--record', metavar='PATH', help="record this machine's command output to PATH and exit")
+    parser.add_argument('--repeat', type=int, default=5, help='refreshes per scenario (median is reported)')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--save-baseline', metavar='PATH', help='write results to PATH')
+    parser.add_argument('--baseline', metavar='PATH', help='compare against PATH and exit 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help='allowed slowdown, as a fraction')
+    args = parser.parse_args(argv)
+
+    if args.record:
+        fixtures = record(args.record)
+        out.write(f"Recorded {len(fixtures.entries)} commands to {args.record}\n")
+        return 0
+
+    results = {}
+    if args.fixtures:
+        results['recorded'] = measure(CommandFixtures.load(args.fixtures), args.repeat)
+    else:
+        with tempfile.TemporaryDirectory(prefix='localservers-bench-') as config_dir:
+            for name in args.scenario or SCENARIOS:
+                fixtures = synthesize(config_dir=config_dir, **SCENARIOS[name])
+                results[name] = measure(fixtures, args.repeat)
+
+    if args.json:
+        out.write(json.dumps(results, indent=2) + '\n')
+    else:
+        print_table(results, out)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            out.write(f"REGRESSION {regression}\n")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Small caching helpers shared by the detectors
+"""
+
+import threading
+import time
+
+
+class TTLCache:
+    """Memoize a zero-argument loader for `ttl` seconds with single-flight loading
+
+    Concurrent callers that miss the cache wait for the one call already in
+    flight instead of starting their own. Failures are cached for the same
+    TTL, so a missing binary is not re-spawned on every refresh.
+    """
+
+    def __init__(self, loader, ttl):
+        self._loader = loader
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._loaded_at = None
+        self._value = None
+        self._error = None
+
+    def get(self):
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return self._result()
+
+            inflight = self._inflight
+            if inflight is None:
+                inflight = self._inflight = threading.Event()
+                leader = True
+            else:
+                leader = False
+
+        if not leader:
+            inflight.wait()
+            with self._lock:
+                return self._result()
+
+        value = error = None
+        try:
+            value = self._loader()
+        except Exception as e:
+            error = e
+
+        with self._lock:
+            self._value, self._error = value, error
+            self._loaded_at = time.monotonic()
+            self._inflight = None
+            inflight.set()
+            return self._result()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _result(self):
+        if self._error is not None:
+            raise self._error
+        return self._value
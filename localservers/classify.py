@@ -0,0 +1,133 @@
+"""
+Server classification - ordered rules compiled into a shared regex, matched on full argv and cwd
+"""
+
+import re
+
+# First match wins. `match` is searched in the full command line, `cwd` (optional) in the
+# working directory, both ignoring case. User rules from "server_rules" in ~/.localservers.json
+# go before these. Patterns are embedded in a larger regex, so use scoped flags like (?s:...)
+# rather than (?s); a rule with groups of its own is matched on its own, after the rules before it.
+DEFAULT_RULES = (
+    {'name': 'Next.js', 'category': 'nextjs', 'match': r'(?<![\w.-])next(?:-server)?(?![\w.-])'},
+    {'name': 'Nuxt', 'category': 'nuxt', 'match': r'(?<![\w.-])(?:nuxt|nuxi)(?![\w.-])'},
+    {'name': 'Vite', 'category': 'vite', 'match': r'(?<![\w.-])vite(?![\w.-])'},
+    {'name': 'Astro', 'category': 'astro', 'match': r'(?<![\w.-])astro\s+(?:dev|preview)'},
+    {'name': 'Deno', 'category': 'deno', 'match': r'(?<![\w.-])deno(?![\w.-])'},
+    {'name': 'Bun', 'category': 'bun', 'match': r'(?<![\w.-])bun(?![\w.-])'},
+    {'name': 'Electron', 'category': 'electron', 'match': r'[Ee]lectron'},
+    {'name': 'Node.js', 'category': 'node', 'match': r'(?<![\w.-])node(?:js)?(?![\w.-])'},
+    {'name': 'Django', 'category': 'django', 'match': r'(?:manage\.py|django-admin)\s+runserver'},
+    {'name': 'Flask', 'category': 'flask', 'match': r'(?<![\w.-])flask(?![\w.-])'},
+    {'name': 'Uvicorn', 'category': 'python', 'match': r'(?<![\w.-])(?:uvicorn|gunicorn|hypercorn)(?![\w.-])'},
+    {'name': 'Python', 'category': 'python', 'match': r'(?<![\w.-])python[\d.]*(?![\w.-])'},
+    {'name': 'Laravel', 'category': 'laravel', 'match': r'artisan\s+serve'},
+    {'name': 'PHP', 'category': 'php', 'match': r'(?<![\w.-])php[\d.]*(?:-fpm)?(?![\w.-])'},
+    {'name': 'Rails', 'category': 'ruby', 'match': r'(?<![\w.-])(?:rails\s+(?:s|server)|puma)(?![\w.-])'},
+    {'name': 'Ruby', 'category': 'ruby', 'match': r'(?<![\w.-])ruby[\d.]*(?![\w.-])'},
+    {'name': 'Rust', 'category': 'rust', 'match': r'(?<![\w.-])cargo\s+run|/target/(?:debug|release)/'},
+    {'name': 'Go', 'category': 'go', 'match': r'(?<![\w.-])go\s+run|/go-build\d*/'},
+    {'name': 'Java', 'category': 'java', 'match': r'(?<![\w.-])java(?![\w.-])'},
+)
+
+# How many (pid, start) results to keep before dropping those of exited processes
+CACHE_PRUNE_SIZE = 4096
+
+
+def _rule_pattern(rule):
+    """Lookaheads matching at the start of "<argv>\\n<cwd>" when the rule applies"""
+    # argv is the first line, cwd the second; neither contains a newline
+    pattern = rf"(?=[^\n]*?(?:{rule['match']}))"
+    if rule.get('cwd'):
+        pattern += rf"(?=[^\n]*\n[^\n]*?(?:{rule['cwd']}))"
+    return pattern
+
+
+def _combine(rules, indexes):
+    """[(regex, None)] trying the rules at `indexes` in one `match`, or [(regex, index)] per rule if they don't combine
+
+    Each rule becomes a lookahead alternative with an empty named group, so
+    the first alternative that can match (and so the first rule) wins and is
+    named by `lastgroup`.
+    """
+    combined = '|'.join(f"{_rule_pattern(rules[i])}(?P<r{i}>)" for i in indexes)
+    try:
+        return [(re.compile(combined, re.IGNORECASE), None)]
+    except re.error:
+        return [(re.compile(_rule_pattern(rules[i]), re.IGNORECASE), i) for i in indexes]
+
+
+def compile_rules(rules):
+    """Regexes trying every rule in order on "<argv>\\n<cwd>"; returns (matchers, rules kept)
+
+    `matchers` are (regex, index into the rules kept) pairs, tried in order
+    with `match`; an index of None means the regex holds a run of rules and
+    its `lastgroup` ("r<index>") says which one matched. Rules whose patterns
+    have groups of their own get a regex each, since their group names could
+    clash and their backreferences would be renumbered in a combined one.
+    Rules with an invalid pattern are skipped.
+    """
+    kept = []
+    alone = set()
+    for rule in rules:
+        if not isinstance(rule, dict) or not rule.get('match') or not rule.get('name'):
+            continue
+        try:
+            compiled = re.compile(_rule_pattern(rule), re.IGNORECASE)
+        except re.error:
+            continue
+        if compiled.groups:
+            alone.add(len(kept))
+        kept.append(rule)
+
+    matchers = []
+    run = []
+    for index in range(len(kept)):
+        if index in alone:
+            if run:
+                matchers.extend(_combine(kept, run))
+                run = []
+            matchers.append((re.compile(_rule_pattern(kept[index]), re.IGNORECASE), index))
+        else:
+            run.append(index)
+    if run:
+        matchers.extend(_combine(kept, run))
+    return matchers, kept
+
+
+class Classifier:
+    """Names and categorises server processes, once per process lifetime"""
+
+    def __init__(self, rules=()):
+        self.matchers, self.rules = compile_rules(list(rules) + list(DEFAULT_RULES))
+        self.uses_cwd = any(rule.get('cwd') for rule in self.rules)
+        self._cache = {}  # (pid, start) -> (name, category)
+        self._prune_at = CACHE_PRUNE_SIZE
+
+    def classify(self, pid, process_table, command=''):
+        """(name, category) for the process; `command` (e.g. lsof's COMMAND) is used if it's not in the table"""
+        process = process_table.get(pid)
+        key = (str(pid), process.start if process else None)
+        if process is not None and key in self._cache:
+            return self._cache[key]
+
+        args = process.args if process else command
+        cwd = process_table.cwd(pid) if process is not None and self.uses_cwd else ''
+        target = f"{args.replace(chr(10), ' ')}\n{cwd.replace(chr(10), ' ')}"
+
+        for regex, index in self.matchers:
+            match = regex.match(target)
+            if match:
+                rule = self.rules[int(match.lastgroup[1:]) if index is None else index]
+                result = (rule['name'], rule.get('category') or 'other')
+                break
+        else:
+            result = ((process.comm if process else command)[:20], 'other')
+
+        if process is not None:
+            if len(self._cache) >= self._prune_at:
+                self._cache = {k: v for k, v in self._cache.items() if process_table.start(k[0]) == k[1]}
+                # With that many live servers, don't prune again until the cache doubles
+                self._prune_at = max(CACHE_PRUNE_SIZE, 2 * len(self._cache))
+            self._cache[key] = result
+        return result
@@ -0,0 +1,201 @@
+"""
+Headless CLI - print or stream snapshots as JSON without the menubar app
+"""
+
+import argparse
+import json
+import os
+import queue
+import sys
+
+from localservers.core import Detector, load_preferences, snapshot_to_dict
+from localservers.model import changes_to_dict
+from localservers.paths import API_SOCKET, CONFIG_FILE, DISCOVERY_CACHE, HISTORY_FILE, LOG_DIR
+
+
+def _serve(collector, prefs, args, out):
+    # Imported here so --json/--watch don't pay for http.server
+    from localservers.actions import ServerActions
+    from localservers.api import QueryServer
+
+    try:
+        server = QueryServer(collector, ServerActions(prefs, collector), socket_path=args.socket, port=args.port)
+    except OSError as e:
+        # e.g. the menubar app is already serving the socket
+        sys.stderr.write(f"localservers: can't serve: {e}\n")
+        collector.stop()
+        return 1
+    out.write(f"Serving on {server.address}\n")
+    out.flush()
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+        collector.stop()
+    return 0
+
+
+def _logs(args, out):
+    # Read from disk, so this works whether the menubar app or --serve captured them
+    from localservers.logs import tail_file
+
+    for line in tail_file(os.path.join(LOG_DIR, f"{args.logs}.log"), args.lines):
+        out.write(line + '\n')
+    out.flush()
+    return 0
+
+
+def _history(args, out):
+    # Recorded by the menubar app; read straight from its database
+    from localservers.history import History, parse_time
+
+    history = History(HISTORY_FILE)
+    try:
+        since = parse_time(args.since)
+        at = parse_time(args.at) if args.at else None
+    except ValueError:
+        sys.stderr.write(f"localservers: can't read the time {args.at or args.since!r} (try 90m, 24h, 7d or 2026-10-16T15:00)\n")
+        return 2
+
+    if at is not None:
+        result = {'port': args.history, 'at': at, 'intervals': history.at(args.history, at)}
+    else:
+        result = {
+            'port': args.history,
+            'uptime': history.uptime(args.history, since),
+            'intervals': history.intervals(args.history, since, limit=args.lines),
+        }
+    out.write(json.dumps(result, ensure_ascii=False, indent=2 if args.pretty else None) + '\n')
+    return 0
+
+
+def _discover(args, out):
+    from localservers.discovery import ProjectScanner, listening_ports, register
+    from localservers.prefs import PreferencesStore
+
+    store = PreferencesStore(CONFIG_FILE)
+    managed = store.prefs.setdefault('managed_servers', {})
+    projects = ProjectScanner(DISCOVERY_CACHE).scan(args.discover)
+
+    # Don't hand out a port something is already listening on
+    listening = listening_ports(
+        Detector(store.prefs).collector().collect_once({'servers', 'containers'})
+    )
+
+    if args.register:
+        if store.read_only:
+            sys.stderr.write(f"localservers: {CONFIG_FILE} is from a newer version; not changing it\n")
+            return 1
+        added = register(managed, projects, listening)
+        store.save()
+        store.flush()
+        result = {'registered': added}
+    else:
+        # Preview: the port each project is managed on, or would be after --register
+        preview = dict(managed)
+        added = register(preview, projects, listening)
+        ports = {os.path.normpath(server.get('directory', '')): int(port) for port, server in preview.items()}
+        new = {server['directory'] for server in added.values()}
+        result = {'projects': [
+            {**project, 'port': ports.get(project['directory']), 'new': project['directory'] in new}
+            for project in projects
+        ]}
+
+    out.write(json.dumps(result, ensure_ascii=False, indent=2 if args.pretty else None) + '\n')
+    return 0
+
+
+def _health_statuses(snapshot):
+    return {port: health['status'] for port, health in snapshot.health.items()}
+
+
+def _resource_alerts(snapshot):
+    return {pid: usage['alerts'] for pid, usage in snapshot.resources.items() if usage['alerts']}
+
+
+def _emit(record, out):
+    out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    out.flush()
+
+
+def main(argv=None, out=sys.stdout):
+    parser = argparse.ArgumentParser(
+        prog='localservers',
+        description='Report local servers, tunnels and Docker containers as JSON.'
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--json', action='store_true', help='print one snapshot and exit (default)')
+    mode.add_argument('--watch', action='store_true', help='stream NDJSON: one full snapshot, then only changes')
+    mode.add_argument('--serve', action='store_true', help='run the local query API (unix socket by default)')
+    mode.add_argument('--logs', type=int, metavar='PORT', help="print the last lines of a managed server's output")
+    mode.add_argument('--history', type=int, metavar='PORT', help='what was on PORT, and its uptime, from the menubar app\'s history')
+    mode.add_argument('--discover', metavar='DIR', help='list runnable projects under DIR (ports are what --register would use)')
+    parser.add_argument('--socket', default=API_SOCKET, help='unix socket path for --serve')
+    parser.add_argument('--port', type=int, help='serve over loopback HTTP on this port instead of a unix socket')
+    parser.add_argument('--pretty', action='store_true', help='indent --json output')
+    parser.add_argument('--health', action='store_true', help='probe HTTP health before printing --json output')
+    parser.add_argument('--lines', type=int, default=50, help='how many lines --logs prints, or intervals --history lists (default: 50)')
+    parser.add_argument('--since', default='24h', help='start of the --history window: 90m, 24h, 7d, an ISO local time or epoch seconds (default: 24h)')
+    parser.add_argument('--at', help='with --history, only what was on the port at this time (same formats as --since)')
+    parser.add_argument('--register', action='store_true', help='with --discover, add every new project as a managed server')
+    parser.add_argument('--metrics', choices=('json', 'prometheus'), help='print detector timings and counters after one refresh')
+    args = parser.parse_args(argv)
+
+    if args.logs is not None:
+        return _logs(args, out)
+    if args.history is not None:
+        return _history(args, out)
+    if args.discover:
+        return _discover(args, out)
+
+    detector = Detector(load_preferences())
+    collector = detector.collector()
+
+    if not (args.watch or args.serve):
+        # --watch and --serve probe on their own schedule; a one-shot only when asked
+        snapshot = collector.collect_once(collector.names if args.health else collector.names - {'health'})
+        result = snapshot_to_dict(snapshot)
+
+        if args.metrics == 'prometheus':
+            out.write(detector.metrics.to_prometheus())
+        elif args.metrics == 'json':
+            out.write(json.dumps(detector.metrics.to_dict(), indent=2 if args.pretty else None) + '\n')
+        else:
+            out.write(json.dumps(result, ensure_ascii=False, indent=2 if args.pretty else None) + '\n')
+        return 0
+
+    if args.serve:
+        collector.start()
+        return _serve(collector, detector.prefs, args, out)
+
+    # Every snapshot with the events that led to it, in order, from the collector thread
+    updates = queue.Queue()
+    collector.subscribe(lambda events, snapshot: updates.put((events, snapshot)))
+    collector.start()
+
+    previous = None
+    try:
+        while True:
+            events, snapshot = updates.get()
+
+            if previous is None:
+                _emit({'event': 'snapshot', **snapshot_to_dict(snapshot)}, out)
+            else:
+                changes = changes_to_dict(events)
+                if _health_statuses(snapshot) != _health_statuses(previous):
+                    # Latency alone moves every probe; only report a port turning up/slow/erroring
+                    changes['health'] = snapshot_to_dict(snapshot)['health']
+                if _resource_alerts(snapshot) != _resource_alerts(previous):
+                    # Likewise, CPU/RSS samples only matter here when an alert starts or clears
+                    changes['resources'] = snapshot_to_dict(snapshot)['resources']
+                if changes or snapshot.stale != previous.stale:
+                    if events:
+                        changes['events'] = [event.to_dict() for event in events]
+                    _emit({'event': 'changes', 'taken_at': snapshot.taken_at, 'stale': sorted(snapshot.stale), **changes}, out)
+            previous = snapshot
+    except (KeyboardInterrupt, BrokenPipeError):
+        return 0
+    finally:
+        collector.stop()
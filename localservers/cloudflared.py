@@ -0,0 +1,242 @@
+"""
+Cloudflare tunnels - cached, structured parsing of cloudflared config files
+"""
+
+import os
+import re
+import threading
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+DEFAULT_CONFIG_PATHS = ('~/.cloudflared/config.yml', '~/.cloudflared/config.yaml')
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '::1', '0.0.0.0')
+DEFAULT_PORTS = {'http': 80, 'https': 443, 'ssh': 22, 'rdp': 3389}
+
+_yaml = None  # PyYAML, imported on first parse (False when it isn't installed)
+
+# service: the raw ingress service; host/port: the origin it points at (port is None for
+# unix sockets, http_status and other services without one)
+IngressRule = namedtuple('IngressRule', ['hostname', 'service', 'scheme', 'host', 'port', 'path'])
+TunnelConfig = namedtuple('TunnelConfig', ['path', 'tunnel', 'ingress'])
+
+
+def parse_service(service):
+    """Split an ingress service into (scheme, host, port)"""
+    service = str(service).strip()
+    if ':' not in service or service.startswith(('http_status:', 'hello_world', 'bastion')):
+        return (service.split(':', 1)[0], None, None)
+
+    if service.startswith('unix:') or service.startswith('unix+tls:'):
+        return ('unix', service.split(':', 1)[1], None)
+
+    parts = urlsplit(service if '://' in service else f'tcp://{service}')
+    try:
+        port = parts.port or DEFAULT_PORTS.get(parts.scheme)
+    except ValueError:
+        port = None
+    return (parts.scheme, parts.hostname, port)
+
+
+def _yaml_module():
+    """PyYAML, or None; imported on first use since it is slow to load and most setups have no config"""
+    global _yaml
+    if _yaml is None:
+        try:
+            import yaml
+            _yaml = yaml
+        except ImportError:
+            _yaml = False
+    return _yaml or None
+
+
+def parse_config(text, path=None):
+    """Parse a cloudflared config into a TunnelConfig"""
+    yaml = _yaml_module()
+    if yaml is not None:
+        data = yaml.safe_load(text)
+    else:
+        data = _parse_block_yaml(text)
+
+    if not isinstance(data, dict):
+        data = {}
+
+    ingress = []
+    for entry in data.get('ingress') or ():
+        if not isinstance(entry, dict) or 'service' not in entry:
+            continue
+
+        scheme, host, port = parse_service(entry['service'])
+        ingress.append(IngressRule(
+            hostname=entry.get('hostname'),
+            service=str(entry['service']),
+            scheme=scheme,
+            host=host,
+            port=port,
+            path=entry.get('path')
+        ))
+
+    return TunnelConfig(path=path, tunnel=data.get('tunnel'), ingress=tuple(ingress))
+
+
+class ConfigCache:
+    """Parsed configs keyed by path, re-read only when mtime, inode or size change"""
+
+    def __init__(self):
+        self._entries = {}  # path -> ((mtime_ns, inode, size), TunnelConfig)
+        self._lock = threading.Lock()
+
+    def load(self, path):
+        """Parsed config for `path`, or None if it does not exist or cannot be parsed"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+
+        key = (st.st_mtime_ns, st.st_ino, st.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+
+        try:
+            with open(path, 'r') as f:
+                config = parse_config(f.read(), path)
+        except Exception:
+            # Unreadable or half-written; cache the failure until the file changes
+            config = None
+
+        with self._lock:
+            self._entries[path] = (key, config)
+        return config
+
+
+def config_path_for(args):
+    """Config file a `cloudflared tunnel run` command line uses"""
+    config_match = re.search(r'--config(?:\s+|=)(\S+)', args)
+    if config_match:
+        return os.path.expanduser(config_match.group(1))
+
+    for path in DEFAULT_CONFIG_PATHS:
+        path = os.path.expanduser(path)
+        if os.path.exists(path):
+            return path
+    return os.path.expanduser(DEFAULT_CONFIG_PATHS[0])
+
+
+def find_tunnels(process_table, cache):
+    """Index hostname -> (IngressRule, config path, pid) over every running `cloudflared tunnel run`"""
+    index = {}
+    for process in process_table.matching('cloudflared', 'tunnel'):
+        if not re.search(r'\brun\b', process.args):
+            continue
+
+        config_path = config_path_for(process.args)
+        config = cache.load(config_path)
+        if config is None:
+            continue
+
+        for rule in config.ingress:
+            if rule.hostname and rule.hostname not in index:
+                index[rule.hostname] = (rule, config_path, process.pid)
+
+    return index
+
+
+def _parse_block_yaml(text):
+    """Minimal block-style YAML reader used when PyYAML is not installed
+
+    Handles nested mappings, lists of scalars or mappings, comments and
+    quoted scalars - enough for cloudflared configs. Flow style is not supported.
+    """
+    lines = []
+    for raw in text.splitlines():
+        line = _strip_comment(raw).rstrip()
+        if line.strip() and line.strip() != '---':
+            lines.append((len(line) - len(line.lstrip()), line.strip()))
+
+    value, _ = _parse_block(lines, 0, lines[0][0] if lines else 0)
+    return value
+
+
+def _parse_block(lines, i, indent):
+    if i < len(lines) and lines[i][1].startswith('- '):
+        return _parse_list(lines, i, indent)
+    return _parse_mapping(lines, i, indent)
+
+
+def _parse_list(lines, i, indent):
+    items = []
+    while i < len(lines) and lines[i][0] == indent and (lines[i][1] == '-' or lines[i][1].startswith('- ')):
+        content = lines[i][1][1:].strip()
+        if not content:
+            value, i = _parse_block(lines, i + 1, lines[i + 1][0]) if i + 1 < len(lines) else (None, i + 1)
+            items.append(value)
+            continue
+
+        key, sep, rest = _split_key(content)
+        if not sep:
+            items.append(_scalar(content))
+            i += 1
+            continue
+
+        # "- key: value" starts a mapping whose other keys sit under the first key
+        child_indent = indent + (len(lines[i][1]) - len(content))
+        lines[i] = (child_indent, content)
+        value, i = _parse_mapping(lines, i, child_indent)
+        items.append(value)
+
+    return items, i
+
+
+def _parse_mapping(lines, i, indent):
+    mapping = {}
+    while i < len(lines) and lines[i][0] == indent and not lines[i][1].startswith('- '):
+        key, sep, rest = _split_key(lines[i][1])
+        if not sep:
+            i += 1
+            continue
+
+        i += 1
+        if rest:
+            mapping[key] = _scalar(rest)
+        elif i < len(lines) and (lines[i][0] > indent or (lines[i][0] == indent and lines[i][1].startswith('- '))):
+            mapping[key], i = _parse_block(lines, i, lines[i][0])
+        else:
+            mapping[key] = None
+
+    return mapping, i
+
+
+def _split_key(content):
+    match = re.match(r'''^("[^"]*"|'[^']*'|[^:'"]+?)\s*:(?:\s+(.*)|$)''', content)
+    if not match:
+        return content, '', ''
+    return _scalar(match.group(1)), ':', (match.group(2) or '').strip()
+
+
+def _strip_comment(line):
+    quote = None
+    for n, char in enumerate(line):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '#' and (n == 0 or line[n - 1] in ' \t'):
+            return line[:n]
+    return line
+
+
+def _scalar(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+        return value[1:-1]
+    if value in ('true', 'True'):
+        return True
+    if value in ('false', 'False'):
+        return False
+    if re.fullmatch(r'-?\d+', value):
+        return int(value)
+    return value
@@ -0,0 +1,224 @@
+"""
+Background collector - runs detection off the UI thread and hands over finished snapshots
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from types import MappingProxyType
+
+from localservers.model import EventBus, Snapshot, diff
+from localservers.scheduler import Scheduler
+
+
+def freeze(items):
+    """Tuple of records (already immutable, so nothing is copied)"""
+    return tuple(items)
+
+
+def freeze_map(mapping):
+    """Read-only view over a dict of dicts"""
+    return MappingProxyType({key: MappingProxyType(dict(value)) for key, value in mapping.items()})
+
+
+class Collector:
+    """Worker thread that refreshes on an interval and publishes immutable snapshots
+
+    Each source is a callable taking the shared context returned by `prepare`
+    and returning a dict of snapshot fields. Sources run concurrently on a
+    bounded pool; one that misses the refresh deadline keeps its previous
+    result and is reported in `Snapshot.stale`. `prepare` only runs when a
+    due source is listed in `needs_context` (default: every source); the
+    others get the last context.
+
+    `derived` sources take the merged fields instead (e.g. the servers found
+    by this same refresh) and run once the other due sources have finished,
+    within what is left of the deadline.
+
+    `intervals` maps source names to (base, maximum) seconds. A source is
+    polled at its base interval after a change and backs off towards the
+    maximum while its result stays the same.
+
+    With `metrics`, every source run is timed and its subprocesses, errors
+    and deadline misses are counted.
+
+    Every published snapshot is diffed against the previous one, and the
+    resulting events go to callbacks registered with `subscribe()`, on the
+    collector thread.
+    """
+
+    def __init__(self, sources, prepare=None, intervals=None, deadline=3.5, metrics=None,
+                 derived=None, needs_context=None):
+        self._sources = dict(sources)
+        self._derived = dict(derived or {})
+        self._prepare = prepare
+        self._needs_context = set(self._sources if needs_context is None else needs_context)
+        self.metrics = metrics
+        names = [*self._sources, *self._derived]
+        self.scheduler = Scheduler({name: (intervals or {}).get(name, (5, 5)) for name in names})
+        self.deadline = deadline
+        self._executor = ThreadPoolExecutor(max_workers=len(names), thread_name_prefix='localservers-source')
+        self._context = None
+        self._results = {}   # source name -> last good result
+        self._pending = {}   # source name -> future still running past a deadline
+        self._latest = None
+        self._generation = 0
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._published = threading.Condition()
+        self._events = EventBus()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='localservers-collector', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        self._executor.shutdown(wait=False)
+
+    def refresh(self, names=None):
+        """Poll `names` (default: every source) as soon as possible and tighten their intervals"""
+        self.scheduler.poke(names)
+        self._wake.set()
+
+    @property
+    def names(self):
+        """Every source's name, derived ones included"""
+        return set(self._sources) | set(self._derived)
+
+    def subscribe(self, callback, kinds=None):
+        """Call `callback(events, snapshot)` for each new snapshot (see EventBus); returns an unsubscribe function"""
+        return self._events.subscribe(callback, kinds)
+
+    def latest(self):
+        """Most recent finished snapshot, or None before the first refresh completes"""
+        return self._latest
+
+    def wait_for_update(self, generation=None, timeout=None):
+        """Block until a snapshot newer than `generation` is published; returns the latest snapshot"""
+        with self._published:
+            self._published.wait_for(
+                lambda: self._latest is not None and (generation is None or self._latest.generation > generation),
+                timeout
+            )
+            return self._latest
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            due = self.scheduler.due()
+            if due:
+                self.collect_once(due)
+            self._wake.wait(self.scheduler.wait_time())
+
+    def collect_once(self, names=None):
+        """Poll `names` (default: every source) on the calling thread and publish the result
+
+        A new snapshot is only published when a result or the stale set changed.
+        """
+        names = self.names if names is None else set(names)
+        started = time.monotonic()
+        try:
+            if self._prepare is None or not names & self._needs_context:
+                context = self._context
+            elif self.metrics is not None:
+                context = self._context = self.metrics.run('process_table', self._prepare)
+            else:
+                context = self._context = self._prepare()
+        except Exception:
+            # Keep serving the previous snapshot
+            for name in names:
+                self.scheduler.done(name, changed=False)
+            return self._latest
+
+        previous_stale = self._latest.stale if self._latest else frozenset()
+        stale = set(previous_stale - names)
+        changed = self._run_sources(self._sources, names, context, self.deadline, stale)
+
+        fields = self._fields()
+        if names & set(self._derived):
+            remaining = max(0, self.deadline - (time.monotonic() - started))
+            if self._run_sources(self._derived, names, fields, remaining, stale):
+                changed = True
+                fields = self._fields()
+
+        if self._latest is not None and not changed and stale == previous_stale:
+            return self._latest
+
+        self._generation += 1
+        snapshot = Snapshot(
+            generation=self._generation,
+            taken_at=time.time(),
+            servers=freeze(fields.get('servers', ())),
+            categories=frozenset(fields.get('categories', ())),
+            tunnels=freeze(fields.get('tunnels', ())),
+            containers=freeze(fields.get('containers', ())),
+            health=freeze_map(fields.get('health', {})),
+            resources=freeze_map(fields.get('resources', {})),
+            process_table=context,
+            stale=frozenset(stale)
+        )
+
+        # A single reference assignment is atomic, so readers never see a half-built snapshot
+        previous, self._latest = self._latest, snapshot
+        with self._published:
+            self._published.notify_all()
+        self._events.publish(diff(previous, snapshot), snapshot)
+        return snapshot
+
+    def _fields(self):
+        fields = {}
+        for name in (*self._sources, *self._derived):
+            fields.update(self._results.get(name, {}))
+        return fields
+
+    def _run_sources(self, sources, names, argument, timeout, stale):
+        """Run the due `sources` on the pool, wait up to `timeout` and store their results
+
+        Sources that miss it are added to `stale`. Returns whether any result changed.
+        """
+        futures = {}
+        submitted = set()
+        changed = False
+        for name, source in sources.items():
+            if name not in names:
+                continue
+
+            pending = self._pending.pop(name, None)
+            if pending is not None and not pending.done():
+                # Still stuck from an earlier refresh; don't pile another call on top
+                futures[name] = pending
+                continue
+
+            if pending is not None and pending.exception() is None:
+                # Finished after its deadline; better than nothing if this run is late too
+                changed = changed or pending.result() != self._results.get(name)
+                self._results[name] = pending.result()
+            if self.metrics is not None:
+                futures[name] = self._executor.submit(self.metrics.run, name, source, argument)
+            else:
+                futures[name] = self._executor.submit(source, argument)
+            submitted.add(name)
+
+        wait(futures.values(), timeout=timeout)
+
+        for name, future in futures.items():
+            result_changed = False
+            if not future.done():
+                if self.metrics is not None and name in submitted:
+                    self.metrics.deadline_missed(name)
+                self._pending[name] = future
+                stale.add(name)
+            elif future.exception() is None:
+                result = future.result()
+                result_changed = result != self._results.get(name)
+                self._results[name] = result
+            else:
+                stale.add(name)
+
+            changed = changed or result_changed
+            self.scheduler.done(name, result_changed)
+        return changed
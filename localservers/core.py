@@ -0,0 +1,250 @@
+"""
+Detection core - servers, tunnels and containers without any UI
+"""
+
+import os
+import re
+
+from localservers.classify import Classifier
+from localservers.cloudflared import LOCAL_HOSTS, ConfigCache, find_tunnels
+from localservers.collector import Collector
+from localservers.discovery import classify_project
+from localservers.docker import get_docker_source
+from localservers.health import HealthProber
+from localservers.listeners import get_listener_source
+from localservers.metrics import Metrics
+from localservers.model import Server, Tunnel, port_number
+from localservers.paths import CONFIG_FILE
+from localservers.prefs import PreferencesStore
+from localservers.proctable import ProcessTable
+from localservers.resources import ResourceSampler
+from localservers.scheduler import DEFAULT_INTERVALS
+from localservers.tailscale import TailscaleClient
+
+
+def load_preferences(config_file=CONFIG_FILE):
+    """Load user preferences from config file (read-only; the menubar app keeps a PreferencesStore)"""
+    return PreferencesStore(config_file).prefs
+
+
+class Detector:
+    """Detection backends and caches, shared by the menubar app and the CLI
+
+    Every server is detected whatever its category; hiding categories is up to
+    the menu, so history, the API and bulk actions still see hidden servers.
+    """
+
+    def __init__(self, prefs):
+        self.prefs = prefs
+
+        # Per-source durations, subprocess spawns, timeouts and errors
+        self.metrics = Metrics()
+
+        # Built-in and user ("server_rules") classification rules, compiled once
+        self.classifier = Classifier(self.prefs.get('server_rules', []))
+
+        # Parsed cloudflared configs, re-read only when the file changes
+        self.cloudflared_configs = ConfigCache()
+
+        # Tailscale status and serve config, shared across refreshes for a short TTL
+        self.tailscale = TailscaleClient()
+
+        # Docker containers, indexed from the Engine API event stream (or `docker ps` without a socket)
+        self.docker = get_docker_source()
+
+        # Listening socket backend (procfs on Linux, lsof elsewhere)
+        self.listener_source = get_listener_source(self.prefs.get('listener_backend', 'auto'))
+
+        # HTTP health/latency of every listening port (off with "health_checks": false)
+        self.prober = HealthProber(**self.prefs.get('health_probe', {})) if self.prefs.get('health_checks', True) else None
+
+        # CPU/RSS history of every server process
+        self.sampler = ResourceSampler(thresholds=self.prefs.get('resource_alerts'))
+
+    def collector(self):
+        """Background collector polling every detector on its adaptive interval"""
+        intervals = {**DEFAULT_INTERVALS, **{
+            name: tuple(value) for name, value in self.prefs.get('poll_intervals', {}).items()
+        }}
+        sources = {
+            'servers': self.collect_servers,
+            'tunnels': self.collect_tunnels,
+            'containers': self.collect_containers,
+        }
+        # Run on what this same refresh found listening
+        derived = {'resources': self.collect_resources}
+        if self.prober is not None:
+            derived['health'] = self.collect_health
+
+        return Collector(
+            sources, prepare=ProcessTable.snapshot, intervals=intervals, metrics=self.metrics,
+            derived=derived, needs_context={'servers', 'tunnels'}
+        )
+
+    # Collector sources (run concurrently on the collector's pool)
+
+    def collect_servers(self, process_table):
+        servers, categories_found = self.detect_servers(process_table)
+        return {'servers': servers, 'categories': categories_found}
+
+    def collect_tunnels(self, process_table):
+        return {'tunnels': self.detect_tunnels(process_table)}
+
+    def collect_containers(self, process_table):
+        return {'containers': self.detect_docker_containers()}
+
+    def collect_health(self, fields):
+        return {'health': self.probe_health(fields.get('servers', ()), fields.get('containers', ()))}
+
+    def collect_resources(self, fields):
+        return {'resources': self.sampler.sample(server.pid for server in fields.get('servers', ()))}
+
+    def probe_health(self, servers, containers):
+        """Health of every server and published container port, keyed by int port"""
+        ports = {server.port for server in servers}
+        ports.update(container.host_port for container in containers)
+        return self.prober.probe(ports)
+
+    def detect_servers(self, process_table):
+        """Detect local servers using the configured listener source"""
+        servers = []
+        categories_found = set()
+
+        try:
+            ports = {}
+            for listener in self.listener_source.listeners():
+                command = listener.command
+                pid = listener.pid
+                port = listener.port
+
+                # Skip system ports
+                if port < 1000:
+                    continue
+
+                if port not in ports:
+                    server_type, category = self.identify_server_type(pid, process_table, command)
+                    categories_found.add(category)
+
+                    # Check if it's a managed server
+                    is_managed = str(port) in self.prefs.get('managed_servers', {})
+
+                    # Detect if running from launchd/plist vs terminal
+                    is_service = self.is_launchd_service(pid, process_table)
+
+                    ports[port] = Server(port, pid, server_type, category, command, is_managed, is_service)
+
+            servers = sorted(ports.values())
+
+        except Exception as e:
+            self.metrics.error(e)
+
+        return servers, categories_found
+
+    def is_launchd_service(self, pid, process_table):
+        """Check if process is running from launchd (plist service)"""
+        try:
+            max_depth = 20  # Avoid infinite loops
+            ancestors = process_table.ancestors(pid)
+
+            for ppid in ancestors[:max_depth]:
+                # Found launchd!
+                if ppid == '1':
+                    return True
+
+                # Check if parent command contains launchd
+                if 'launchd' in process_table.comm(ppid).lower():
+                    return True
+
+            if len(ancestors) <= max_depth:
+                return False
+
+            # Additional check: look for LaunchAgent or LaunchDaemon in process environment
+            environ = process_table.environ(pid)
+            if 'LaunchAgent' in environ or 'LaunchDaemon' in environ:
+                return True
+
+        except Exception as e:
+            self.metrics.error(e)
+
+        return False
+
+    def identify_server_type(self, pid, process_table, command=''):
+        """Identify server type and category from the full command line (and cwd, if a rule asks)"""
+        return self.classifier.classify(pid, process_table, command)
+
+    def detect_tunnels(self, process_table):
+        """Detect active tunnels with proper hostname and port mapping"""
+        tunnels = {}
+
+        # Cloudflare tunnels (configs are parsed once and re-read only when they change)
+        try:
+            for hostname, (rule, config_path, pid) in find_tunnels(process_table, self.cloudflared_configs).items():
+                if rule.port is None:
+                    # http_status, unix sockets and other services without a port
+                    continue
+
+                if rule.host in LOCAL_HOSTS:
+                    display = f"{hostname} → :{rule.port}"
+                else:
+                    display = f"{hostname} → {rule.host}:{rule.port}"
+
+                tunnels[hostname] = Tunnel('Cloudflare', hostname, int(rule.port), display, rule.service, pid, config_path)
+        except Exception as e:
+            self.metrics.error(e)
+
+        # Tailscale Funnel, from the structured serve config (cached, one call per TTL)
+        if any('tailscale' in process.args.lower() for process in process_table.processes()):
+            try:
+                for hostname, public_port, local_port in self.tailscale.funnels():
+                    port = port_number(local_port or public_port)
+                    public = hostname if public_port == 443 else f"{hostname}:{public_port}"
+                    display = f"{public} → :{local_port}" if local_port else public
+
+                    tunnels[f'tailscale-{public_port}-{port}'] = Tunnel('Tailscale Funnel', hostname, port, display)
+            except FileNotFoundError:
+                # tailscaled (or something else named so) is running without the CLI: no funnels, not an error
+                pass
+            except Exception as e:
+                # Older clients without `serve status --json`: fall back to foreground funnel processes
+                self.metrics.error(e)
+                for process in process_table.matching('tailscale', 'funnel'):
+                    port_match = re.search(r'funnel\s+(\d+)', process.args)
+                    port = int(port_match.group(1)) if port_match else None
+                    hostname = self.tailscale.hostname()
+
+                    key = f'tailscale-{port}'
+                    if key not in tunnels:
+                        tunnels[key] = Tunnel('Tailscale Funnel', hostname, port, f"{hostname}:{port or 'unknown'}")
+
+        return list(tunnels.values())
+
+    def detect_docker_containers(self):
+        """Detect running Docker containers with exposed ports"""
+        try:
+            return self.docker.containers()
+        except Exception as e:
+            self.metrics.error(e)
+            return []
+
+
+def detect_project_type(directory):
+    """Auto-detect project type and suggest start command"""
+    try:
+        names = set(os.listdir(directory))
+    except OSError:
+        return (None, None)
+    project_type, command, _ = classify_project(directory, names)
+    return (project_type, command)
+
+
+def snapshot_to_dict(snapshot):
+    """JSON-ready form of a collector Snapshot"""
+    return {
+        'taken_at': snapshot.taken_at,
+        'servers': [server.to_dict() for server in snapshot.servers],
+        'tunnels': [tunnel.to_dict() for tunnel in snapshot.tunnels],
+        'containers': [container.to_dict() for container in snapshot.containers],
+        'health': {str(port): dict(health) for port, health in sorted(snapshot.health.items())},
+        'resources': {pid: dict(usage) for pid, usage in sorted(snapshot.resources.items(), key=lambda item: int(item[0]))},
+        'stale': sorted(snapshot.stale)
+    }
@@ -0,0 +1,336 @@
+"""
+Project discovery - scan a workspace tree in parallel for projects LocalServers can run
+
+Directories are listed with `os.scandir` on a thread pool, skipping dependency
+and build folders. A directory that is a project is not descended into, except
+monorepo roots (npm/yarn/pnpm workspaces, Cargo and Go workspaces), whose
+member packages are reported with the root as their `workspace`. Results are
+cached per directory on the directory's and its manifests' mtimes, so a rescan
+only lists and re-parses what changed.
+"""
+
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Never descended into (hidden directories are skipped too)
+PRUNE = frozenset((
+    'node_modules', 'bower_components', 'vendor', 'venv', 'env', '__pycache__', 'site-packages',
+    'target', 'dist', 'build', 'out', 'coverage', 'tmp', 'Pods', 'DerivedData', 'Library',
+))
+
+# Files that decide a directory's project type; their mtimes key the cache
+MANIFESTS = (
+    'package.json', 'pnpm-workspace.yaml', 'requirements.txt', 'pyproject.toml', 'manage.py', 'app.py',
+    'Cargo.toml', 'go.mod', 'go.work', 'Gemfile',
+)
+
+# First port tried for each project type when registering
+DEFAULT_PORTS = {
+    'Next.js': 3000, 'Node.js': 3000, 'Ruby/Rails': 3000,
+    'Flask': 5000, 'Django': 8000, 'Python': 8000, 'Rust': 8080, 'Go': 8080,
+}
+
+CACHE_VERSION = 1
+
+
+def _read_package(directory):
+    try:
+        with open(os.path.join(directory, 'package.json'), 'r') as f:
+            package = json.load(f)
+        return package if isinstance(package, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _section(package, key):
+    """A package.json section that should be an object ({} when missing, null or anything else)"""
+    value = package.get(key)
+    return value if isinstance(value, dict) else {}
+
+
+def classify_project(directory, names, strict=False):
+    """(type, command, is_workspace_root) for a directory whose entries are `names`
+
+    Only `package.json` (and a Cargo.toml naming a workspace) is read; everything
+    else is decided from the file names, so no `exists()` calls are needed.
+
+    With `strict` (the project scanner), a package.json with nothing to run (a
+    library) and a workspace root are not projects themselves. Without it a
+    folder is classified as the Add Server dialog always has, workspace or not.
+    """
+    if 'package.json' in names:
+        package = _read_package(directory)
+        workspace = bool(package.get('workspaces')) or 'pnpm-workspace.yaml' in names
+        dependencies = {**_section(package, 'devDependencies'), **_section(package, 'dependencies')}
+        scripts = _section(package, 'scripts')
+
+        if 'next' in dependencies:
+            return ('Next.js', 'npm run dev', workspace)
+        if 'dev' in scripts:
+            return ('Node.js', 'npm run dev', workspace)
+        if 'start' in scripts or not strict:
+            return ('Node.js', 'npm start', workspace)
+        # A library, or a workspace root with nothing to run itself
+        return (None, None, workspace)
+
+    if 'requirements.txt' in names or 'pyproject.toml' in names:
+        if 'manage.py' in names:
+            return ('Django', 'python manage.py runserver', False)
+        if 'app.py' in names:
+            return ('Flask', 'python app.py', False)
+        return ('Python', 'python main.py', False)
+
+    if 'Cargo.toml' in names:
+        workspace = False
+        try:
+            with open(os.path.join(directory, 'Cargo.toml'), 'r') as f:
+                workspace = any(line.strip() == '[workspace]' for line in f)
+        except OSError:
+            pass
+        if workspace and strict:
+            return (None, None, True)
+        return ('Rust', 'cargo run', workspace)
+
+    workspace = 'go.work' in names
+    if 'go.mod' in names and not (workspace and strict):
+        return ('Go', 'go run .', workspace)
+    if workspace and strict:
+        return (None, None, True)
+
+    if 'Gemfile' in names:
+        return ('Ruby/Rails', 'rails server', False)
+
+    return (None, None, workspace)
+
+
+def command_for_port(project_type, command, port):
+    """The suggested command, told which port to listen on"""
+    if project_type == 'Django':
+        return f"{command} {port}"
+    if project_type == 'Ruby/Rails':
+        return f"{command} -p {port}"
+    # npm scripts, Flask apps reading $PORT, Go and Rust servers conventionally honour PORT
+    return f"PORT={port} {command}"
+
+
+def assign_ports(projects, taken):
+    """Give each project its type's default port, or the next one up not in `taken` (updated in place)"""
+    ports = {}
+    for project in projects:
+        port = DEFAULT_PORTS.get(project['type'], 3000)
+        while port in taken:
+            port += 1
+        taken.add(port)
+        ports[project['directory']] = port
+    return ports
+
+
+def select(projects, text):
+    """Projects picked by "all" or 1-based numbers and ranges like "1,3,5-8" """
+    text = text.strip().lower()
+    if text in ('all', '*'):
+        return list(projects)
+
+    picked = set()
+    for part in text.replace(' ', ',').split(','):
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        try:
+            picked.update(range(int(first), int(last or first) + 1))
+        except ValueError:
+            continue
+    return [project for i, project in enumerate(projects, 1) if i in picked]
+
+
+def listening_ports(snapshot):
+    """Ports in use in a collector snapshot (servers and published container ports), for `register`'s `taken`"""
+    if snapshot is None:
+        return set()
+    ports = {server.port for server in snapshot.servers}
+    ports.update(container.host_port for container in snapshot.containers)
+    return ports
+
+
+def register(managed_servers, projects, taken=()):
+    """Add `projects` to `managed_servers` on free ports; returns {port: server} for the ones added
+
+    Directories that are already managed are skipped. Ports already managed or
+    in `taken` (e.g. listening right now) are never handed out.
+    """
+    known = {os.path.normpath(server.get('directory', '')) for server in managed_servers.values()}
+    new = [project for project in projects if os.path.normpath(project['directory']) not in known]
+    ports = assign_ports(new, {int(port) for port in managed_servers if str(port).isdigit()} | set(taken))
+
+    added = {}
+    for project in new:
+        port = ports[project['directory']]
+        server = {
+            'directory': project['directory'],
+            'command': command_for_port(project['type'], project['command'], port),
+            'type': project['type'],
+            'name': project['name'],
+        }
+        if project.get('workspace'):
+            # Monorepo members are stopped and restarted together as a group
+            server['group'] = os.path.basename(project['workspace'])
+            server['name'] = f"{server['group']}/{project['name']}"
+        added[str(port)] = managed_servers[str(port)] = server
+    return added
+
+
+class ProjectScanner:
+    """Finds runnable projects under a root directory, remembering what it saw between scans"""
+
+    def __init__(self, cache_path=None, max_depth=4, max_workers=16):
+        self.cache_path = cache_path
+        self.max_depth = max_depth
+        self.max_workers = max_workers
+        self._cache = {}  # directory -> {'mtime', 'subdirs', 'manifests', 'project', 'workspace'}
+        self._visited = set()
+        self._lock = threading.Lock()
+        self.stats = {'listed': 0, 'reused': 0, 'classified': 0}
+        self._load()
+
+    def scan(self, root):
+        """Projects under `root` as dicts: directory, name, type, command, workspace (root path or None)"""
+        root = os.path.abspath(os.path.expanduser(root))
+        self.stats = {'listed': 0, 'reused': 0, 'classified': 0}
+        self._visited = set()
+        projects = []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='localservers-discover') as pool:
+            pending = {pool.submit(self._visit, root, None): 0}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    depth = pending.pop(future)
+                    try:
+                        directory, project, is_workspace, subdirs, workspace = future.result()
+                    except Exception:
+                        # One unreadable project (or a bug classifying it) doesn't end the scan
+                        continue
+                    if project is not None:
+                        projects.append({**project, 'workspace': workspace})
+
+                    # Stop at a project (its subfolders are its sources), but go on into monorepo roots
+                    if depth >= self.max_depth or (project is not None and not is_workspace):
+                        continue
+                    member_of = directory if is_workspace else workspace
+                    for name in subdirs:
+                        child = os.path.join(directory, name)
+                        pending[pool.submit(self._visit, child, member_of)] = depth + 1
+
+        with self._lock:
+            # Forget directories under `root` that are gone (or now pruned)
+            prefix = root.rstrip(os.sep) + os.sep
+            for directory in [d for d in self._cache if d.startswith(prefix) and d not in self._visited]:
+                del self._cache[directory]
+        self._save()
+        return sorted(projects, key=lambda project: project['directory'])
+
+    def _visit(self, directory, workspace):
+        """(directory, project or None, is_workspace_root, subdirectories, workspace) for one directory"""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return directory, None, False, [], workspace
+
+        with self._lock:
+            cached = self._cache.get(directory)
+            self._visited.add(directory)
+
+        if cached is not None and cached['mtime'] == mtime:
+            # Same entries as last time: only the manifests' contents can have changed
+            subdirs = cached['subdirs']
+            manifests = self._manifest_mtimes(directory, cached['manifests'])
+            if manifests == cached['manifests']:
+                self._count('reused')
+                return directory, cached['project'], cached['workspace'], subdirs, workspace
+            names = set(cached['manifests'])
+        else:
+            self._count('listed')
+            subdirs = []
+            names = set()
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.name in MANIFESTS:
+                            names.add(entry.name)
+                        elif (
+                            not entry.name.startswith('.') and entry.name not in PRUNE
+                            and entry.is_dir(follow_symlinks=False)
+                        ):
+                            subdirs.append(entry.name)
+            except OSError:
+                return directory, None, False, [], workspace
+            subdirs.sort()
+            manifests = self._manifest_mtimes(directory, names)
+
+        self._count('classified')
+        project_type, command, is_workspace = classify_project(directory, names, strict=True)
+        project = {
+            'directory': directory,
+            'name': os.path.basename(directory),
+            'type': project_type,
+            'command': command,
+        } if project_type else None
+
+        with self._lock:
+            self._cache[directory] = {
+                'mtime': mtime,
+                'subdirs': subdirs,
+                'manifests': manifests,
+                'project': project,
+                'workspace': is_workspace,
+            }
+        return directory, project, is_workspace, subdirs, workspace
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    @staticmethod
+    def _manifest_mtimes(directory, names):
+        mtimes = {}
+        for name in names:
+            try:
+                mtimes[name] = os.stat(os.path.join(directory, name)).st_mtime_ns
+            except OSError:
+                pass
+        return mtimes
+
+    def _load(self):
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict) and data.get('version') == CACHE_VERSION:
+            self._cache = data.get('directories', {})
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        directory = os.path.dirname(self.cache_path)
+        try:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+            fd, temp = tempfile.mkstemp(prefix='.discovery-', suffix='.json', dir=directory)
+        except OSError:
+            return  # only a cache
+        try:
+            with os.fdopen(fd, 'w') as f:
+                with self._lock:
+                    json.dump({'version': CACHE_VERSION, 'directories': self._cache}, f)
+            os.replace(temp, self.cache_path)
+        except (OSError, TypeError, ValueError):
+            # Only a cache; don't leave the half-written temp file behind
+            try:
+                os.unlink(temp)
+            except OSError:
+                pass
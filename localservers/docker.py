@@ -0,0 +1,297 @@
+"""
+Docker - container/port index kept current from the Engine API event stream
+"""
+
+import http.client
+import json
+import os
+import re
+import socket
+import subprocess
+import threading
+from urllib.parse import quote
+
+from localservers.model import Container, port_number
+
+DEFAULT_SOCKETS = (
+    '/var/run/docker.sock',
+    '~/.docker/run/docker.sock',
+    '~/.orbstack/run/docker.sock',
+    '~/.colima/default/docker.sock',
+)
+
+# Events that change which containers are running or what they are called
+WATCHED_EVENTS = ('start', 'die', 'stop', 'kill', 'destroy', 'pause', 'unpause', 'rename')
+
+
+def image_name(image):
+    """Image without its tag (registry ports are kept)"""
+    name, sep, tag = image.rpartition(':')
+    if sep and '/' not in tag:
+        return name
+    return image
+
+
+def port_mappings(container):
+    """Containers for one Engine API list entry, one per published TCP port"""
+    name = (container.get('Names') or ['?'])[0].lstrip('/')
+    image = image_name(container.get('Image', ''))
+    container_id = container.get('Id', '')[:12]
+    project = (container.get('Labels') or {}).get('com.docker.compose.project')
+
+    seen = set()
+    mappings = []
+    for port in container.get('Ports') or ():
+        if port.get('Type') != 'tcp' or not port.get('PublicPort'):
+            continue
+
+        # The same mapping is reported once per address family (0.0.0.0 and ::)
+        key = (port['PublicPort'], port.get('PrivatePort'))
+        if key in seen:
+            continue
+        seen.add(key)
+
+        mappings.append(Container(
+            container_id, name, image, int(port['PublicPort']), port_number(port.get('PrivatePort')), project
+        ))
+
+    return mappings
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a unix socket"""
+
+    def __init__(self, socket_path, timeout=3):
+        super(UnixHTTPConnection, self).__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        # Kept after http.client hands the socket over to a streamed response
+        self.sock = self.unix_socket = sock
+
+
+class DockerEngine:
+    """Minimal Engine API client reusing one keep-alive connection"""
+
+    def __init__(self, socket_path, timeout=3):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._conn = None
+
+    def get_json(self, path):
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = UnixHTTPConnection(self.socket_path, self.timeout)
+            try:
+                self._conn.request('GET', path)
+                response = self._conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # Daemon closed the idle keep-alive connection; retry once on a fresh one
+                self.close()
+                if attempt == 2:
+                    raise
+                continue
+
+            if response.status != 200:
+                raise RuntimeError(f"Docker API {path} returned {response.status}")
+            return json.loads(body)
+
+    def list_containers(self, container_id=None):
+        path = '/containers/json'
+        if container_id:
+            path += '?filters=' + quote(json.dumps({'id': [container_id]}))
+        return self.get_json(path)
+
+    def events(self):
+        """Open the container event stream on its own connection (no read timeout)"""
+        conn = UnixHTTPConnection(self.socket_path, timeout=None)
+        filters = quote(json.dumps({'type': ['container'], 'event': list(WATCHED_EVENTS)}))
+        conn.request('GET', f'/events?filters={filters}')
+        response = conn.getresponse()
+        if response.status != 200:
+            conn.close()
+            raise RuntimeError(f"Docker API /events returned {response.status}")
+        return conn, response
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class DockerSource:
+    """Running containers from a local index, seeded by one list call and updated from /events
+
+    A watcher thread owns the event stream. While Docker is not running it
+    retries with backoff and the index is empty; nothing is forked.
+    """
+
+    name = 'engine'
+
+    def __init__(self, socket_path, max_backoff=30):
+        self.engine = DockerEngine(socket_path)
+        self.max_backoff = max_backoff
+        self._index = {}  # full container id -> list of container dicts
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._stream = None
+        self._thread = None
+
+    def containers(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name='localservers-docker', daemon=True)
+            self._thread.start()
+
+        # Only the very first call waits, for the initial list
+        self._ready.wait(self.engine.timeout)
+        with self._lock:
+            return [c for mappings in self._index.values() for c in mappings]
+
+    def stop(self):
+        self._stopped.set()
+        stream = self._stream
+        if stream is not None:
+            # Wake the watcher blocked reading the stream (close() would wait for that read); it closes the rest
+            try:
+                stream.unix_socket.shutdown(socket.SHUT_RDWR)
+            except (AttributeError, OSError):
+                pass
+
+    def _watch(self):
+        backoff = 1
+        while not self._stopped.is_set():
+            try:
+                # Subscribe before listing so nothing that happens in between is missed
+                self._stream, response = self.engine.events()
+                self._seed()
+            except (OSError, ValueError, RuntimeError, http.client.HTTPException):
+                # Docker is not running (or not answering): nothing to show until it is
+                self._close_stream()
+                with self._lock:
+                    self._index = {}
+                self._ready.set()
+                self._stopped.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+
+            self._ready.set()
+            backoff = 1
+
+            try:
+                for line in response:
+                    if line.strip():
+                        self._apply(json.loads(line))
+            except (OSError, ValueError, RuntimeError, http.client.HTTPException):
+                pass
+            finally:
+                self._close_stream()
+
+            # Stream dropped; keep the index and reconnect (re-seeding) shortly
+            self._stopped.wait(1)
+
+    def _close_stream(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+        self.engine.close()
+
+    def _seed(self):
+        index = {}
+        for container in self.engine.list_containers():
+            index[container['Id']] = port_mappings(container)
+        with self._lock:
+            self._index = index
+
+    def _apply(self, event):
+        container_id = event.get('id') or event.get('Actor', {}).get('ID')
+        if not container_id:
+            return
+
+        action = event.get('Action') or event.get('status', '')
+        if action in ('die', 'stop', 'kill', 'destroy', 'pause'):
+            with self._lock:
+                self._index.pop(container_id, None)
+            return
+
+        # start / unpause / rename: fetch just this container in list format
+        listed = self.engine.list_containers(container_id)
+        with self._lock:
+            if listed:
+                self._index[container_id] = port_mappings(listed[0])
+            else:
+                self._index.pop(container_id, None)
+
+
+class CliDockerSource:
+    """Fallback for machines without a reachable Engine socket: `docker ps` per refresh"""
+
+    name = 'cli'
+
+    def containers(self):
+        containers = []
+        try:
+            result = subprocess.run(
+                ['docker', 'ps', '--format', '{{.ID}}|{{.Names}}|{{.Ports}}|{{.Image}}|{{.Label "com.docker.compose.project"}}'],
+                capture_output=True,
+                text=True,
+                timeout=3
+            )
+        except FileNotFoundError:
+            # Docker not installed
+            return containers
+
+        if result.returncode != 0:
+            return containers
+
+        for line in result.stdout.strip().split('\n'):
+            parts = line.split('|')
+            if len(parts) < 4:
+                continue
+
+            container_id, name, ports_str, image = parts[0][:12], parts[1], parts[2], parts[3]
+            project = (parts[4] or None) if len(parts) > 4 else None
+
+            # Example: 0.0.0.0:3000->3000/tcp, :::3000->3000/tcp, 127.0.0.1:5432->5432/tcp
+            seen = set()
+            for host_port, container_port in re.findall(r':(\d+)->(\d+)/tcp', ports_str):
+                if (host_port, container_port) in seen:
+                    continue
+                seen.add((host_port, container_port))
+
+                containers.append(Container(container_id, name, image_name(image), int(host_port), int(container_port), project))
+
+        return containers
+
+    def stop(self):
+        pass
+
+
+def find_docker_socket():
+    """Engine socket from DOCKER_HOST or the usual Docker Desktop / OrbStack / Colima locations"""
+    docker_host = os.environ.get('DOCKER_HOST', '')
+    if docker_host.startswith('unix://'):
+        candidates = (docker_host[len('unix://'):],)
+    elif docker_host:
+        # TCP/SSH daemons are left to the CLI
+        return None
+    else:
+        candidates = DEFAULT_SOCKETS
+
+    for path in candidates:
+        path = os.path.expanduser(path)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def get_docker_source():
+    """Event-driven Engine API source when a socket is reachable, otherwise the CLI"""
+    socket_path = find_docker_socket()
+    if socket_path:
+        return DockerSource(socket_path)
+    return CliDockerSource()
@@ -0,0 +1,173 @@
+"""
+Command fixtures - record, synthesize and replay the output of lsof, ps, docker and tailscale
+
+Detection shells out through `subprocess.run`. A `CommandFixtures` set can
+stand in for it: `replay()` answers every call from the recorded output (and
+counts the calls), `record()` runs the real commands and keeps what they
+printed. `synthesize()` builds fixtures for any number of listeners,
+process-tree depth, containers and tunnels, so detection can be measured at
+sizes no real machine has.
+"""
+
+import json
+import os
+import subprocess
+from collections import Counter
+from contextlib import contextmanager
+
+
+def command_key(argv):
+    """Command and subcommand words before the first flag, e.g. ('tailscale', 'serve', 'status')"""
+    key = []
+    for word in argv:
+        if word.startswith('-'):
+            break
+        key.append(os.path.basename(word) if not key else word)
+    return tuple(key)
+
+
+class MissingFixture(LookupError):
+    """A command ran during replay that the fixture set has no output for"""
+
+
+class CommandFixtures:
+    """Recorded command outputs, matched by exact argv first and then by `command_key`"""
+
+    def __init__(self, entries=()):
+        self.entries = [dict(entry) for entry in entries]
+        self.calls = Counter()  # command_key -> calls made during replay
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            return cls(json.load(f))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.entries, f, indent=2)
+
+    def add(self, argv, stdout='', returncode=0, stderr='', missing=False):
+        """Add one command's output; `missing` replays as the command not being installed"""
+        entry = {'argv': list(argv), 'stdout': stdout, 'stderr': stderr, 'returncode': returncode}
+        if missing:
+            entry['missing'] = True
+        self.entries.append(entry)
+        return self
+
+    def lookup(self, argv):
+        argv = list(argv)
+        for entry in self.entries:
+            if entry['argv'] == argv:
+                return entry
+
+        key = command_key(argv)
+        for entry in self.entries:
+            if command_key(entry['argv']) == key:
+                return entry
+
+        raise MissingFixture(' '.join(argv))
+
+    @property
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    @contextmanager
+    def replay(self):
+        """Answer `subprocess.run` from the fixtures for the duration of the block"""
+        real_run = subprocess.run
+
+        def run(argv, *args, **kwargs):
+            self.calls[command_key(argv)] += 1
+            entry = self.lookup(argv)
+            if entry.get('missing'):
+                raise FileNotFoundError(2, 'No such file or directory', argv[0])
+            stdout, stderr = entry['stdout'], entry.get('stderr', '')
+            if not kwargs.get('text') and not kwargs.get('universal_newlines'):
+                stdout, stderr = stdout.encode(), stderr.encode()
+            return subprocess.CompletedProcess(argv, entry.get('returncode', 0), stdout, stderr)
+
+        subprocess.run = run
+        try:
+            yield self
+        finally:
+            subprocess.run = real_run
+
+    @contextmanager
+    def record(self):
+        """Run commands for real and keep their output for the duration of the block"""
+        real_run = subprocess.run
+
+        def run(argv, *args, **kwargs):
+            try:
+                result = real_run(argv, *args, **kwargs)
+            except FileNotFoundError:
+                self.add(argv, missing=True)
+                raise
+            stdout, stderr = result.stdout or '', result.stderr or ''
+            if isinstance(stdout, bytes):
+                stdout, stderr = stdout.decode('utf-8', 'replace'), stderr.decode('utf-8', 'replace')
+            self.add(argv, stdout, result.returncode, stderr)
+            return result
+
+        subprocess.run = run
+        try:
+            yield self
+        finally:
+            subprocess.run = real_run
+
+
+def synthesize(listeners=10, depth=3, containers=0, tunnels=0, config_dir=None):
+    """Fixtures for a machine with `listeners` servers, each `depth` processes below launchd
+
+    Cloudflare tunnels need config files, which are written to `config_dir`.
+    """
+    fixtures = CommandFixtures()
+    runtimes = ('node', 'python3', 'ruby', 'java', 'deno', 'bun', 'php', 'cargo')
+
+    # One shared chain of shells under launchd, then one server per listener at the bottom
+    started = 'Mon Oct 13 09:12:01 2026'
+    ps_lines = [f'    1     0 {started} /sbin/launchd']
+    parent = '1'
+    for level in range(depth):
+        pid = str(100 + level)
+        ps_lines.append(f"{pid:>5} {parent:>5} {started} /bin/zsh -l")
+        parent = pid
+
+    # Tailscale is running but has no serve config (exercises the status calls and their fallback)
+    ps_lines.append(f'   50     1 {started} /usr/local/bin/tailscaled')
+
+    lsof_lines = ['COMMAND     PID  USER   FD   TYPE             DEVICE SIZE/OFF NODE NAME']
+    for i in range(listeners):
+        pid = str(10000 + i)
+        port = 3000 + i
+        runtime = runtimes[i % len(runtimes)]
+        ps_lines.append(f"{pid:>5} {parent:>5} {started} {runtime} server.js --port {port}")
+        lsof_lines.append(f"{runtime:<10} {pid} dev   23u  IPv4 0x{i:016x}      0t0  TCP *:{port} (LISTEN)")
+
+    docker_lines = []
+    for i in range(containers):
+        host_port = 40000 + i
+        docker_lines.append(
+            f"{i:012x}|service-{i}|0.0.0.0:{host_port}->80/tcp, :::{host_port}->80/tcp|nginx:1.{i % 30}|stack-{i % 8}"
+        )
+
+    for i in range(tunnels):
+        pid = str(90000 + i)
+        config_path = os.path.join(config_dir, f'tunnel-{i}.yml')
+        with open(config_path, 'w') as f:
+            f.write(
+                f"tunnel: {i:08x}-tunnel\n"
+                f"ingress:\n"
+                f"  - hostname: app-{i}.example.com\n"
+                f"    service: http://localhost:{3000 + i}\n"
+                f"  - service: http_status:404\n"
+            )
+        ps_lines.append(f"{pid:>5}     1 {started} /usr/local/bin/cloudflared tunnel --config {config_path} run")
+
+    fixtures.add(['ps', '-axww', '-o', 'pid=,ppid=,lstart=,args='], '\n'.join(ps_lines) + '\n')
+    fixtures.add(['ps', 'eww', '-o', 'command=', '-p', '1'], '')
+    fixtures.add(['lsof', '-iTCP', '-sTCP:LISTEN', '-nP'], '\n'.join(lsof_lines) + '\n')
+    fixtures.add(['docker', 'ps'], '\n'.join(docker_lines) + '\n' if docker_lines else '')
+    fixtures.add(['tailscale', 'status', '--json'], '{}', returncode=1)
+    fixtures.add(['tailscale', 'serve', 'status', '--json'], '{}', returncode=1)
+    return fixtures
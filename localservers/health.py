@@ -0,0 +1,159 @@
+"""
+Health probing - HTTP status and latency for every listening port, over pooled keep-alive connections
+"""
+
+import http.client
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Ports that don't speak HTTP (databases, caches) are re-checked only every this many rounds
+NOT_HTTP_RECHECK = 20
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a non-empty sequence"""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class PortHealth:
+    """Pooled connection and recent results for one port"""
+
+    def __init__(self, port, window):
+        self.port = port
+        self.conn = None
+        self.method = 'HEAD'
+        self.latencies = deque(maxlen=window)  # seconds, successful probes only
+        self.code = None
+        self.error = None
+        self.status = None
+        self.probed_round = -1
+        self.answered = False  # has ever sent an HTTP response
+
+    def summary(self):
+        latencies = self.latencies
+        return {
+            'status': self.status,
+            'code': self.code,
+            'error': self.error,
+            'p50_ms': round(percentile(latencies, 0.5) * 1000) if latencies else None,
+            'p99_ms': round(percentile(latencies, 0.99) * 1000) if latencies else None,
+        }
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class HealthProber:
+    """Probes ports concurrently on a small pool, at most `max_probes` ports per round
+
+    Each port keeps one keep-alive connection between rounds. A port answers
+    'up', 'slow' (p50 above `slow_ms`) or 'erroring' (5xx, refused, timed out);
+    ports that answer with something other than HTTP, or that never answered
+    HTTP and hang up on a fresh connection without a word (PostgreSQL), are
+    'not-http' and are only re-checked occasionally. With more ports than `max_probes`, the ones
+    probed longest ago go first, so a round never costs more than
+    `max_probes / max_workers` timeouts.
+    """
+
+    def __init__(self, timeout=2, slow_ms=500, max_workers=16, max_probes=32, window=50):
+        self.timeout = timeout
+        self.slow_ms = slow_ms
+        self.max_probes = max_probes
+        self.window = window
+        self._ports = {}  # port -> PortHealth
+        self._round = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='localservers-probe')
+
+    def probe(self, ports):
+        """Probe a bounded batch of `ports`; returns {port: summary} for every port with a result"""
+        ports = set(ports)
+        with self._lock:
+            self._round += 1
+
+            # Forget (and disconnect from) ports that stopped listening
+            for port in set(self._ports) - ports:
+                self._ports.pop(port).close()
+            for port in ports - set(self._ports):
+                self._ports[port] = PortHealth(port, self.window)
+
+            candidates = [
+                health for health in self._ports.values()
+                if health.status != 'not-http' or self._round - health.probed_round >= NOT_HTTP_RECHECK
+            ]
+            candidates.sort(key=lambda health: health.probed_round)
+            batch = candidates[:self.max_probes]
+
+            for _ in self._executor.map(self._probe_one, batch):
+                pass
+
+            return {
+                port: health.summary()
+                for port, health in self._ports.items()
+                if health.status is not None
+            }
+
+    def close(self):
+        with self._lock:
+            for health in self._ports.values():
+                health.close()
+        self._executor.shutdown(wait=False)
+
+    def _probe_one(self, health):
+        health.probed_round = self._round
+
+        for attempt in (1, 2, 3):
+            reused = health.conn is not None
+            if health.conn is None:
+                health.conn = http.client.HTTPConnection('localhost', health.port, timeout=self.timeout)
+
+            started = time.perf_counter()
+            try:
+                health.conn.request(health.method, '/', headers={'User-Agent': 'LocalServers health check'})
+                response = health.conn.getresponse()
+                response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                # The server dropped an idle keep-alive connection; one retry on a fresh one
+                health.close()
+                if reused and attempt == 1:
+                    continue
+                if not reused and not health.answered:
+                    # Closed on us before any HTTP was spoken: a database or other non-HTTP protocol
+                    return self._failed(health, 'not-http', 'not an HTTP server')
+                return self._failed(health, 'erroring', type(e).__name__)
+            except (http.client.BadStatusLine, http.client.LineTooLong):
+                health.close()
+                return self._failed(health, 'not-http', 'not an HTTP server')
+            except (socket.timeout, OSError, http.client.HTTPException) as e:
+                health.close()
+                return self._failed(health, 'erroring', str(e) or type(e).__name__)
+
+            elapsed = time.perf_counter() - started
+            health.answered = True
+
+            if response.status in (405, 501) and health.method == 'HEAD':
+                # Some servers only implement GET; remember and ask again
+                health.method = 'GET'
+                continue
+
+            health.latencies.append(elapsed)
+            health.code = response.status
+            health.error = None
+            if response.status >= 500:
+                health.status = 'erroring'
+            elif percentile(health.latencies, 0.5) * 1000 > self.slow_ms:
+                health.status = 'slow'
+            else:
+                health.status = 'up'
+            return
+
+    def _failed(self, health, status, error):
+        health.status = status
+        health.code = None
+        health.error = error
@@ -0,0 +1,321 @@
+"""
+Port history - up/down intervals of servers, tunnels and containers in SQLite, kept across runs
+
+The recorder subscribes to the collector's events, so it writes nothing while
+nothing changes. Events are queued in memory and written by one thread in a
+single transaction every `flush_interval` seconds (WAL mode, so readers such
+as `--history` never block it). Intervals older than `raw_days` are folded
+into per-day totals in bounded batches, and totals older than `daily_days`
+are dropped, so the file stops growing and a write never scans it.
+"""
+
+import datetime
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from localservers.model import EVENT_KINDS
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS intervals (
+    id INTEGER PRIMARY KEY,
+    section TEXT NOT NULL,     -- servers, tunnels or containers
+    key TEXT NOT NULL,         -- the record's key as text ("3000", "app.example.com:3000", "<id>:8080")
+    port INTEGER,              -- local port
+    label TEXT,                -- server type, tunnel display or container image
+    detail TEXT,               -- process command, tunnel service or container name
+    pid TEXT,
+    started REAL NOT NULL,
+    ended REAL,                -- NULL while still up
+    reason TEXT                -- why it ended: down, restarted (new PID on the port) or untracked
+);
+CREATE INDEX IF NOT EXISTS intervals_open ON intervals (section, key) WHERE ended IS NULL;
+CREATE INDEX IF NOT EXISTS intervals_port ON intervals (port, started);
+CREATE INDEX IF NOT EXISTS intervals_ended ON intervals (ended);
+CREATE TABLE IF NOT EXISTS daily (
+    section TEXT NOT NULL,
+    key TEXT NOT NULL,
+    day TEXT NOT NULL,         -- local date, YYYY-MM-DD
+    port INTEGER,
+    label TEXT,
+    up_seconds REAL NOT NULL DEFAULT 0,
+    starts INTEGER NOT NULL DEFAULT 0,
+    restarts INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (section, key, day)
+);
+CREATE INDEX IF NOT EXISTS daily_port ON daily (port, day);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value);
+"""
+
+SCHEMA_VERSION = 1
+
+DURATION_UNITS = {'m': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+
+
+def parse_time(text, now=None):
+    """Seconds since the epoch from "90m"/"24h"/"7d"/"2w" ago, an ISO local time, or a number"""
+    now = time.time() if now is None else now
+    text = str(text).strip()
+    match = re.fullmatch(r'(\d+(?:\.\d+)?)\s*([mhdw])', text)
+    if match:
+        return now - float(match.group(1)) * DURATION_UNITS[match.group(2)]
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    # Naive times are local, as typed
+    return datetime.datetime.fromisoformat(text.replace(' ', 'T')).timestamp()
+
+
+def _key_text(key):
+    return ':'.join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+
+
+def _describe(record):
+    """(port, label, detail, pid) stored for a server, tunnel or container"""
+    if record.section == 'servers':
+        return record.port, record.type, record.command, record.pid
+    if record.section == 'tunnels':
+        return record.port, record.display, record.service, record.pid
+    return record.host_port, record.image, record.name, None
+
+
+def _day(at):
+    return time.strftime('%Y-%m-%d', time.localtime(at))
+
+
+def _day_spans(started, ended):
+    """(local day, seconds) for each day an interval covers"""
+    spans = []
+    while started < ended:
+        midnight = datetime.datetime.fromtimestamp(started).date() + datetime.timedelta(days=1)
+        boundary = min(ended, datetime.datetime.combine(midnight, datetime.time()).timestamp())
+        spans.append((_day(started), boundary - started))
+        started = boundary
+    return spans
+
+
+class History:
+    """Records collector events as intervals (`record` is the subscriber) and answers history queries
+
+    Only `start()` opens the database for writing; an instance that is never
+    started (the CLI) just reads.
+    """
+
+    def __init__(self, path, flush_interval=15, raw_days=7, daily_days=365,
+                 retention_interval=600, retention_batch=1000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.raw_days = raw_days
+        self.daily_days = daily_days
+        self.retention_interval = retention_interval
+        self.retention_batch = retention_batch
+        self._pending = []   # ('open', section, key, port, label, detail, pid, at) / ('close', section, key, at, reason)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._last_retention = 0
+
+    # Writing
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='localservers-history', daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout=5):
+        """Write what is queued, end every open interval (we stop watching) and stop the writer"""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def record(self, events, snapshot):
+        """Collector subscriber: queue the snapshot's up/down events (no I/O on the collector thread)"""
+        operations = []
+        for event in events:
+            up, down, pid_changed, _ = EVENT_KINDS[event.section]
+            key = _key_text(event.key)
+            if event.kind in (down, pid_changed):
+                reason = 'restarted' if event.kind == pid_changed else 'down'
+                operations.append(('close', event.section, key, snapshot.taken_at, reason))
+            if event.kind in (up, pid_changed):
+                operations.append(('open', event.section, key, *_describe(event.new), snapshot.taken_at))
+
+        if operations:
+            with self._lock:
+                self._pending.extend(operations)
+
+    def _run(self):
+        try:
+            connection = self._connect()
+        except (OSError, sqlite3.Error):
+            return  # history is best effort; detection carries on without it
+
+        with connection:
+            # Intervals left open by a run that didn't shut down cleanly end when it was last seen
+            connection.execute(
+                "UPDATE intervals SET ended = MAX(started, COALESCE((SELECT value FROM meta WHERE name = 'last_seen'), started)),"
+                " reason = 'untracked' WHERE ended IS NULL"
+            )
+
+        while True:
+            stopping = self._stopped.is_set()
+            try:
+                self._flush(connection, closing=stopping)
+                self._retain(connection)
+            except sqlite3.Error:
+                pass  # e.g. disk full; the next flush tries again with what is queued then
+            if stopping:
+                break
+            self._wake.wait(self.flush_interval)
+        connection.close()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.executescript(SCHEMA)
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (SCHEMA_VERSION,))
+        return connection
+
+    def _flush(self, connection, closing=False):
+        with self._lock:
+            operations, self._pending = self._pending, []
+
+        now = time.time()
+        try:
+            self._apply(connection, operations, now, closing)
+        except sqlite3.Error:
+            # Kept, in order, ahead of anything queued since
+            with self._lock:
+                self._pending[:0] = operations
+            raise
+
+    @staticmethod
+    def _apply(connection, operations, now, closing):
+        with connection:
+            for operation in operations:
+                if operation[0] == 'open':
+                    connection.execute(
+                        "INSERT INTO intervals (section, key, port, label, detail, pid, started) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        operation[1:]
+                    )
+                else:
+                    _, section, key, at, reason = operation
+                    connection.execute(
+                        "UPDATE intervals SET ended = ?, reason = ? WHERE section = ? AND key = ? AND ended IS NULL",
+                        (at, reason, section, key)
+                    )
+            if closing:
+                connection.execute("UPDATE intervals SET ended = ?, reason = 'untracked' WHERE ended IS NULL", (now,))
+            connection.execute("INSERT OR REPLACE INTO meta VALUES ('last_seen', ?)", (now,))
+
+    def _retain(self, connection):
+        """Fold intervals older than raw_days into daily totals, a bounded batch at a time"""
+        now = time.time()
+        if now - self._last_retention < self.retention_interval:
+            return
+        self._last_retention = now
+
+        rows = connection.execute(
+            "SELECT id, section, key, port, label, started, ended, reason FROM intervals"
+            " WHERE ended IS NOT NULL AND ended < ? ORDER BY ended LIMIT ?",
+            (now - self.raw_days * 86400, self.retention_batch)
+        ).fetchall()
+
+        with connection:
+            for row_id, section, key, port, label, started, ended, reason in rows:
+                for index, (day, seconds) in enumerate(_day_spans(started, ended) or [(_day(started), 0)]):
+                    starts = 1 if index == 0 else 0
+                    restarts = 1 if reason == 'restarted' and day == _day(ended) else 0
+                    connection.execute(
+                        "INSERT INTO daily (section, key, day, port, label, up_seconds, starts, restarts)"
+                        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                        " ON CONFLICT (section, key, day) DO UPDATE SET up_seconds = up_seconds + excluded.up_seconds,"
+                        " starts = starts + excluded.starts, restarts = restarts + excluded.restarts, label = excluded.label",
+                        (section, key, day, port, label, seconds, starts, restarts)
+                    )
+                connection.execute("DELETE FROM intervals WHERE id = ?", (row_id,))
+            connection.execute("DELETE FROM daily WHERE day < ?", (_day(now - self.daily_days * 86400),))
+
+    # Reading (own short-lived connection, so any thread can query)
+
+    def _query(self, sql, parameters):
+        if not os.path.exists(self.path):
+            return []
+        connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=5)
+        try:
+            return connection.execute(sql, parameters).fetchall()
+        except sqlite3.Error:
+            return []
+        finally:
+            connection.close()
+
+    def _last_seen(self):
+        rows = self._query("SELECT value FROM meta WHERE name = 'last_seen'", ())
+        return rows[0][0] if rows else None
+
+    def intervals(self, port, since=None, until=None, limit=100):
+        """Intervals on `port` overlapping [since, until], newest first, as dicts (`ended` None: still up)"""
+        until = time.time() if until is None else until
+        rows = self._query(
+            "SELECT section, key, label, detail, pid, started, ended, reason FROM intervals"
+            " WHERE port = ? AND started <= ? AND (ended IS NULL OR ended >= ?) ORDER BY started DESC LIMIT ?",
+            (int(port), until, since if since is not None else 0, limit)
+        )
+        names = ('section', 'key', 'label', 'detail', 'pid', 'started', 'ended', 'reason')
+        return [dict(zip(names, row)) for row in rows]
+
+    def at(self, port, when):
+        """What was on `port` at `when`"""
+        return self.intervals(port, when, when)
+
+    def uptime(self, port, since, until=None, section='servers'):
+        """Seconds up, starts and restarts of `section` on `port` between `since` and `until`
+
+        Downsampled data only counts whole days.
+        """
+        now = time.time()
+        until = now if until is None else until
+        # An interval still open was up until now if we're recording, else until the recorder was last seen
+        open_until = now if self._thread is not None else (self._last_seen() or now)
+
+        up_seconds = 0.0
+        starts = restarts = 0
+        rows = self._query(
+            "SELECT started, ended, reason FROM intervals"
+            " WHERE port = ? AND section = ? AND started <= ? AND (ended IS NULL OR ended >= ?)",
+            (int(port), section, until, since)
+        )
+        for started, ended, reason in rows:
+            ended = min(open_until, until) if ended is None else ended
+            up_seconds += max(0.0, min(ended, until) - max(started, since))
+            starts += started >= since
+            restarts += reason == 'restarted' and ended <= until
+
+        for day_up, day_starts, day_restarts in self._query(
+            "SELECT up_seconds, starts, restarts FROM daily WHERE port = ? AND section = ? AND day BETWEEN ? AND ?",
+            (int(port), section, _day(since), _day(until))
+        ):
+            up_seconds += day_up
+            starts += day_starts
+            restarts += day_restarts
+
+        window = max(until - since, 0)
+        return {
+            'port': int(port),
+            'section': section,
+            'since': since,
+            'until': until,
+            'up_seconds': round(min(up_seconds, window), 1),
+            'uptime': round(min(up_seconds / window, 1.0), 4) if window else None,
+            'starts': starts,
+            'restarts': restarts,
+        }
@@ -0,0 +1,67 @@
+"""
+Last-known snapshot - what the previous run saw, so the menu can be drawn before detection has run
+
+Only the records are kept (health and resources are meaningless a session
+later), and a loaded snapshot marks every section stale until the first
+live refresh replaces it. Reading it needs nothing beyond json and the model.
+"""
+
+import json
+import os
+import tempfile
+
+from localservers.model import Container, Server, Snapshot, Tunnel
+
+CACHE_VERSION = 1
+
+SECTIONS = (('servers', Server), ('tunnels', Tunnel), ('containers', Container))
+
+
+def save(snapshot, path):
+    """Write the snapshot's records to `path` atomically (best effort: it is only a cache)"""
+    data = {
+        'version': CACHE_VERSION,
+        'taken_at': snapshot.taken_at,
+        'categories': sorted(snapshot.categories),
+    }
+    for section, _ in SECTIONS:
+        data[section] = [record.to_dict() for record in getattr(snapshot, section)]
+
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        fd, temp = tempfile.mkstemp(prefix='.snapshot-', suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp, path)
+        except BaseException:
+            os.unlink(temp)
+            raise
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def load(path):
+    """The snapshot saved at `path`, every section stale, or None if there is none (or it can't be read)"""
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != CACHE_VERSION:
+            return None
+        records = {
+            section: tuple(record(**fields) for fields in data.get(section, ()))
+            for section, record in SECTIONS
+        }
+        return Snapshot(
+            generation=0,
+            taken_at=data['taken_at'],
+            categories=frozenset(data.get('categories', ())),
+            health={},
+            resources={},
+            process_table=None,
+            stale=frozenset(records),
+            **records
+        )
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        return None
@@ -0,0 +1,206 @@
+"""
+Listener sources - find TCP sockets in LISTEN state and the process owning them
+"""
+
+import ipaddress
+import os
+import re
+import subprocess
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+Listener = namedtuple('Listener', ['port', 'pid', 'command', 'address'])
+
+# TCP_LISTEN in include/net/tcp_states.h, as printed in /proc/net/tcp
+PROC_TCP_LISTEN = '0A'
+
+
+class ListenerSource(ABC):
+    """Base class for listener backends"""
+
+    name = 'base'
+
+    @abstractmethod
+    def available(self):
+        """Return True if this backend can run on this machine"""
+
+    @abstractmethod
+    def listeners(self):
+        """Return a list of Listeners, one per listening socket"""
+
+
+class LsofListenerSource(ListenerSource):
+    """Listeners from `lsof -iTCP -sTCP:LISTEN` (macOS and anything with lsof)"""
+
+    name = 'lsof'
+
+    def available(self):
+        return True
+
+    def listeners(self):
+        result = subprocess.run(
+            ['lsof', '-iTCP', '-sTCP:LISTEN', '-nP'],
+            capture_output=True,
+            text=True,
+            timeout=3
+        )
+
+        listeners = []
+        for line in result.stdout.split('\n')[1:]:
+            if not line.strip():
+                continue
+
+            parts = line.split()
+            if len(parts) < 9:
+                continue
+
+            address = parts[8]
+            port_match = re.search(r':(\d+)$', address)
+            if not port_match:
+                continue
+
+            listeners.append(Listener(int(port_match.group(1)), parts[1], parts[0], address))
+
+        return listeners
+
+
+class ProcNetListenerSource(ListenerSource):
+    """Listeners read straight from /proc/net/tcp{,6} on Linux, no subprocess"""
+
+    name = 'procfs'
+
+    def __init__(self, proc_root='/proc'):
+        self.proc_root = proc_root
+
+    def available(self):
+        return os.path.exists(os.path.join(self.proc_root, 'net', 'tcp'))
+
+    def listeners(self):
+        sockets = {}  # inode -> (port, address)
+        for table in ('tcp', 'tcp6'):
+            path = os.path.join(self.proc_root, 'net', table)
+            try:
+                with open(path, 'r') as f:
+                    sockets.update(self._parse_net_table(f))
+            except FileNotFoundError:
+                # No IPv6 support compiled in
+                if table == 'tcp':
+                    raise
+
+        owners = self._map_inodes_to_pids(set(sockets))
+
+        listeners = []
+        for inode, (port, address) in sockets.items():
+            owner = owners.get(inode)
+            if owner is None:
+                # Owned by a process we cannot inspect; lsof would not list it either
+                continue
+
+            pid, command = owner
+            listeners.append(Listener(port, pid, command, address))
+
+        return listeners
+
+    def _parse_net_table(self, lines):
+        """Yield (inode, (port, address)) for LISTEN rows of a /proc/net/tcp{,6} table"""
+        next(lines, None)  # header
+
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 10 or fields[3] != PROC_TCP_LISTEN:
+                continue
+
+            inode = fields[9]
+            if inode == '0':
+                continue
+
+            hex_addr, hex_port = fields[1].split(':')
+            port = int(hex_port, 16)
+            yield inode, (port, f"{self._decode_address(hex_addr)}:{port}")
+
+    def _decode_address(self, hex_addr):
+        """Turn the kernel's host-order hex address into a printable IP"""
+        if len(hex_addr) == 8:
+            return str(ipaddress.IPv4Address(bytes.fromhex(hex_addr)[::-1]))
+
+        # IPv6 is four host-order 32-bit words
+        raw = b''.join(bytes.fromhex(hex_addr[i:i + 8])[::-1] for i in range(0, 32, 8))
+        if raw == bytes(16):
+            return '*'
+        return f"[{ipaddress.IPv6Address(raw).compressed}]"
+
+    def _map_inodes_to_pids(self, inodes):
+        """Single pass over /proc/*/fd resolving socket inodes to (pid, command)"""
+        owners = {}
+        if not inodes:
+            return owners
+
+        remaining = set(inodes)
+        for entry in os.scandir(self.proc_root):
+            if not entry.name.isdigit():
+                continue
+
+            fd_dir = os.path.join(entry.path, 'fd')
+            try:
+                fds = os.listdir(fd_dir)
+            except OSError:
+                # Process exited or belongs to another user
+                continue
+
+            for fd in fds:
+                try:
+                    target = os.readlink(os.path.join(fd_dir, fd))
+                except OSError:
+                    continue
+
+                if not target.startswith('socket:['):
+                    continue
+
+                inode = target[8:-1]
+                if inode in remaining and inode not in owners:
+                    owners[inode] = (entry.name, self._read_comm(entry.path))
+                    remaining.discard(inode)
+
+            if not remaining:
+                break
+
+        return owners
+
+    def _read_comm(self, proc_dir):
+        try:
+            with open(os.path.join(proc_dir, 'comm'), 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return '?'
+
+
+class FallbackListenerSource(ListenerSource):
+    """Use the primary backend, falling back to the secondary one if it fails"""
+
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.name = primary.name
+
+    def available(self):
+        return self.primary.available() or self.fallback.available()
+
+    def listeners(self):
+        try:
+            return self.primary.listeners()
+        except OSError:
+            self.name = self.fallback.name
+            return self.fallback.listeners()
+
+
+def get_listener_source(backend='auto'):
+    """Pick the fastest listener backend for this machine, with lsof as the fallback"""
+    lsof = LsofListenerSource()
+    if backend == 'lsof':
+        return lsof
+
+    procfs = ProcNetListenerSource()
+    if procfs.available():
+        return FallbackListenerSource(procfs, lsof)
+
+    return lsof
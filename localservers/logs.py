@@ -0,0 +1,248 @@
+"""
+Log capture - managed servers' stdout/stderr into capped in-memory tails and rotating files
+
+One thread drains every server's pipes through a selector, with the pipes in
+non-blocking mode, so a chatty server never stalls on a full pipe and nothing
+waits on the UI. Each server keeps its last lines in a ring buffer capped by
+line count and bytes, and everything is appended to <port>.log, rotated by size.
+"""
+
+import os
+import selectors
+import threading
+import time
+from collections import deque
+
+READ_SIZE = 65536
+MAX_LINE = 4096   # bytes; longer lines are cut (and marked) so one line can't blow the cap
+
+
+class LogBuffer:
+    """Last lines of one server as (time, stream, text), capped by line count and total UTF-8 bytes"""
+
+    def __init__(self, max_lines=1000, max_bytes=256 * 1024):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self._lines = deque()
+        self._sizes = deque()  # bytes of each line, as read from the pipe
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def append(self, stream, text, size=None):
+        """Add a line; `size` is its length in bytes (encoded from `text` if not given)"""
+        if size is None:
+            size = len(text.encode('utf-8'))
+        with self._lock:
+            self._lines.append((time.time(), stream, text))
+            self._sizes.append(size)
+            self._bytes += size
+            while self._lines and (len(self._lines) > self.max_lines or self._bytes > self.max_bytes):
+                self._lines.popleft()
+                self._bytes -= self._sizes.popleft()
+
+    def tail(self, lines=50):
+        with self._lock:
+            count = min(max(int(lines), 0), len(self._lines))
+            return [self._lines[i] for i in range(len(self._lines) - count, len(self._lines))]
+
+    def __len__(self):
+        return len(self._lines)
+
+
+class RotatingFile:
+    """Append-only log file, rotated to .1 … .N once it grows past `max_bytes`"""
+
+    def __init__(self, path, max_bytes=1024 * 1024, backups=3):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._file = None
+        self._size = 0
+
+    def write(self, data):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), mode=0o700, exist_ok=True)
+            self._file = open(self.path, 'ab', buffering=0)
+            self._size = self._file.tell()
+        if self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._size += len(data)
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, 'ab', buffering=0)
+        self._size = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def tail_file(path, lines=50, block=8192):
+    """Last `lines` lines of a file, read backwards from the end in blocks"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            data = b''
+            while position > 0 and data.count(b'\n') <= lines:
+                step = min(block, position)
+                position -= step
+                f.seek(position)
+                data = f.read(step) + data
+    except OSError:
+        return []
+    return [line.decode('utf-8', 'replace') for line in data.splitlines()[-lines:]] if lines > 0 else []
+
+
+class _Pipe:
+    """Read end of one child stream, with the unfinished last line"""
+
+    def __init__(self, port, stream, fileobj):
+        self.port = port
+        self.stream = stream
+        self.fileobj = fileobj
+        self.partial = b''
+
+
+class LogCapture:
+    """Drains managed servers' pipes on one background thread into per-port buffers and files"""
+
+    def __init__(self, directory, max_lines=1000, max_bytes=256 * 1024, file_bytes=1024 * 1024, backups=3):
+        self.directory = directory
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.file_bytes = file_bytes
+        self.backups = backups
+        self._buffers = {}  # port -> LogBuffer
+        self._files = {}    # port -> RotatingFile
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+        self._pending = []  # pipes to register, handed over to the capture thread
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # mark() writes from other threads
+        self._thread = None
+        self._closed = False
+
+    def path(self, port):
+        return os.path.join(self.directory, f"{port}.log")
+
+    def attach(self, port, stdout=None, stderr=None):
+        """Capture a child's stdout/stderr (binary pipes) for `port`"""
+        port = str(port)
+        pipes = []
+        for stream, fileobj in (('out', stdout), ('err', stderr)):
+            if fileobj is not None:
+                os.set_blocking(fileobj.fileno(), False)
+                pipes.append(_Pipe(port, stream, fileobj))
+
+        with self._lock:
+            self._pending.extend(pipes)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='localservers-logs', daemon=True)
+                self._thread.start()
+        self._wake()
+
+    def mark(self, port, text):
+        """Add a line of our own (started, crashed, …) to the server's log"""
+        self._write(str(port), 'event', f"── {text} ──".encode('utf-8'))
+
+    def tail(self, port, lines=50):
+        """Last captured lines for `port` as dicts; falls back to the log file if nothing is in memory"""
+        buffer = self._buffers.get(str(port))
+        if buffer is not None and len(buffer):
+            return [
+                {'time': round(at, 3), 'stream': stream, 'text': text}
+                for at, stream, text in buffer.tail(lines)
+            ]
+        return [{'time': None, 'stream': None, 'text': text} for text in tail_file(self.path(port), lines)]
+
+    def close(self):
+        self._closed = True
+        self._wake()
+
+    def _wake(self):
+        try:
+            os.write(self._wakeup_w, b'\0')
+        except BlockingIOError:
+            pass  # already signalled
+
+    def _run(self):
+        while not self._closed:
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    try:
+                        while os.read(self._wakeup_r, READ_SIZE):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._drain(key.data)
+
+            with self._lock:
+                pending, self._pending = self._pending, []
+            for pipe in pending:
+                self._selector.register(pipe.fileobj, selectors.EVENT_READ, pipe)
+
+    def _drain(self, pipe):
+        while True:
+            try:
+                chunk = os.read(pipe.fileobj.fileno(), READ_SIZE)
+            except BlockingIOError:
+                return
+            except OSError:
+                chunk = b''
+
+            if not chunk:
+                # EOF: the child (and everything holding the pipe) exited
+                if pipe.partial:
+                    self._write(pipe.port, pipe.stream, pipe.partial)
+                self._selector.unregister(pipe.fileobj)
+                pipe.fileobj.close()
+                return
+
+            lines = (pipe.partial + chunk).split(b'\n')
+            pipe.partial = lines.pop()
+            for line in lines:
+                self._write(pipe.port, pipe.stream, line)
+            if len(pipe.partial) > MAX_LINE:
+                self._write(pipe.port, pipe.stream, pipe.partial)
+                pipe.partial = b''
+
+    def _write(self, port, stream, line):
+        if len(line) > MAX_LINE:
+            # Cut on a character boundary (not inside a UTF-8 sequence)
+            cut = MAX_LINE
+            while cut > 0 and line[cut] & 0xC0 == 0x80:
+                cut -= 1
+            line = line[:cut] + ' …'.encode('utf-8')
+        line = line.rstrip(b'\r')
+
+        with self._write_lock:
+            self._append(port, stream, line)
+
+    def _append(self, port, stream, line):
+        buffer = self._buffers.get(port)
+        if buffer is None:
+            buffer = self._buffers[port] = LogBuffer(self.max_lines, self.max_bytes)
+        buffer.append(stream, line.decode('utf-8', 'replace'), len(line))
+
+        file = self._files.get(port)
+        if file is None:
+            file = self._files[port] = RotatingFile(self.path(port), self.file_bytes, self.backups)
+        try:
+            file.write(line + b'\n')
+        except OSError:
+            pass  # disk full or log dir gone; the in-memory tail still works
@@ -0,0 +1,201 @@
+"""
+Instrumentation - per-source durations, subprocess spawns, timeouts, errors and freshness
+
+The collector times every source run and attributes work to the source
+running on the current thread: subprocesses are counted through an audit
+hook on `subprocess.Popen`, and detectors report the exceptions they
+swallow with `Metrics.error()`.
+"""
+
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+# Upper bounds in seconds, as Prometheus `le` labels
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+TIMEOUT_ERRORS = (subprocess.TimeoutExpired, socket.timeout, TimeoutError)
+
+_current = threading.local()
+_hook_installed = False
+_hook_lock = threading.Lock()
+
+
+def _audit(event, args):
+    if event == 'subprocess.Popen':
+        source = getattr(_current, 'source', None)
+        if source is not None:
+            source.spawns += 1
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count, Prometheus style"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the `fraction` quantile (inf past the last bucket)"""
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= rank:
+                return bound
+        return float('inf')
+
+
+class SourceMetrics:
+    """Counters for one collector source"""
+
+    def __init__(self, name):
+        self.name = name
+        self.durations = Histogram()
+        self.runs = 0
+        self.spawns = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.deadline_misses = 0
+        self.last_duration = None
+        self.last_success = None  # time.time()
+        self.last_error = None
+
+    def to_dict(self, now):
+        return {
+            'runs': self.runs,
+            'subprocesses': self.spawns,
+            'errors': self.errors,
+            'timeouts': self.timeouts,
+            'deadline_misses': self.deadline_misses,
+            'last_duration_ms': round(self.last_duration * 1000, 1) if self.last_duration is not None else None,
+            'mean_duration_ms': round(self.durations.sum / self.durations.count * 1000, 1) if self.durations.count else None,
+            'p90_duration_ms': _ms(self.durations.quantile(0.9)),
+            'last_success_age_s': round(now - self.last_success, 1) if self.last_success is not None else None,
+            'last_error': self.last_error,
+            'duration_buckets': {
+                str(bound): count for bound, count in zip(self.durations.buckets, self.durations.counts)
+            },
+        }
+
+
+def _ms(seconds):
+    # JSON has no infinity; past the last bucket is reported as unknown
+    if seconds is None or seconds == float('inf'):
+        return None
+    return round(seconds * 1000, 1)
+
+
+class Metrics:
+    """Registry of SourceMetrics, shared by the collector and the detectors"""
+
+    def __init__(self):
+        global _hook_installed
+        self._sources = {}
+        self._lock = threading.Lock()
+
+        # Audit hooks can't be removed, so one hook serves every registry
+        with _hook_lock:
+            if not _hook_installed:
+                sys.addaudithook(_audit)
+                _hook_installed = True
+
+    def source(self, name):
+        with self._lock:
+            if name not in self._sources:
+                self._sources[name] = SourceMetrics(name)
+            return self._sources[name]
+
+    def run(self, name, fn, *args):
+        """Call `fn(*args)` as source `name`: timed, with spawns and errors attributed to it"""
+        source = self.source(name)
+        previous = getattr(_current, 'source', None)
+        _current.source = source
+        failures = source.errors + source.timeouts
+        started = time.perf_counter()
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self._record_error(source, e)
+            raise
+        else:
+            # A run that reported a handled error through `error()` didn't succeed either
+            if source.errors + source.timeouts == failures:
+                source.last_success = time.time()
+            return result
+        finally:
+            source.last_duration = time.perf_counter() - started
+            source.durations.observe(source.last_duration)
+            source.runs += 1
+            _current.source = previous
+
+    def error(self, exc):
+        """Count an exception a detector handled, against the source running on this thread"""
+        source = getattr(_current, 'source', None)
+        if source is not None:
+            self._record_error(source, exc)
+
+    def deadline_missed(self, name):
+        self.source(name).deadline_misses += 1
+
+    def _record_error(self, source, exc):
+        if isinstance(exc, TIMEOUT_ERRORS):
+            source.timeouts += 1
+        else:
+            source.errors += 1
+        source.last_error = f"{type(exc).__name__}: {exc}"
+
+    def to_dict(self):
+        now = time.time()
+        with self._lock:
+            sources = dict(self._sources)
+        return {name: source.to_dict(now) for name, source in sorted(sources.items())}
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (0.0.4)"""
+        now = time.time()
+        with self._lock:
+            sources = sorted(self._sources.items())
+
+        lines = [
+            '# HELP localservers_source_duration_seconds Time taken by one run of a detection source.',
+            '# TYPE localservers_source_duration_seconds histogram',
+        ]
+        for name, source in sources:
+            histogram = source.durations
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'localservers_source_duration_seconds_bucket{{source="{name}",le="{bound}"}} {count}')
+            lines.append(f'localservers_source_duration_seconds_bucket{{source="{name}",le="+Inf"}} {histogram.count}')
+            lines.append(f'localservers_source_duration_seconds_sum{{source="{name}"}} {histogram.sum:.6f}')
+            lines.append(f'localservers_source_duration_seconds_count{{source="{name}"}} {histogram.count}')
+
+        counters = (
+            ('subprocesses', 'spawns', 'Subprocesses spawned by a source.'),
+            ('errors', 'errors', 'Errors raised or handled inside a source.'),
+            ('timeouts', 'timeouts', 'Subprocess and socket timeouts inside a source.'),
+            ('deadline_misses', 'deadline_misses', 'Runs that missed the refresh deadline.'),
+        )
+        for metric, attribute, help_text in counters:
+            lines.append(f'# HELP localservers_source_{metric}_total {help_text}')
+            lines.append(f'# TYPE localservers_source_{metric}_total counter')
+            for name, source in sources:
+                lines.append(f'localservers_source_{metric}_total{{source="{name}"}} {getattr(source, attribute)}')
+
+        lines.append('# HELP localservers_source_last_success_age_seconds Seconds since a source last succeeded.')
+        lines.append('# TYPE localservers_source_last_success_age_seconds gauge')
+        for name, source in sources:
+            if source.last_success is not None:
+                lines.append(f'localservers_source_last_success_age_seconds{{source="{name}"}} {now - source.last_success:.3f}')
+
+        return '\n'.join(lines) + '\n'
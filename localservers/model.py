@@ -0,0 +1,181 @@
+"""
+Snapshot model - immutable records for what detection found, and typed events between two snapshots
+
+Records are namedtuples (no per-instance dict, hashable, cheap to compare),
+with ports always as ints. `diff()` turns two snapshots into a list of
+Events, and `EventBus` hands each published snapshot's events to subscribers,
+so the menu, notifications and `--watch` don't each compare full lists.
+"""
+
+import threading
+from collections import namedtuple
+
+Snapshot = namedtuple('Snapshot', [
+    'generation',     # increases by one per finished refresh
+    'taken_at',       # time.time() when the refresh finished
+    'servers',        # tuple of Server records, by port
+    'categories',     # frozenset of categories seen
+    'tunnels',        # tuple of Tunnel records
+    'containers',     # tuple of Container records
+    'health',         # read-only {port: health dict} from the HTTP prober
+    'resources',      # read-only {pid: usage dict} from the CPU/RSS sampler
+    'process_table',  # ProcessTable the detectors ran against (None for the last-known snapshot)
+    'stale',          # frozenset of source names that missed the deadline or failed
+])
+
+
+class Server(namedtuple('Server', ['port', 'pid', 'type', 'category', 'command', 'managed', 'is_service'])):
+    """A listening process; `pid` is a string, as in the process table"""
+    __slots__ = ()
+    section = 'servers'
+
+    @property
+    def key(self):
+        return self.port
+
+    def to_dict(self):
+        return self._asdict()
+
+
+class Tunnel(namedtuple('Tunnel', ['type', 'hostname', 'port', 'display', 'service', 'pid', 'config'],
+                        defaults=(None, None, None))):
+    """A public hostname forwarded to a local port (None when it couldn't be read)"""
+    __slots__ = ()
+    section = 'tunnels'
+
+    @property
+    def key(self):
+        # One Tailscale host can funnel several ports
+        return (self.hostname, self.port)
+
+    def to_dict(self):
+        # cloudflared-only fields are left out for other tunnel types, as before
+        return {name: value for name, value in self._asdict().items() if value is not None or name == 'port'}
+
+
+class Container(namedtuple('Container', ['id', 'name', 'image', 'host_port', 'container_port', 'project'],
+                           defaults=(None,))):
+    """One published TCP port of a running Docker container (`project`: its Compose project, if any)"""
+    __slots__ = ()
+    section = 'containers'
+
+    @property
+    def key(self):
+        return (self.id, self.host_port)
+
+    def to_dict(self):
+        return self._asdict()
+
+
+def port_number(value):
+    """int port from an int or numeric string; None for anything else"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# section -> (appeared, disappeared, same key with another pid, same key otherwise changed)
+EVENT_KINDS = {
+    'servers': ('server_up', 'server_down', 'pid_changed', 'server_changed'),
+    'tunnels': ('tunnel_added', 'tunnel_removed', None, 'tunnel_changed'),
+    'containers': ('container_up', 'container_down', None, 'container_changed'),
+}
+
+
+class Event(namedtuple('Event', ['kind', 'key', 'old', 'new'])):
+    """One change between two snapshots; `old` is None for an arrival, `new` for a departure"""
+    __slots__ = ()
+
+    @property
+    def section(self):
+        return (self.new or self.old).section
+
+    def to_dict(self):
+        return {'event': self.kind, 'key': list(self.key) if isinstance(self.key, tuple) else self.key}
+
+
+def diff_records(section, old, new):
+    """Events turning the records `old` into `new` for one section"""
+    up, down, pid_changed, changed = EVENT_KINDS[section]
+    before = {record.key: record for record in old}
+    after = {record.key: record for record in new}
+
+    events = []
+    # New snapshot order (sorted by the detectors), then whatever disappeared
+    for key in list(after) + [key for key in before if key not in after]:
+        previous, current = before.get(key), after.get(key)
+        if previous is None:
+            events.append(Event(up, key, None, current))
+        elif current is None:
+            events.append(Event(down, key, previous, None))
+        elif previous != current:
+            if pid_changed and previous.pid != current.pid:
+                events.append(Event(pid_changed, key, previous, current))
+            else:
+                events.append(Event(changed, key, previous, current))
+    return events
+
+
+def diff(old, new):
+    """Events between two snapshots (`old` may be None: everything in `new` appeared)"""
+    events = []
+    for section in EVENT_KINDS:
+        before = getattr(old, section) if old is not None else ()
+        after = getattr(new, section)
+        if before != after:
+            events.extend(diff_records(section, before, after))
+    return events
+
+
+def changes_to_dict(events):
+    """Per-section added/removed/changed records (as dicts) for the `--watch` stream"""
+    changes = {}
+    for event in events:
+        kinds = EVENT_KINDS[event.section]
+        if event.kind == kinds[0]:
+            bucket, record = 'added', event.new
+        elif event.kind == kinds[1]:
+            bucket, record = 'removed', event.old
+        else:
+            bucket, record = 'changed', event.new
+        changes.setdefault(event.section, {}).setdefault(bucket, []).append(record.to_dict())
+    return changes
+
+
+class EventBus:
+    """Delivers each new snapshot's events to subscribers, on the publishing thread
+
+    `subscribe(callback, kinds=None)` calls `callback(events, snapshot)` for
+    every published snapshot, or with `kinds`, only with (and when there are)
+    events of those kinds. It returns a function that unsubscribes.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback, kinds=None):
+        subscriber = (callback, frozenset(kinds) if kinds is not None else None)
+        with self._lock:
+            self._subscribers.append(subscriber)
+
+        def unsubscribe():
+            with self._lock:
+                if subscriber in self._subscribers:
+                    self._subscribers.remove(subscriber)
+        return unsubscribe
+
+    def publish(self, events, snapshot):
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for callback, kinds in subscribers:
+            selected = events if kinds is None else [event for event in events if event.kind in kinds]
+            if kinds is not None and not selected:
+                continue
+            try:
+                callback(selected, snapshot)
+            except Exception:
+                # A broken subscriber must not stop the collector
+                pass
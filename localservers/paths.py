@@ -0,0 +1,12 @@
+"""
+Where LocalServers keeps its files (kept import-free so the menubar can start before detection loads)
+"""
+
+import os
+
+CONFIG_FILE = os.path.expanduser("~/.localservers.json")
+API_SOCKET = os.path.expanduser("~/.localservers.sock")
+LOG_DIR = os.path.expanduser("~/.localservers/logs")
+DISCOVERY_CACHE = os.path.expanduser("~/.localservers/discovery.json")
+SNAPSHOT_CACHE = os.path.expanduser("~/.localservers/snapshot.json")
+HISTORY_FILE = os.path.expanduser("~/.localservers/history.db")
@@ -0,0 +1,183 @@
+"""
+Preferences store - ~/.localservers.json, written behind and atomically, reloaded when edited elsewhere
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+# Bump when the file layout changes, and migrate older files in `_migrate`
+SCHEMA_VERSION = 1
+
+DEFAULTS = {
+    'show_categories': {},  # Dynamic: category -> bool
+    'managed_servers': {}    # port -> {dir, command, name}
+}
+
+
+def category_shown(prefs, category):
+    """Whether servers of `category` are shown (every category is, until filtered out)"""
+    return prefs.get('show_categories', {}).get(category, True)
+
+
+def _defaults():
+    return {key: dict(value) for key, value in DEFAULTS.items()}
+
+
+def _migrate(data):
+    """Preferences from a file of any schema version, without the version key"""
+    data = dict(data)
+    data.pop('version', 0)
+    # Version 0 (no "version" key) has the same layout as version 1
+    return data
+
+
+class PreferencesStore:
+    """The preferences dict, saved with a debounce and replaced on disk atomically
+
+    `prefs` is one dict for the life of the app (the detector and actions hold
+    it), so reloads update it in place. `save()` serialises at once but writes
+    `delay` seconds later, so a burst of changes is one write: a temp file in
+    the same directory, fsynced, then renamed over the old file. An external
+    edit is noticed by `reload_if_changed()` from the file's mtime, size and
+    inode, without reading it.
+
+    A write that fails (disk full, permissions) keeps the changes pending for
+    the next `save()` or `flush()`; behind-the-scenes writes report the error
+    through `metrics` (a Metrics, as source "preferences") when it is set.
+
+    A file from a newer schema version than this one is read as far as it is
+    understood but never overwritten: `read_only` is set and `save()` only
+    changes the values in memory, so a downgrade can't lose newer settings.
+    """
+
+    def __init__(self, path, delay=0.5):
+        self.path = path
+        self.delay = delay
+        self.prefs = _defaults()
+        self._stat = None      # (mtime_ns, size, inode) of the file as we last read or wrote it
+        self._pending = None   # serialised prefs waiting to be written
+        self._timer = None
+        self._damaged = False  # the file didn't parse; keep a copy before replacing it
+        self.read_only = False  # the file is from a newer version; leave it alone
+        self._lock = threading.Lock()
+        self.metrics = None
+        self.load()
+
+    def load(self):
+        """Read the file into `prefs`; a missing or unreadable file leaves the current values"""
+        try:
+            stat = os.stat(self.path)
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError):
+            # Keep what we have rather than falling back to defaults
+            self._damaged = True
+            return False
+        if not isinstance(data, dict):
+            self._damaged = True
+            return False
+
+        version = data.get('version', 0)
+        self.read_only = not isinstance(version, int) or version > SCHEMA_VERSION
+        fresh = {**_defaults(), **_migrate(data)}
+        # Key by key, so other threads never see the dict empty
+        self.prefs.update(fresh)
+        for key in [key for key in self.prefs if key not in fresh]:
+            del self.prefs[key]
+        self._stat = self._key(stat)
+        self._damaged = False
+        return True
+
+    def reload_if_changed(self):
+        """Re-read the file if something else changed it since we last read or wrote it"""
+        try:
+            stat = self._key(os.stat(self.path))
+        except OSError:
+            return False
+        with self._lock:
+            if stat == self._stat or self._pending is not None:
+                # Unchanged, or our own unsaved changes are about to replace it
+                return False
+        return self.load()
+
+    def save(self):
+        """Schedule a write of the current preferences (none while `read_only`)"""
+        if self.read_only:
+            return
+        data = json.dumps({'version': SCHEMA_VERSION, **self.prefs}, indent=2)
+        with self._lock:
+            self._pending = data
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._write_behind)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Write pending changes now (also called on quit)"""
+        with self._lock:
+            data, self._pending = self._pending, None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if data is None:
+                return
+            try:
+                self._write(data)
+            except BaseException:
+                # Still to be written: nothing can have been saved meanwhile, we hold the lock
+                self._pending = data
+                raise
+
+    def _write_behind(self):
+        """Timer thread: flush, leaving the changes pending if the write fails"""
+        try:
+            if self.metrics is not None:
+                self.metrics.run('preferences', self.flush)
+            else:
+                self.flush()
+        except OSError:
+            pass
+
+    def _write(self, data):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp = tempfile.mkstemp(prefix='.localservers-', suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(self.path):
+                os.chmod(temp, os.stat(self.path).st_mode & 0o777)
+                if self._damaged:
+                    # The user may want to recover what was in the file that didn't parse
+                    os.replace(self.path, f"{self.path}.corrupt")
+                    self._damaged = False
+            os.replace(temp, self.path)
+        except BaseException:
+            try:
+                os.unlink(temp)
+            except OSError:
+                pass
+            raise
+
+        # Make the rename itself durable
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            pass
+        else:
+            try:
+                os.fsync(dir_fd)
+            except OSError:
+                pass
+            finally:
+                os.close(dir_fd)
+        self._stat = self._key(os.stat(self.path))
+
+    @staticmethod
+    def _key(stat):
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
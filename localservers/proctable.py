@@ -0,0 +1,187 @@
+"""
+Process table - one snapshot of every process per refresh, queried in memory
+"""
+
+import os
+import subprocess
+from collections import namedtuple
+
+# start: opaque start time (clock ticks on Linux, `ps` lstart elsewhere); with pid it identifies one process lifetime
+Process = namedtuple('Process', ['pid', 'ppid', 'comm', 'args', 'start'])
+
+
+class ProcessTable:
+    """Immutable view of the process list with memoized parent/ancestry lookups"""
+
+    def __init__(self, processes, proc_root='/proc'):
+        self._processes = {p.pid: p for p in processes}
+        self._ancestors = {}
+        self._environ = {}
+        self._cwd = {}
+        # cwd and environ come from here on Linux, else from `lsof`/`ps`
+        self.proc_root = proc_root if os.path.isdir(os.path.join(proc_root, 'self')) else None
+
+    @classmethod
+    def snapshot(cls, proc_root='/proc'):
+        """Take a snapshot with a /proc read on Linux or a single `ps` call elsewhere"""
+        if os.path.isdir(os.path.join(proc_root, 'self')):
+            return cls(_read_proc(proc_root), proc_root)
+        return cls(_read_ps(), proc_root)
+
+    def __len__(self):
+        return len(self._processes)
+
+    def __contains__(self, pid):
+        return str(pid) in self._processes
+
+    def get(self, pid):
+        return self._processes.get(str(pid))
+
+    def processes(self):
+        return self._processes.values()
+
+    def parent(self, pid):
+        """Parent PID as a string, or None if unknown"""
+        process = self._processes.get(str(pid))
+        return process.ppid if process else None
+
+    def comm(self, pid):
+        process = self._processes.get(str(pid))
+        return process.comm if process else ''
+
+    def args(self, pid):
+        process = self._processes.get(str(pid))
+        return process.args if process else ''
+
+    def start(self, pid):
+        process = self._processes.get(str(pid))
+        return process.start if process else None
+
+    def cwd(self, pid):
+        """Working directory of a process (fetched lazily, once per PID), or '' if unknown"""
+        pid = str(pid)
+        if pid not in self._cwd:
+            self._cwd[pid] = _read_cwd(pid, self.proc_root)
+        return self._cwd[pid]
+
+    def ancestors(self, pid):
+        """Tuple of ancestor PIDs from the parent up to the root, memoized per PID"""
+        pid = str(pid)
+        chain = []
+        current = pid
+        seen = set()
+
+        while current not in self._ancestors:
+            ppid = self.parent(current)
+            if not ppid or ppid == '0' or ppid in seen:
+                self._ancestors[current] = ()
+                break
+            seen.add(current)
+            chain.append((current, ppid))
+            current = ppid
+
+        # Fill the memo from the top of the walk back down
+        for child, ppid in reversed(chain):
+            self._ancestors[child] = (ppid,) + self._ancestors[ppid]
+
+        return self._ancestors[pid]
+
+    def matching(self, *needles):
+        """Processes whose command line contains every needle"""
+        return [p for p in self._processes.values() if all(n in p.args for n in needles)]
+
+    def environ(self, pid):
+        """Environment of a process as a single string (fetched lazily, once per PID)"""
+        pid = str(pid)
+        if pid not in self._environ:
+            self._environ[pid] = _read_environ(pid, self.proc_root)
+        return self._environ[pid]
+
+
+def _read_proc(proc_root):
+    processes = []
+    for entry in os.scandir(proc_root):
+        if not entry.name.isdigit():
+            continue
+
+        try:
+            with open(os.path.join(entry.path, 'stat'), 'rb') as f:
+                stat = f.read().decode('utf-8', 'replace')
+            with open(os.path.join(entry.path, 'cmdline'), 'rb') as f:
+                cmdline = f.read()
+        except OSError:
+            # Process exited mid-scan
+            continue
+
+        # comm is parenthesised and may itself contain spaces or parens
+        comm = stat[stat.index('(') + 1:stat.rindex(')')]
+        fields = stat[stat.rindex(')') + 2:].split()
+        args = cmdline.rstrip(b'\0').replace(b'\0', b' ').decode('utf-8', 'replace')
+        processes.append(Process(entry.name, fields[1], comm, args or f"[{comm}]", fields[19]))
+
+    return processes
+
+
+def _read_ps():
+    # comm can contain spaces on macOS, so derive it from args rather than asking ps for it
+    result = subprocess.run(
+        ['ps', '-axww', '-o', 'pid=,ppid=,lstart=,args='],
+        capture_output=True,
+        text=True,
+        timeout=3
+    )
+
+    processes = []
+    for line in result.stdout.split('\n'):
+        # lstart is five words, e.g. "Mon Oct 13 09:12:01 2026"
+        parts = line.split(None, 7)
+        if len(parts) < 7:
+            continue
+
+        args = parts[7] if len(parts) > 7 else ''
+        comm = os.path.basename(args.split(' ', 1)[0]) if args else ''
+        processes.append(Process(parts[0], parts[1], comm, args, ' '.join(parts[2:7])))
+
+    return processes
+
+
+def _read_cwd(pid, proc_root):
+    if proc_root:
+        try:
+            return os.readlink(os.path.join(proc_root, pid, 'cwd'))
+        except OSError:
+            return ''
+
+    try:
+        result = subprocess.run(
+            ['lsof', '-a', '-p', pid, '-d', 'cwd', '-Fn'],
+            capture_output=True,
+            text=True,
+            timeout=1
+        )
+    except (OSError, subprocess.SubprocessError):
+        return ''
+    for line in result.stdout.split('\n'):
+        if line.startswith('n'):
+            return line[1:]
+    return ''
+
+
+def _read_environ(pid, proc_root):
+    if proc_root:
+        try:
+            with open(os.path.join(proc_root, pid, 'environ'), 'rb') as f:
+                return f.read().replace(b'\0', b' ').decode('utf-8', 'replace')
+        except OSError:
+            return ''
+
+    try:
+        result = subprocess.run(
+            ['ps', 'eww', '-o', 'command=', '-p', pid],
+            capture_output=True,
+            text=True,
+            timeout=1
+        )
+        return result.stdout
+    except (OSError, subprocess.SubprocessError):
+        return ''
@@ -0,0 +1,176 @@
+"""
+Resource sampling - CPU and RSS of every server process, batched per tick, with ring-buffer history
+"""
+
+import os
+import subprocess
+import time
+from array import array
+
+SPARK_BARS = "▁▂▃▄▅▆▇█"
+
+# Alert when RSS is above rss_mb, or CPU stays above cpu_percent for cpu_samples samples in a row
+DEFAULT_THRESHOLDS = {
+    'cpu_percent': 90,
+    'cpu_samples': 3,
+    'rss_mb': 1024,
+}
+
+
+class RingBuffer:
+    """Fixed-size ring of floats backed by one array (no per-sample objects)"""
+
+    def __init__(self, size):
+        self._data = array('d', bytes(8 * size))
+        self._size = size
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self._size
+        self._count = min(self._count + 1, self._size)
+
+    def last(self, n=None):
+        """The newest `n` values (default: all), oldest first"""
+        n = self._count if n is None else min(n, self._count)
+        start = (self._next - n) % self._size
+        if start + n <= self._size:
+            return self._data[start:start + n].tolist()
+        return self._data[start:].tolist() + self._data[:self._next].tolist()
+
+
+def sparkline(values):
+    """Tiny bar chart of `values` scaled to their own min/max"""
+    if not values:
+        return ""
+    low, high = min(values), max(values)
+    # Don't blow up noise: changes under 5% of the peak stay flat
+    span = max(high - low, abs(high) * 0.05) or 1
+    return "".join(SPARK_BARS[int((value - low) / span * (len(SPARK_BARS) - 1))] for value in values)
+
+
+class ProcessHistory:
+    """Ring buffers and the last raw CPU counters for one process"""
+
+    def __init__(self, size, start_time):
+        self.start_time = start_time  # detects PID reuse
+        self.cpu = RingBuffer(size)   # percent of one core
+        self.rss = RingBuffer(size)   # MB
+        self.ticks = None
+        self.sampled_at = None
+
+
+class ResourceSampler:
+    """One batched CPU/RSS pass over a set of PIDs per call
+
+    On Linux this reads /proc/<pid>/stat and statm (no subprocess); elsewhere
+    it is one `ps` call for all PIDs. Each PID keeps `history` samples.
+    """
+
+    def __init__(self, history=60, thresholds=None, proc_root='/proc'):
+        self.history = history
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.proc_root = proc_root
+        self.use_proc = os.path.isdir(os.path.join(proc_root, 'self'))
+        if self.use_proc:
+            self._clock_ticks = os.sysconf('SC_CLK_TCK')
+            self._page_mb = os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+        self._processes = {}  # pid -> ProcessHistory
+
+    def sample(self, pids):
+        """Sample every PID in `pids`; returns {pid: usage dict} for those still running"""
+        pids = {str(pid) for pid in pids}
+        now = time.monotonic()
+        readings = self._read_proc(pids) if self.use_proc else self._read_ps(pids)
+
+        # Forget processes that exited or are no longer listed
+        for pid in set(self._processes) - set(readings):
+            del self._processes[pid]
+
+        usage = {}
+        for pid, (start_time, ticks, cpu, rss_mb) in readings.items():
+            process = self._processes.get(pid)
+            if process is None or process.start_time != start_time:
+                process = self._processes[pid] = ProcessHistory(self.history, start_time)
+
+            if ticks is not None:
+                # /proc gives cumulative CPU ticks; the first sample only sets the baseline
+                if process.ticks is not None and now > process.sampled_at:
+                    cpu = (ticks - process.ticks) / self._clock_ticks / (now - process.sampled_at) * 100
+                process.ticks = ticks
+                process.sampled_at = now
+
+            if cpu is not None:
+                process.cpu.append(cpu)
+            process.rss.append(rss_mb)
+            usage[pid] = self._usage(process)
+
+        return usage
+
+    def _usage(self, process):
+        cpu = process.cpu.last()
+        rss = process.rss.last()
+
+        alerts = []
+        recent = cpu[-self.thresholds['cpu_samples']:]
+        if len(recent) == self.thresholds['cpu_samples'] and min(recent) > self.thresholds['cpu_percent']:
+            alerts.append('cpu')
+        if rss and rss[-1] > self.thresholds['rss_mb']:
+            alerts.append('rss')
+
+        return {
+            'cpu_percent': round(cpu[-1], 1) if cpu else None,
+            'rss_mb': round(rss[-1], 1),
+            'cpu_history': tuple(round(value, 1) for value in cpu),
+            'rss_history': tuple(round(value, 1) for value in rss),
+            'alerts': tuple(alerts),
+        }
+
+    def _read_proc(self, pids):
+        readings = {}
+        for pid in pids:
+            try:
+                with open(os.path.join(self.proc_root, pid, 'stat'), 'r') as f:
+                    stat = f.read()
+                with open(os.path.join(self.proc_root, pid, 'statm'), 'r') as f:
+                    resident = int(f.read().split()[1])
+            except (OSError, ValueError, IndexError):
+                # Exited between the listener scan and now
+                continue
+
+            # comm may contain spaces and parentheses; fields resume after the last ')'
+            fields = stat[stat.rfind(')') + 2:].split()
+            ticks = int(fields[11]) + int(fields[12])  # utime + stime
+            readings[pid] = (fields[19], ticks, None, resident * self._page_mb)
+        return readings
+
+    def _read_ps(self, pids):
+        if not pids:
+            return {}
+        try:
+            result = subprocess.run(
+                ['ps', '-o', 'pid=,lstart=,%cpu=,rss=', '-p', ','.join(sorted(pids))],
+                capture_output=True,
+                text=True,
+                timeout=3
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            return {}
+
+        # ps exits non-zero if any PID is gone; the rest are still printed
+        readings = {}
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if len(parts) < 8:
+                continue
+            # lstart is five words, e.g. "Mon Oct 13 09:12:01 2026"
+            pid, start_time, cpu, rss = parts[0], " ".join(parts[1:6]), parts[6], parts[7]
+            try:
+                readings[pid] = (start_time, None, float(cpu), int(rss) / 1024)
+            except ValueError:
+                continue
+        return readings
@@ -0,0 +1,69 @@
+"""
+Adaptive polling - per-source intervals that back off while nothing changes
+"""
+
+import threading
+import time
+
+# (base, maximum) seconds per source
+DEFAULT_INTERVALS = {
+    'servers': (2, 30),
+    'tunnels': (10, 120),
+    'containers': (5, 60),
+    'health': (5, 30),
+    'resources': (5, 30),
+}
+
+
+class AdaptiveInterval:
+    """Interval that doubles after every unchanged result and snaps back to base on a change"""
+
+    def __init__(self, base, maximum, factor=2):
+        self.base = base
+        self.maximum = max(base, maximum)
+        self.factor = factor
+        self.current = base
+
+    def next(self, changed):
+        if changed:
+            self.current = self.base
+        else:
+            self.current = min(self.current * self.factor, self.maximum)
+        return self.current
+
+    def reset(self):
+        self.current = self.base
+
+
+class Scheduler:
+    """Tracks when each source is next due"""
+
+    def __init__(self, intervals):
+        self.intervals = {name: AdaptiveInterval(base, maximum) for name, (base, maximum) in intervals.items()}
+        self._due = {name: 0 for name in self.intervals}
+        self._lock = threading.Lock()
+
+    def due(self, now=None):
+        """Names of the sources due at `now`"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return {name for name, due in self._due.items() if due <= now}
+
+    def wait_time(self, now=None):
+        """Seconds until the next source is due"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return max(0, min(self._due.values()) - now)
+
+    def done(self, name, changed, now=None):
+        """Record a finished poll and schedule the next one"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._due[name] = now + self.intervals[name].next(changed)
+
+    def poke(self, names=None):
+        """Make sources due now and tighten their intervals (after a user action or menu open)"""
+        with self._lock:
+            for name in names or self.intervals:
+                self.intervals[name].reset()
+                self._due[name] = 0
@@ -0,0 +1,347 @@
+"""
+Process supervisor - managed servers in their own process groups, restarted on crash, ready when the port is
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import threading
+import time
+
+LOOPBACK = ('127.0.0.1', '::1')
+
+
+def port_open(port, timeout=0.2):
+    """True if something accepts TCP connections on `port` on loopback"""
+    for host in LOOPBACK:
+        try:
+            with socket.create_connection((host, int(port)), timeout=timeout):
+                return True
+        except OSError:
+            continue
+    return False
+
+
+def wait_until(predicate, timeout, cancel=None, first=0.02, maximum=0.25):
+    """Poll `predicate` with a short, growing interval until it's true, `timeout` passes or `cancel` is set"""
+    deadline = time.monotonic() + timeout
+    delay = first
+    while True:
+        if predicate():
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or (cancel is not None and cancel.is_set()):
+            return False
+        if cancel is not None:
+            cancel.wait(min(delay, remaining))
+        else:
+            time.sleep(min(delay, remaining))
+        delay = min(delay * 2, maximum)
+
+
+def pid_alive(pid, group=False):
+    """True if the process (or any process in the group) still exists"""
+    try:
+        (os.killpg if group else os.kill)(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def wait_ports_closed(ports, timeout):
+    """Wait until none of `ports` accepts connections, polling them together; returns those still open"""
+    still_open = set(ports)
+
+    def closed():
+        still_open.difference_update([port for port in list(still_open) if not port_open(port)])
+        return not still_open
+
+    wait_until(closed, timeout)
+    return still_open
+
+
+def terminate_all(targets, grace=5):
+    """SIGTERM every target at once, wait for them together, then SIGKILL whichever outlive `grace` seconds
+
+    `targets` are (pid, group, gone) tuples: `group` signals the process group,
+    and `gone` (or None) overrides the liveness check, since our own children
+    stay zombies until reaped. Returns {pid: outcome}, the outcome being 'gone'
+    (exited before the signal), 'terminated', 'killed' or 'survived'.
+    """
+    outcomes = {}
+    pending = {}  # pid -> (kill, gone)
+    for pid, group, gone in targets:
+        pid = int(pid)
+        if pid in outcomes or pid in pending:
+            # One process listening on several ports
+            continue
+        kill = os.killpg if group else os.kill
+        try:
+            kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            outcomes[pid] = 'gone'
+            continue
+        pending[pid] = (kill, gone or (lambda pid=pid, group=group: not pid_alive(pid, group)))
+
+    def settled(outcome):
+        for pid in [pid for pid, (_, gone) in pending.items() if gone()]:
+            del pending[pid]
+            outcomes[pid] = outcome
+        return not pending
+
+    if not wait_until(lambda: settled('terminated'), grace):
+        for pid, (kill, _) in pending.items():
+            try:
+                kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        wait_until(lambda: settled('killed'), 2)
+
+    outcomes.update((pid, 'survived') for pid in pending)
+    return outcomes
+
+
+def terminate(pid, grace=5, group=False, gone=None):
+    """SIGTERM `pid` (or its process group), then SIGKILL if it's still alive after `grace` seconds
+
+    `gone` overrides the liveness check (our own children stay zombies until
+    reaped). Returns True once the process is gone.
+    """
+    return terminate_all([(pid, group, gone)], grace)[int(pid)] != 'survived'
+
+
+class ManagedProcess:
+    """One supervised server: its child handle, process group and restart state"""
+
+    def __init__(self, port, server):
+        self.port = str(port)
+        self.server = server
+        self.process = None
+        self.state = 'stopped'   # starting, ready, backoff, stopping, stopped, crashed
+        self.restarts = 0
+        self.backoff = 0
+        self.last_exit = None
+        self.error = None        # why the last spawn failed (e.g. the directory is gone)
+        self.started_at = None
+        self.ready = threading.Event()
+        self.wanted = False      # False once stop() is asked for; an exit is then not a crash
+        self.cancel = threading.Event()
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def to_dict(self):
+        return {
+            'port': self.port,
+            'pid': self.pid,
+            'state': self.state,
+            'restarts': self.restarts,
+            'last_exit': self.last_exit,
+            'error': self.error,
+        }
+
+
+class Supervisor:
+    """Starts managed servers, watches them, and restarts them with backoff when they crash
+
+    Each server runs in a new session (so its process group holds the shell and
+    everything it spawned), and a watcher thread per server waits on it. A
+    server is ready once its port accepts connections. `on_event(port, event)`
+    is called with 'started', 'ready', 'crashed', 'stopped', 'not_ready' and
+    'failed' (the command could not be spawned; it is not retried).
+    With `logs` (a LogCapture), the servers' stdout and stderr are captured
+    there instead of discarded.
+    """
+
+    def __init__(self, on_event=None, grace=5, ready_timeout=60, min_backoff=1, max_backoff=60, stable_after=60,
+                 logs=None):
+        self.on_event = on_event
+        self.logs = logs
+        self.grace = grace
+        self.ready_timeout = ready_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stable_after = stable_after
+        self._managed = {}  # port -> ManagedProcess
+        self._lock = threading.Lock()
+
+    def supervises(self, port):
+        managed = self._managed.get(str(port))
+        return managed is not None and managed.state != 'stopped'
+
+    def status(self, port=None):
+        """State of one supervised server, or of all of them"""
+        if port is not None:
+            managed = self._managed.get(str(port))
+            return managed.to_dict() if managed else None
+        return {port: managed.to_dict() for port, managed in self._managed.items()}
+
+    def start(self, port, server, wait=False, timeout=None):
+        """Start `server` ({'command', 'directory'}) for `port`; with `wait`, block until ready (returns readiness)"""
+        port = str(port)
+        with self._lock:
+            managed = self._managed.get(port)
+            if managed is not None and managed.state != 'stopped':
+                # Already running (or about to be restarted)
+                return managed.ready.wait(timeout or self.ready_timeout) if wait else True
+
+            managed = ManagedProcess(port, server)
+            managed.wanted = True
+            if not self._spawn(managed):
+                return False
+            self._managed[port] = managed
+
+        threading.Thread(target=self._watch, args=(managed,), name=f'localservers-supervise-{port}', daemon=True).start()
+        if wait:
+            return managed.ready.wait(timeout or self.ready_timeout)
+        return True
+
+    def stop(self, port, grace=None):
+        """SIGTERM the server's process group, SIGKILL after the grace period; returns True once it's gone"""
+        return self.stop_many([port], grace).get(str(port)) in ('gone', 'terminated', 'killed')
+
+    def stop_many(self, ports, grace=None, others=()):
+        """Stop several servers, and signal `others` ((pid, group, gone) targets), all at once
+
+        Returns terminate_all's {pid: outcome}, with supervised servers keyed by
+        port (as a string) instead of pid.
+        """
+        targets = {}
+        # Under the lock _watch respawns with, so a crashed server is either respawned before this
+        # (and its new process is the one signalled) or sees `wanted` cleared and stays down
+        with self._lock:
+            for port in ports:
+                managed = self._managed.get(str(port))
+                if managed is None or managed.process is None:
+                    continue
+                managed.wanted = False
+                managed.cancel.set()
+                managed.state = 'stopping'
+                process = managed.process
+                targets[managed.port] = (
+                    process.pid, True,
+                    lambda process=process: process.poll() is not None and not pid_alive(process.pid, group=True)
+                )
+
+        outcomes = terminate_all([*targets.values(), *others], self.grace if grace is None else grace)
+        with self._lock:
+            for port, (pid, _, _) in targets.items():
+                self._managed[port].state = 'stopped'
+                outcomes[port] = outcomes.pop(pid)
+        return outcomes
+
+    def wait_ready(self, ports, timeout=None):
+        """{port: ready} for servers started without waiting, waited on together under one deadline"""
+        deadline = time.monotonic() + (timeout or self.ready_timeout)
+        ready = {}
+        for port in ports:
+            managed = self._managed.get(str(port))
+            ready[str(port)] = managed is not None and managed.ready.wait(max(deadline - time.monotonic(), 0))
+        return ready
+
+    def restart(self, port, server=None, timeout=None):
+        """Stop (if running), wait for the port to be released, start again and wait until ready"""
+        port = str(port)
+        managed = self._managed.get(port)
+        server = server or (managed.server if managed else None)
+        if server is None:
+            return False
+
+        if managed is not None:
+            self.stop(port)
+        wait_ports_closed([port], self.grace)
+        return self.start(port, server, wait=True, timeout=timeout)
+
+    def _spawn(self, managed):
+        """Start the server's command; returns False (state 'stopped', 'failed' emitted) if it can't be spawned"""
+        managed.ready.clear()
+        managed.cancel.clear()
+        output = subprocess.PIPE if self.logs is not None else subprocess.DEVNULL
+        try:
+            process = subprocess.Popen(
+                managed.server['command'],
+                shell=True,
+                cwd=managed.server['directory'],
+                stdin=subprocess.DEVNULL,
+                stdout=output,
+                stderr=output,
+                start_new_session=True
+            )
+        except OSError as e:
+            managed.wanted = False
+            managed.state = 'stopped'
+            managed.error = str(e)
+            self._emit(managed, 'failed')
+            return False
+
+        managed.process = process
+        managed.error = None
+        managed.state = 'starting'
+        managed.started_at = time.monotonic()
+        if self.logs is not None:
+            self.logs.attach(managed.port, managed.process.stdout, managed.process.stderr)
+        self._emit(managed, 'started')
+        return True
+
+    def _watch(self, managed):
+        while True:
+            process = managed.process
+            became_ready = wait_until(
+                lambda: process.poll() is not None or port_open(managed.port),
+                self.ready_timeout,
+                cancel=managed.cancel
+            ) and process.poll() is None
+
+            if became_ready:
+                managed.state = 'ready'
+                managed.ready.set()
+                self._emit(managed, 'ready')
+            elif process.poll() is None and managed.wanted:
+                self._emit(managed, 'not_ready')
+
+            code = process.wait()
+            managed.last_exit = code
+            managed.ready.clear()
+
+            if not managed.wanted:
+                self._emit(managed, 'stopped')
+                return
+
+            # Crashed: back off exponentially, unless it had been up long enough to count as stable
+            if time.monotonic() - managed.started_at >= self.stable_after:
+                managed.backoff = 0
+            managed.backoff = min(max(managed.backoff * 2, self.min_backoff), self.max_backoff)
+            managed.state = 'crashed'
+            self._emit(managed, 'crashed')
+
+            managed.state = 'backoff'
+            if managed.cancel.wait(managed.backoff) or not managed.wanted:
+                managed.state = 'stopped'
+                return
+
+            with self._lock:
+                if not managed.wanted:
+                    managed.state = 'stopped'
+                    return
+                managed.restarts += 1
+                if not self._spawn(managed):
+                    return
+
+    def _emit(self, managed, event):
+        if self.logs is not None and event != 'ready':
+            if event in ('crashed', 'stopped'):
+                detail = f" (exit {managed.last_exit})"
+            elif event == 'failed':
+                detail = f": {managed.error}"
+            else:
+                detail = ''
+            self.logs.mark(managed.port, f"{event.replace('_', ' ')}{detail}")
+        if self.on_event is not None:
+            try:
+                self.on_event(managed.port, event)
+            except Exception:
+                pass
@@ -0,0 +1,88 @@
+"""
+Tailscale - cached status and structured funnel/serve config
+"""
+
+import json
+import subprocess
+from urllib.parse import urlsplit
+
+from localservers.cache import TTLCache
+
+
+def _run_json(command):
+    result = subprocess.run(
+        command,
+        capture_output=True,
+        text=True,
+        timeout=2
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"{command[0]} exited with {result.returncode}")
+    return json.loads(result.stdout or 'null') or {}
+
+
+def _local_port(target):
+    """Port of a serve target such as http://127.0.0.1:3000, localhost:3000 or 3000"""
+    target = str(target).strip()
+    if target.isdigit():
+        return int(target)
+    try:
+        return urlsplit(target if '://' in target else f'tcp://{target}').port
+    except ValueError:
+        return None
+
+
+class TailscaleClient:
+    """One `tailscale status --json` and one `tailscale serve status --json` per TTL, shared by all callers"""
+
+    def __init__(self, ttl=15):
+        self._status = TTLCache(lambda: _run_json(['tailscale', 'status', '--json']), ttl)
+        self._serve = TTLCache(lambda: _run_json(['tailscale', 'serve', 'status', '--json']), ttl)
+
+    def hostname(self):
+        """This device's MagicDNS name, or 'tailscale-device' if unknown"""
+        try:
+            return self._status.get().get('Self', {}).get('DNSName', '').rstrip('.') or 'tailscale-device'
+        except Exception:
+            return 'tailscale-device'
+
+    def serve_config(self):
+        """The serve config with any foreground (`tailscale funnel <port>`) sessions merged in"""
+        config = self._serve.get()
+        configs = [config] + list((config.get('Foreground') or {}).values())
+
+        merged = {'TCP': {}, 'Web': {}, 'AllowFunnel': {}}
+        for part in configs:
+            for section in merged:
+                merged[section].update(part.get(section) or {})
+        return merged
+
+    def funnels(self):
+        """List of (hostname, public_port, local_port) for every funnel-enabled endpoint"""
+        config = self.serve_config()
+
+        funnels = []
+        for host_port, enabled in config['AllowFunnel'].items():
+            if not enabled:
+                continue
+
+            hostname, _, public_port = host_port.rpartition(':')
+            if not public_port.isdigit():
+                continue
+            hostname = hostname or self.hostname()
+
+            targets = []
+            handlers = (config['Web'].get(host_port) or {}).get('Handlers') or {}
+            for handler in handlers.values():
+                if handler.get('Proxy'):
+                    targets.append(handler['Proxy'])
+
+            tcp = config['TCP'].get(public_port) or {}
+            if tcp.get('TCPForward'):
+                targets.append(tcp['TCPForward'])
+
+            local_ports = [p for p in (_local_port(t) for t in targets) if p]
+            for local_port in sorted(set(local_ports)) or [None]:
+                funnels.append((hostname, int(public_port), local_port))
+
+        return funnels
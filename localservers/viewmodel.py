@@ -0,0 +1,229 @@
+"""
+Menu view model - keyed rows built from a snapshot, grouped and capped for long lists, and the diff between two renders
+"""
+
+import time
+from collections import Counter, namedtuple
+
+from localservers.resources import sparkline
+
+# key: stable identity (port, hostname, container id + port)
+# label: the menu item title
+# data: everything the item's submenu is built from; a change here means rebuilding the item
+Row = namedtuple('Row', ['key', 'label', 'data'])
+
+# data of a row standing for several: a group (category, project, Compose project) or the "N more…" overflow
+Group = namedtuple('Group', ['name', 'rows'])
+
+# A section with more rows than this shows one submenu per group instead
+FLAT_LIMIT = 15
+# Rows per menu level; the rest go under "N more…", so no menu runs off the screen
+PAGE_LIMIT = 20
+
+# Health prober status -> badge ('not-http' ports get none)
+HEALTH_BADGES = {
+    'up': "🟢",
+    'slow': "🟡",
+    'erroring': "🔴",
+}
+
+
+def health_suffix(health):
+    """Label suffix such as ' 🟢 12 ms' or ' 🔴 502' for a port's health dict (or None)"""
+    if not health or health['status'] not in HEALTH_BADGES:
+        return ""
+
+    badge = HEALTH_BADGES[health['status']]
+    if health['status'] == 'erroring':
+        return f" {badge} {health['code']}" if health['code'] else f" {badge}"
+    return f" {badge} {health['p50_ms']} ms"
+
+
+def resource_suffix(usage):
+    """Label suffix such as ' · 4% 212 MB ▁▂▂▅' (with ⚠️ on an alert) for a process's usage dict (or None)"""
+    if not usage:
+        return ""
+
+    cpu = f"{usage['cpu_percent']:.0f}% " if usage['cpu_percent'] is not None else ""
+    trend = sparkline(usage['rss_history'][-8:])
+    alert = " ⚠️" if usage['alerts'] else ""
+    return f" · {cpu}{usage['rss_mb']:.0f} MB {trend}{alert}"
+
+
+def server_rows(servers, health=None, resources=None):
+    """One row per server, keyed by port"""
+    health = health or {}
+    resources = resources or {}
+    rows = []
+    for server in sorted(servers):
+        port = server.port
+
+        # Main item with badges
+        badges = []
+        if server.is_service:
+            badges.append("⚙️")  # Service/plist
+        else:
+            badges.append("💻")  # Terminal
+
+        if server.managed:
+            badges.append("⭐")  # Managed by LocalServers
+
+        badge_str = " ".join(badges)
+        label = f"  {badge_str} localhost:{port} ({server.type}){health_suffix(health.get(port))}"
+        label += resource_suffix(resources.get(server.pid))
+        rows.append(Row(port, label, (port, server.pid)))
+
+    return rows
+
+
+def tunnel_rows(tunnels):
+    """One row per tunnel, keyed by hostname (and port, since one Tailscale host can funnel several)"""
+    rows = []
+    for tunnel in sorted(tunnels, key=lambda t: (t.hostname, t.port or 0)):
+        data = (tunnel.type, tunnel.hostname, tunnel.port)
+        rows.append(Row(tunnel.key, f"  {tunnel.display}", data))
+
+    return rows
+
+
+def container_rows(containers, health=None):
+    """One row per published container port, keyed by container id and host port"""
+    health = health or {}
+    rows = []
+    for container in sorted(containers, key=lambda c: (c.host_port, c.id)):
+        label = f"  🐳 localhost:{container.host_port} ({container.image}){health_suffix(health.get(container.host_port))}"
+        data = (container.name, container.image, container.host_port, container.container_port, container.id)
+        rows.append(Row(container.key, label, data))
+
+    return rows
+
+
+def matches(text, *fields):
+    """True if every word of the filter `text` occurs in one of `fields` (case-insensitive)"""
+    haystack = " ".join(str(field) for field in fields if field is not None).lower()
+    return all(word in haystack for word in text.lower().split())
+
+
+def group_rows(rows, group_of, icon="📂"):
+    """One row per group, by name, holding its rows; `group_of` maps row keys to group names"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(group_of.get(row.key) or "Other", []).append(row)
+
+    return [
+        Row(('group', name), f"  {icon} {name} ({len(members)})", Group(name, tuple(members)))
+        for name, members in sorted(groups.items(), key=lambda item: item[0].lower())
+    ]
+
+
+def page(rows, limit=PAGE_LIMIT, icon=None):
+    """At most `limit` rows, the last one an "N more…" row holding the rest when there are too many"""
+    if len(rows) <= limit:
+        return list(rows)
+    rest = tuple(rows[limit - 1:])
+    label = f"  {icon} {len(rest)} more…" if icon else f"  {len(rest)} more…"
+    return list(rows[:limit - 1]) + [Row(('more', None), label, Group(None, rest))]
+
+
+def section_layout(rows, group_of, icon, flat_limit=FLAT_LIMIT):
+    """Top-level rows of a section: the rows themselves while there are few, else a capped list of groups
+
+    `icon` starts the group and overflow labels, which keeps them apart from
+    other sections' (menu items are keyed by title).
+    """
+    if len(rows) <= flat_limit:
+        return list(rows)
+    return page(group_rows(rows, group_of, icon), icon=icon)
+
+
+def diff_rows(old_rows, new_rows):
+    """Operations turning the rendered rows into the new ones
+
+    Returns a list of ('remove', key), ('insert', row, after_key),
+    ('replace', row, after_key) and ('relabel', row) tuples, removals first.
+    `after_key` is the key of the preceding row, or None for the first row.
+    Rows are expected in a stable sorted order so kept rows never move.
+    """
+    old = {row.key: row for row in old_rows}
+    new_keys = {row.key for row in new_rows}
+
+    ops = [('remove', key) for key in old if key not in new_keys]
+
+    after_key = None
+    for row in new_rows:
+        previous = old.get(row.key)
+        if previous is None:
+            ops.append(('insert', row, after_key))
+        elif previous.data != row.data:
+            ops.append(('replace', row, after_key))
+        elif previous.label != row.label:
+            ops.append(('relabel', row))
+        after_key = row.key
+
+    return ops
+
+
+# Bulk stop/restart outcome -> how it reads in the summary notification
+OUTCOME_TEXT = {
+    'stopped': "stopped",
+    'killed': "killed after the grace period",
+    'survived': "still running",
+    'port busy': "port still taken",
+    'not running': "not running",
+    'ready': "ready",
+    'not ready': "not ready",
+    'failed': "failed to start",
+    'not managed': "not managed (left running)",
+}
+
+
+def bulk_summary(action, results):
+    """(title, subtitle, message) of the one notification summing up a bulk stop or restart"""
+    if not results:
+        return (f"Nothing to {action}", "", "")
+
+    counts = Counter(results.values())
+    if action == 'stop':
+        title = f"Stopped {counts['stopped'] + counts['killed']} of {len(results)} servers"
+    else:
+        title = f"Restarted {counts['ready']} of {len(results)} servers"
+    subtitle = ", ".join(f"{count} {OUTCOME_TEXT[outcome]}" for outcome, count in counts.most_common())
+    problems = [
+        f":{port} {OUTCOME_TEXT[outcome]}" for port, outcome in sorted(results.items())
+        if outcome in ('survived', 'port busy', 'not ready', 'failed')
+    ]
+    return (title, subtitle, ", ".join(problems))
+
+
+def duration_text(seconds):
+    """'45s', '12m', '3h 05m' or '2d 4h'"""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m"
+    if seconds < 86400:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    return f"{seconds // 86400}d {seconds % 86400 // 3600}h"
+
+
+def history_lines(day, week, intervals, now):
+    """Uptime summary and one line per interval (newest first) for the History alert"""
+    if week['uptime'] is None or not (week['starts'] or intervals):
+        return ["Nothing recorded on this port in the last 7 days"]
+
+    lines = [
+        f"Up {day['uptime']:.0%} of the last 24 h, {week['uptime']:.0%} of 7 days",
+        f"{week['starts']} starts, {week['restarts']} restarts (new PID on the port) in 7 days",
+        "",
+    ]
+    for interval in intervals:
+        started = time.strftime('%a %H:%M', time.localtime(interval['started']))
+        if interval['ended'] is None:
+            span = f"{started} → now ({duration_text(now - interval['started'])})"
+        else:
+            ended = time.strftime('%H:%M', time.localtime(interval['ended']))
+            span = f"{started} → {ended} ({duration_text(interval['ended'] - interval['started'])}, {interval['reason']})"
+        pid = f" pid {interval['pid']}" if interval['pid'] else ""
+        lines.append(f"{span}  {interval['label']}{pid}")
+    return lines
@@ -0,0 +1,108 @@
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from localservers import actions
+from localservers.actions import ServerActions
+from localservers.model import Server, Snapshot
+
+LISTEN = "import socket, sys, time; s = socket.socket(); s.bind(('127.0.0.1', int(sys.argv[1]))); s.listen(); time.sleep(60)"
+
+
+class FakeCollector:
+    def __init__(self, *servers):
+        self.servers = servers
+
+    def latest(self):
+        return Snapshot(1, 0, tuple(self.servers), frozenset(), (), (), {}, {}, None, frozenset())
+
+    def refresh(self, names=None):
+        pass
+
+
+def server(port, pid='1', category='node', managed=False, is_service=False):
+    return Server(port, str(pid), 'Node.js', category, 'node server.js', managed, is_service)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def listen(port):
+    process = subprocess.Popen([sys.executable, '-c', LISTEN, str(port)])
+    # Reaped as soon as it exits, as a server that isn't our child would be; a zombie looks alive
+    threading.Thread(target=process.wait, daemon=True).start()
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(('127.0.0.1', port)) == 0:
+                return process
+        time.sleep(0.05)
+    process.kill()
+    pytest.fail("test server never listened")
+
+
+@pytest.fixture
+def make_actions(tmp_path, monkeypatch):
+    monkeypatch.setattr(actions, 'LOG_DIR', str(tmp_path / 'logs'))
+    created = []
+
+    def make(prefs, *servers):
+        created.append(ServerActions(prefs, FakeCollector(*servers), grace=2))
+        return created[-1]
+
+    yield make
+    for server_actions in created:
+        server_actions.supervisor.stop_many(list(server_actions.supervisor.status()))
+
+
+def test_ports_matching_leaves_out_unmanaged_services(make_actions):
+    prefs = {'managed_servers': {
+        '3000': {'command': 'npm start', 'group': 'shop'},
+        '3001': {'command': 'npm start', 'group': 'shop'},
+        '4000': {'command': 'npm start'},
+    }}
+    server_actions = make_actions(
+        prefs,
+        server(3000, category='node', managed=True),
+        server(5432, category='other', is_service=True),
+        server(5000, category='python', managed=True, is_service=True),
+        server(8080, category='node'),
+    )
+    assert server_actions.ports_matching() == [3000, 5000, 8080]
+    assert server_actions.ports_matching(category='node') == [3000, 8080]
+    assert server_actions.ports_matching(group='shop') == [3000, 3001]
+    assert server_actions.ports_matching(group='none') == []
+
+
+def test_stop_many_stops_together_and_reports_each_port(make_actions):
+    port, idle = free_port(), free_port()
+    process = listen(port)
+    try:
+        server_actions = make_actions({}, server(port, pid=process.pid))
+        assert server_actions.stop_many([port, idle]) == {port: 'stopped', idle: 'not running'}
+        assert process.wait(5) == -signal.SIGTERM
+        assert server_actions.recently_stopped(port)
+    finally:
+        process.kill()
+
+
+def test_restart_many_starts_managed_servers_only(make_actions, tmp_path):
+    port, unmanaged, broken = free_port(), free_port(), free_port()
+    prefs = {'managed_servers': {
+        str(port): {'command': f"{sys.executable} -c \"{LISTEN}\" {port}", 'directory': str(tmp_path)},
+        str(broken): {'command': 'true', 'directory': str(tmp_path / 'gone')},
+    }}
+    server_actions = make_actions(prefs)
+
+    results = server_actions.restart_many([port, unmanaged, broken])
+    assert results == {port: 'ready', unmanaged: 'not managed', broken: 'failed'}
+    assert server_actions.supervisor.status(port)['state'] == 'ready'
+    assert not server_actions.supervisor.supervises(broken)
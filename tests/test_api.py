@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+
+import pytest
+
+from localservers.api import QueryServer
+from localservers.collector import Collector
+from localservers.docker import UnixHTTPConnection
+from localservers.model import Server
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are length-limited, so not under pytest's tmp_path
+    directory = tempfile.mkdtemp(prefix='api-')
+    yield os.path.join(directory, 'api.sock')
+    shutil.rmtree(directory)
+
+
+@pytest.fixture
+def collector():
+    servers = (Server(3000, '100', 'Node.js', 'node', 'node server.js', False, False),)
+    collector = Collector({'servers': lambda context: {'servers': servers}})
+    collector.collect_once()
+    yield collector
+    collector.stop()
+
+
+def get(path, url):
+    connection = UnixHTTPConnection(path)
+    try:
+        connection.request('GET', url, headers={'Host': 'localhost'})
+        response = connection.getresponse()
+        return response.status, response.getheader('ETag'), response.read()
+    finally:
+        connection.close()
+
+
+def test_serves_the_snapshot_and_one_port(socket_path, collector):
+    server = QueryServer(collector, socket_path=socket_path).start()
+    try:
+        status, etag, body = get(socket_path, '/snapshot')
+        assert status == 200
+        assert etag == '"1"'
+        assert [s['port'] for s in json.loads(body)['servers']] == [3000]
+
+        status, _, body = get(socket_path, '/ports/3000')
+        assert json.loads(body)['servers'][0]['pid'] == '100'
+        assert get(socket_path, '/nothing')[0] == 404
+    finally:
+        server.stop()
+    assert not os.path.exists(socket_path)
+
+
+def test_a_stale_socket_file_is_replaced(socket_path, collector):
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(socket_path)
+    stale.close()   # the file stays, nobody listens
+
+    server = QueryServer(collector, socket_path=socket_path).start()
+    try:
+        assert get(socket_path, '/snapshot')[0] == 200
+    finally:
+        server.stop()
+
+
+def test_a_live_socket_is_left_to_its_owner(socket_path, collector):
+    first = QueryServer(collector, socket_path=socket_path).start()
+    try:
+        with pytest.raises(OSError):
+            QueryServer(collector, socket_path=socket_path)
+        assert os.path.exists(socket_path)
+        assert get(socket_path, '/snapshot')[0] == 200
+    finally:
+        first.stop()
@@ -0,0 +1,72 @@
+import subprocess
+import threading
+
+import pytest
+
+from localservers.cache import TTLCache
+from localservers.core import Detector
+from localservers.proctable import Process, ProcessTable
+
+
+def test_value_is_reused_within_the_ttl():
+    calls = []
+    cache = TTLCache(lambda: calls.append(1) or len(calls), ttl=60)
+    assert cache.get() == 1
+    assert cache.get() == 1
+
+    cache.invalidate()
+    assert cache.get() == 2
+
+
+def test_concurrent_misses_share_one_load():
+    release = threading.Event()
+    started = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'value'
+
+    cache = TTLCache(loader, ttl=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == ['value'] * 8
+    assert len(calls) == 1
+
+
+def test_failures_are_cached_for_the_ttl():
+    calls = []
+
+    def loader():
+        calls.append(1)
+        raise FileNotFoundError('tailscale')
+
+    cache = TTLCache(loader, ttl=60)
+    for _ in range(3):
+        with pytest.raises(FileNotFoundError):
+            cache.get()
+    assert len(calls) == 1
+
+
+def test_missing_tailscale_cli_is_not_an_error(tmp_path, monkeypatch):
+    def missing(*args, **kwargs):
+        raise FileNotFoundError(2, 'No such file or directory', 'tailscale')
+
+    monkeypatch.setattr(subprocess, 'run', missing)
+    detector = Detector({'health_checks': False})
+    table = ProcessTable([Process('10', '1', 'tailscaled', '/usr/sbin/tailscaled --state=mem:', '')], str(tmp_path))
+
+    for _ in range(2):
+        assert detector.metrics.run('tunnels', detector.detect_tunnels, table) == []
+    tunnels = detector.metrics.source('tunnels')
+    assert (tunnels.errors, tunnels.last_error) == (0, None)
+    assert tunnels.last_success is not None
@@ -0,0 +1,55 @@
+import itertools
+
+from localservers.classify import Classifier, compile_rules
+from localservers.proctable import Process, ProcessTable
+
+pids = itertools.count(100)
+
+
+def classify(classifier, args):
+    # A new pid each time, so no result comes from the per-process cache
+    pid = str(next(pids))
+    table = ProcessTable([Process(pid, '1', args.split()[0].rsplit('/', 1)[-1], args, '')], proc_root='/nonexistent')
+    return classifier.classify(pid, table)
+
+
+def test_builtin_rules_use_the_full_command_line():
+    classifier = Classifier()
+    assert classify(classifier, '/usr/bin/node /app/node_modules/.bin/next dev') == ('Next.js', 'nextjs')
+    assert classify(classifier, 'python3 manage.py runserver 8000') == ('Django', 'django')
+    assert classify(classifier, '/usr/local/bin/redis-server *:6379') == ('redis-server', 'other')
+
+
+def test_matching_ignores_case():
+    classifier = Classifier([{'name': 'Storybook', 'category': 'storybook', 'match': r'storybook\s+dev'}])
+    assert classify(classifier, '/usr/bin/Python3 app.py') == ('Python', 'python')
+    assert classify(classifier, 'node /app/node_modules/.bin/Storybook dev') == ('Storybook', 'storybook')
+
+
+def test_user_rules_go_first_and_invalid_ones_are_skipped():
+    classifier = Classifier([
+        {'name': 'Broken', 'match': r'node('},
+        {'name': 'Billing', 'category': 'node', 'match': r'node\s+server\.js'},
+        {'match': 'node'},
+    ])
+    assert [rule['name'] for rule in classifier.rules[:2]] == ['Billing', 'Next.js']
+    assert classify(classifier, 'node server.js') == ('Billing', 'node')
+
+
+def test_rules_with_groups_keep_their_own_numbering_and_order():
+    rules = [
+        {'name': 'Twice', 'match': r'--name=(\w+) --alias=\1\b'},
+        {'name': 'Named A', 'match': r'(?P<tool>alpha)'},
+        {'name': 'Named B', 'match': r'(?P<tool>beta)'},
+        {'name': 'Plain', 'match': r'alpha|gamma'},
+    ]
+    matchers, kept = compile_rules(rules)
+    assert [rule['name'] for rule in kept] == ['Twice', 'Named A', 'Named B', 'Plain']
+    # One regex per rule with groups, then one for the rest (defaults included)
+    assert [index for _, index in matchers] == [0, 1, 2, None]
+
+    classifier = Classifier(rules)
+    assert classify(classifier, 'svc --name=api --alias=api')[0] == 'Twice'
+    assert classify(classifier, 'svc --name=api --alias=web gamma')[0] == 'Plain'
+    assert classify(classifier, 'beta')[0] == 'Named B'
+    assert classify(classifier, 'alpha')[0] == 'Named A'
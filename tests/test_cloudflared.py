@@ -0,0 +1,65 @@
+import pytest
+
+from localservers import cloudflared
+from localservers.cloudflared import _parse_block_yaml, parse_config, parse_service
+
+CONFIG = """\
+# Tunnel for the dev box
+tunnel: 6ff42ae2-765d-4adf-8112-31c55c1551ef
+credentials-file: "/Users/me/.cloudflared/6ff42ae2.json"
+
+ingress:
+  - hostname: app.example.com
+    service: http://localhost:3000
+  - hostname: 'api.example.com'   # quoted
+    service: http://127.0.0.1:8080
+    path: /v1
+    originRequest:
+      noTLSVerify: true
+  - service: http_status:404
+"""
+
+
+@pytest.fixture
+def no_pyyaml(monkeypatch):
+    monkeypatch.setattr(cloudflared, '_yaml', False)
+
+
+def test_block_yaml_mappings_lists_and_scalars():
+    data = _parse_block_yaml(CONFIG)
+    assert data['tunnel'] == '6ff42ae2-765d-4adf-8112-31c55c1551ef'
+    assert data['credentials-file'] == '/Users/me/.cloudflared/6ff42ae2.json'
+    assert data['ingress'][0] == {'hostname': 'app.example.com', 'service': 'http://localhost:3000'}
+    assert data['ingress'][1] == {
+        'hostname': 'api.example.com',
+        'service': 'http://127.0.0.1:8080',
+        'path': '/v1',
+        'originRequest': {'noTLSVerify': True},
+    }
+    assert data['ingress'][2] == {'service': 'http_status:404'}
+
+
+def test_block_yaml_list_of_scalars_and_comments():
+    data = _parse_block_yaml("protocols:\n  - http2  # preferred\n  - quic\nretries: 3\nurl: 'a#b'\n")
+    assert data == {'protocols': ['http2', 'quic'], 'retries': 3, 'url': 'a#b'}
+
+
+def test_block_yaml_empty_document():
+    assert _parse_block_yaml("# nothing\n---\n") == {}
+
+
+def test_parse_config_without_pyyaml(no_pyyaml):
+    config = parse_config(CONFIG, '/tmp/config.yml')
+    assert config.tunnel == '6ff42ae2-765d-4adf-8112-31c55c1551ef'
+    assert [(rule.hostname, rule.host, rule.port) for rule in config.ingress] == [
+        ('app.example.com', 'localhost', 3000),
+        ('api.example.com', '127.0.0.1', 8080),
+        (None, None, None),
+    ]
+
+
+def test_parse_service():
+    assert parse_service('https://localhost') == ('https', 'localhost', 443)
+    assert parse_service('localhost:5432') == ('tcp', 'localhost', 5432)
+    assert parse_service('unix:/tmp/app.sock') == ('unix', '/tmp/app.sock', None)
+    assert parse_service('http_status:404') == ('http_status', None, None)
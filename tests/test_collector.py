@@ -0,0 +1,110 @@
+import threading
+
+from localservers.collector import Collector
+from localservers.metrics import Metrics
+from localservers.model import Server
+
+
+def server(port):
+    return Server(port, str(port), 'Node.js', 'node', 'node server.js', False, False)
+
+
+def test_derived_sources_see_this_refresh():
+    collector = Collector(
+        {'servers': lambda context: {'servers': (server(3000),)}},
+        derived={'resources': lambda fields: {'resources': {s.pid: {'port': s.port} for s in fields['servers']}}}
+    )
+    try:
+        snapshot = collector.collect_once()
+        assert dict(snapshot.resources['3000']) == {'port': 3000}
+    finally:
+        collector.stop()
+
+
+def test_only_the_named_sources_run():
+    probed = []
+    collector = Collector(
+        {'servers': lambda context: {'servers': (server(3000),)}},
+        derived={'health': lambda fields: probed.append(1) or {'health': {3000: {'status': 'up'}}}}
+    )
+    try:
+        snapshot = collector.collect_once(collector.names - {'health'})
+        assert probed == []
+        assert snapshot.health == {}
+    finally:
+        collector.stop()
+
+
+def test_prepare_only_runs_for_sources_that_need_it():
+    tables = []
+    collector = Collector(
+        {'servers': lambda context: {'servers': ()}, 'containers': lambda context: {'containers': ()}},
+        prepare=lambda: tables.append(1) or 'table',
+        needs_context={'servers'}
+    )
+    try:
+        collector.collect_once()
+        snapshot = collector.collect_once({'containers'})
+        assert len(tables) == 1
+        assert snapshot.process_table == 'table'
+    finally:
+        collector.stop()
+
+
+def test_a_source_past_the_deadline_keeps_its_previous_result():
+    release = threading.Event()
+    calls = []
+
+    def servers(context):
+        calls.append(1)
+        if len(calls) > 1:
+            release.wait(5)
+        return {'servers': (server(3000 + len(calls)),)}
+
+    metrics = Metrics()
+    collector = Collector({'servers': servers, 'containers': lambda context: {'containers': ()}},
+                          deadline=0.2, metrics=metrics)
+    try:
+        assert [s.port for s in collector.collect_once().servers] == [3001]
+
+        late = collector.collect_once()
+        assert late.stale == {'servers'}
+        assert [s.port for s in late.servers] == [3001]
+        assert metrics.source('servers').deadline_misses == 1
+
+        # Still stuck: not called again on top of the running call
+        collector.collect_once({'servers'})
+        assert len(calls) == 2
+
+        # Other sources don't clear it
+        assert collector.collect_once({'containers'}).stale == {'servers'}
+
+        # Once the stuck call finishes, the next refresh calls the source again
+        release.set()
+        collector._pending['servers'].result(5)
+        snapshot = collector.collect_once({'servers'})
+        assert snapshot.stale == frozenset()
+        assert [s.port for s in snapshot.servers] == [3003]
+    finally:
+        release.set()
+        collector.stop()
+
+
+def test_a_failing_source_is_stale_until_it_succeeds():
+    failing = [True]
+
+    def servers(context):
+        if failing[0]:
+            raise OSError("lsof went away")
+        return {'servers': (server(3000),)}
+
+    collector = Collector({'servers': servers})
+    try:
+        snapshot = collector.collect_once()
+        assert (snapshot.servers, snapshot.stale) == ((), {'servers'})
+
+        failing[0] = False
+        snapshot = collector.collect_once()
+        assert ([s.port for s in snapshot.servers], snapshot.stale) == ([3000], frozenset())
+    finally:
+        collector.stop()
@@ -0,0 +1,91 @@
+import json
+import os
+
+from localservers import discovery
+from localservers.discovery import ProjectScanner, classify_project, register, select
+
+
+def write(path, content=''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(content if isinstance(content, str) else json.dumps(content))
+
+
+def test_null_package_sections_are_empty(tmp_path):
+    write(str(tmp_path / 'package.json'), {'scripts': None, 'dependencies': None, 'devDependencies': ['x']})
+    assert classify_project(str(tmp_path), {'package.json'}) == ('Node.js', 'npm start', False)
+    assert classify_project(str(tmp_path), {'package.json'}, strict=True) == (None, None, False)
+
+
+def test_workspace_root_is_a_project_only_when_not_strict(tmp_path):
+    write(str(tmp_path / 'package.json'), {'workspaces': ['packages/*']})
+    assert classify_project(str(tmp_path), {'package.json'}, strict=True) == (None, None, True)
+    assert classify_project(str(tmp_path), {'package.json'}) == ('Node.js', 'npm start', True)
+
+
+def test_scan_finds_workspace_members_and_survives_bad_projects(tmp_path):
+    root = tmp_path / 'code'
+    write(str(root / 'mono' / 'package.json'), {'workspaces': ['apps/*']})
+    write(str(root / 'mono' / 'apps' / 'web' / 'package.json'), {'dependencies': {'next': '14'}})
+    write(str(root / 'broken' / 'package.json'), {'scripts': None})
+    write(str(root / 'api' / 'requirements.txt'))
+    write(str(root / 'api' / 'manage.py'))
+    write(str(root / 'node_modules' / 'dep' / 'package.json'), {'scripts': {'start': 'node .'}})
+
+    cache = str(tmp_path / 'cache' / 'discovery.json')
+    projects = ProjectScanner(cache).scan(str(root))
+    assert [(project['name'], project['type'], project['workspace']) for project in projects] == [
+        ('api', 'Django', None),
+        ('web', 'Next.js', str(root / 'mono')),
+    ]
+
+    # A second scan lists nothing again, and saving left no temp files behind
+    scanner = ProjectScanner(cache)
+    assert scanner.scan(str(root)) == projects
+    assert scanner.stats['listed'] == 0
+    assert os.listdir(os.path.dirname(cache)) == ['discovery.json']
+
+
+def test_scan_skips_a_project_that_fails(tmp_path, monkeypatch):
+    write(str(tmp_path / 'bad' / 'package.json'), {'scripts': {'dev': 'vite'}})
+    write(str(tmp_path / 'good' / 'go.mod'))
+    original = discovery.classify_project
+
+    def classify(directory, names, strict=False):
+        if directory.endswith('bad'):
+            raise RuntimeError("unexpected manifest")
+        return original(directory, names, strict)
+
+    monkeypatch.setattr(discovery, 'classify_project', classify)
+    assert [project['name'] for project in ProjectScanner().scan(str(tmp_path))] == ['good']
+
+
+def test_unsaveable_cache_leaves_no_temp_file(tmp_path):
+    cache = str(tmp_path / 'discovery.json')
+    scanner = ProjectScanner(cache)
+    scanner._cache = {'dir': {'mtime': object()}}
+    scanner._save()
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_register_skips_taken_ports_and_known_directories():
+    managed = {'3000': {'directory': '/code/old', 'command': 'npm start'}}
+    projects = [
+        {'directory': '/code/old', 'name': 'old', 'type': 'Node.js', 'command': 'npm start'},
+        {'directory': '/code/web', 'name': 'web', 'type': 'Next.js', 'command': 'npm run dev', 'workspace': '/code/mono'},
+        {'directory': '/code/api', 'name': 'api', 'type': 'Django', 'command': 'python manage.py runserver'},
+    ]
+    added = register(managed, projects, taken={3001, 8000})
+    assert added == {
+        '3002': {'directory': '/code/web', 'command': 'PORT=3002 npm run dev', 'type': 'Next.js',
+                 'name': 'mono/web', 'group': 'mono'},
+        '8001': {'directory': '/code/api', 'command': 'python manage.py runserver 8001', 'type': 'Django',
+                 'name': 'api'},
+    }
+    assert set(managed) == {'3000', '3002', '8001'}
+
+
+def test_select():
+    projects = ['a', 'b', 'c', 'd', 'e']
+    assert select(projects, 'all') == projects
+    assert select(projects, '1, 3-4,x,9') == ['a', 'c', 'd']
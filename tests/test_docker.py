@@ -0,0 +1,154 @@
+import json
+import os
+import queue
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from localservers.docker import DockerSource
+from localservers.model import Container
+
+
+def listed(container_id, name, public_port, private_port, project=None):
+    """A /containers/json entry publishing one TCP port on both address families"""
+    return {
+        'Id': container_id,
+        'Names': [f'/{name}'],
+        'Image': f'{name}:latest',
+        'Labels': {'com.docker.compose.project': project} if project else {},
+        'Ports': [
+            {'IP': '0.0.0.0', 'PrivatePort': private_port, 'PublicPort': public_port, 'Type': 'tcp'},
+            {'IP': '::', 'PrivatePort': private_port, 'PublicPort': public_port, 'Type': 'tcp'},
+            {'PrivatePort': 53, 'Type': 'udp'},
+        ],
+    }
+
+
+class FakeDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Engine API subset on a unix socket: /containers/json (with an id filter) and a streamed /events"""
+
+    daemon_threads = True
+
+    def __init__(self, path):
+        self.containers = {}
+        self.events = queue.Queue()
+        self.list_calls = 0
+        super().__init__(path, Handler)
+
+    def emit(self, container_id, action):
+        self.events.put({'Type': 'container', 'Action': action, 'id': container_id})
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/containers/json':
+            self.server.list_calls += 1
+            containers = list(self.server.containers.values())
+            filters = parse_qs(url.query).get('filters')
+            if filters:
+                wanted = json.loads(filters[0]).get('id', [])
+                containers = [c for c in containers if c['Id'] in wanted]
+            body = json.dumps(containers).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif url.path == '/events':
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.wfile.flush()
+            while True:
+                event = self.server.events.get()
+                if event is None:
+                    self.wfile.write(b'0\r\n\r\n')
+                    return
+                line = json.dumps(event).encode() + b'\n'
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+                self.wfile.flush()
+        else:
+            self.send_error(404)
+
+
+@pytest.fixture
+def daemon():
+    # Unix socket paths are short-lived and length-limited, so not under pytest's tmp_path
+    directory = tempfile.mkdtemp(prefix='docker-')
+    server = FakeDaemon(os.path.join(directory, 'docker.sock'))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.events.put(None)
+    server.shutdown()
+    server.server_close()
+    shutil.rmtree(directory)
+
+
+def eventually(check, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_seeds_from_one_list_call(daemon):
+    daemon.containers['a' * 64] = listed('a' * 64, 'web', 8080, 80, project='shop')
+    source = DockerSource(daemon.server_address)
+    try:
+        assert source.containers() == [Container('a' * 12, 'web', 'web', 8080, 80, 'shop')]
+        source.containers()
+        assert daemon.list_calls == 1
+    finally:
+        source.stop()
+
+
+def test_events_update_the_index(daemon):
+    source = DockerSource(daemon.server_address)
+    try:
+        assert source.containers() == []
+
+        daemon.containers['b' * 64] = listed('b' * 64, 'db', 5432, 5432)
+        daemon.emit('b' * 64, 'start')
+        assert eventually(lambda: [c.host_port for c in source.containers()] == [5432])
+
+        del daemon.containers['b' * 64]
+        daemon.emit('b' * 64, 'die')
+        assert eventually(lambda: source.containers() == [])
+    finally:
+        source.stop()
+
+
+def test_no_daemon_means_no_containers():
+    directory = tempfile.mkdtemp(prefix='docker-')
+    source = DockerSource(os.path.join(directory, 'missing.sock'), max_backoff=1)
+    try:
+        started = time.monotonic()
+        assert source.containers() == []
+        assert time.monotonic() - started < 2
+    finally:
+        source.stop()
+        shutil.rmtree(directory)
+
+
+def test_stop_ends_the_watcher_while_the_stream_is_idle(daemon):
+    source = DockerSource(daemon.server_address)
+    source.containers()
+    source.stop()
+    source._thread.join(2)
+    assert not source._thread.is_alive()
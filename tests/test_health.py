@@ -0,0 +1,79 @@
+import socket
+import threading
+
+import pytest
+
+from localservers.health import HealthProber
+
+RESPONSE = b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+
+
+class FakeServer:
+    """Answers each connection with the next of `replies` (None: hang up without a word), repeating the last"""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.sock = socket.socket()
+        self.sock.bind(('127.0.0.1', 0))
+        self.sock.listen()
+        self.port = self.sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            reply = self.replies.pop(0) if len(self.replies) > 1 else self.replies[0]
+            with conn:
+                if reply is not None:
+                    conn.recv(4096)
+                    conn.sendall(reply)
+
+    def close(self):
+        self.sock.close()
+
+
+@pytest.fixture
+def prober():
+    prober = HealthProber(timeout=1)
+    yield prober
+    prober.close()
+
+
+def test_http_server_is_up(prober):
+    server = FakeServer(RESPONSE)
+    try:
+        result = prober.probe([server.port])[server.port]
+    finally:
+        server.close()
+    assert (result['status'], result['code']) == ('up', 200)
+
+
+def test_fresh_connection_closed_without_response_is_not_http(prober):
+    server = FakeServer(None)
+    try:
+        result = prober.probe([server.port])[server.port]
+    finally:
+        server.close()
+    assert result['status'] == 'not-http'
+
+
+def test_garbage_reply_is_not_http(prober):
+    server = FakeServer(b"-ERR unknown command\r\n")
+    try:
+        result = prober.probe([server.port])[server.port]
+    finally:
+        server.close()
+    assert result['status'] == 'not-http'
+
+
+def test_http_server_hanging_up_is_erroring(prober):
+    server = FakeServer(RESPONSE, None)
+    try:
+        assert prober.probe([server.port])[server.port]['status'] == 'up'
+        result = prober.probe([server.port])[server.port]
+    finally:
+        server.close()
+    assert result['status'] == 'erroring'
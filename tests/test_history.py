@@ -0,0 +1,81 @@
+import sqlite3
+import time
+
+from localservers.core import Detector
+from localservers.history import History
+from localservers.listeners import Listener
+from localservers.model import Server, Snapshot, diff
+from localservers.proctable import Process, ProcessTable
+
+
+class FakeListeners:
+    def __init__(self, listeners):
+        self._listeners = listeners
+
+    def listeners(self):
+        return self._listeners
+
+
+def snapshot(generation, taken_at, *servers):
+    return Snapshot(generation, taken_at, tuple(servers), frozenset(server.category for server in servers),
+                    (), (), {}, {}, None, frozenset())
+
+
+def server(port, pid='100', category='Node'):
+    return Server(port, pid, 'Node', category, 'node server.js', False, False)
+
+
+def test_hidden_categories_are_still_detected(tmp_path):
+    detector = Detector({'show_categories': {'Node': False}, 'health_checks': False})
+    detector.listener_source = FakeListeners([Listener(3000, '100', 'node server.js', '127.0.0.1')])
+    table = ProcessTable([Process('100', '1', 'node', 'node server.js', '')], proc_root=str(tmp_path))
+
+    servers, categories = detector.detect_servers(table)
+
+    assert [server.port for server in servers] == [3000]
+    assert servers[0].category in categories
+
+
+def test_records_up_down_and_restart_intervals(tmp_path):
+    history = History(str(tmp_path / 'history' / 'ports.db'), flush_interval=0.05).start()
+    now = time.time()
+    steps = [
+        snapshot(1, now - 300, server(3000)),
+        snapshot(2, now - 200, server(3000, pid='200')),
+        snapshot(3, now - 100),
+    ]
+    previous = None
+    for step in steps:
+        history.record(diff(previous, step), step)
+        previous = step
+    history.close()
+
+    intervals = history.intervals(3000)
+    assert [(interval['pid'], interval['reason']) for interval in intervals] == [('200', 'down'), ('100', 'restarted')]
+    assert [interval['pid'] for interval in history.at(3000, now - 250)] == ['100']
+    assert history.at(3000, now - 50) == []
+
+    uptime = history.uptime(3000, now - 400, now)
+    assert uptime['up_seconds'] == 200
+    assert uptime['starts'] == 2
+    assert uptime['restarts'] == 1
+
+
+def test_old_intervals_fold_into_daily_totals(tmp_path):
+    path = str(tmp_path / 'ports.db')
+    history = History(path, flush_interval=0.05, raw_days=1, retention_interval=0)
+    connection = history._connect()
+    old = time.time() - 3 * 86400
+    with connection:
+        connection.execute(
+            "INSERT INTO intervals (section, key, port, label, detail, pid, started, ended, reason)"
+            " VALUES ('servers', '3000', 3000, 'Node', 'node', '100', ?, ?, 'down')",
+            (old, old + 60)
+        )
+    history._retain(connection)
+    connection.close()
+
+    with sqlite3.connect(path) as check:
+        assert check.execute("SELECT COUNT(*) FROM intervals").fetchone() == (0,)
+        assert check.execute("SELECT port, starts FROM daily").fetchall() == [(3000, 1)]
+    assert history.uptime(3000, old - 86400, time.time())['starts'] == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from localservers.listeners import FallbackListenerSource, ListenerSource, LsofListenerSource, ProcNetListenerSource
+
+TCP = """\
+  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode
+   0: 0100007F:0BB8 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 4242 1 0
+   1: 00000000:1F90 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 4343 1 0
+   2: 0100007F:0BB8 0100007F:D431 01 00000000:00000000 00:00000000 00000000  1000        0 4444 1 0
+   3: 00000000:1F91 00000000:0000 0A 00000000:00000000 00:00000000 00000000  1000        0 0 1 0
+"""
+
+
+@pytest.mark.parametrize('hex_addr, address', [
+    ('0100007F', '127.0.0.1'),
+    ('00000000', '0.0.0.0'),
+    ('0101A8C0', '192.168.1.1'),
+    ('00000000000000000000000000000000', '*'),
+    ('00000000000000000000000001000000', '[::1]'),
+    ('B80D0120000000000000000001000000', '[2001:db8::1]'),
+])
+def test_decode_address(hex_addr, address):
+    assert ProcNetListenerSource()._decode_address(hex_addr) == address
+
+
+def test_parse_net_table_keeps_listening_sockets_only():
+    rows = dict(ProcNetListenerSource()._parse_net_table(iter(TCP.splitlines())))
+    assert rows == {'4242': (3000, '127.0.0.1:3000'), '4343': (8080, '0.0.0.0:8080')}
+
+
+def test_procfs_listeners_are_mapped_to_their_processes(tmp_path):
+    (tmp_path / 'net').mkdir()
+    (tmp_path / 'net' / 'tcp').write_text(TCP)
+    process = tmp_path / '321'
+    (process / 'fd').mkdir(parents=True)
+    (process / 'comm').write_text('node\n')
+    (process / 'fd' / '7').symlink_to('socket:[4242]')
+    (process / 'fd' / '8').symlink_to('/dev/null')
+
+    source = ProcNetListenerSource(str(tmp_path))
+    assert source.available()
+    # 4343 belongs to no process we can see, so like lsof it isn't listed
+    assert [tuple(listener) for listener in source.listeners()] == [(3000, '321', 'node', '127.0.0.1:3000')]
+
+
+def test_backends_must_implement_the_interface():
+    class Partial(ListenerSource):
+        def available(self):
+            return True
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_fallback_is_used_when_the_primary_fails(tmp_path):
+    class Fixed(LsofListenerSource):
+        def listeners(self):
+            return ['from lsof']
+
+    source = FallbackListenerSource(ProcNetListenerSource(str(tmp_path)), Fixed())
+    assert source.listeners() == ['from lsof']
+    assert source.name == 'lsof'
@@ -0,0 +1,29 @@
+import os
+
+from localservers.logs import MAX_LINE, LogBuffer, LogCapture
+
+
+def test_buffer_is_capped_by_line_count():
+    buffer = LogBuffer(max_lines=3)
+    for n in range(5):
+        buffer.append('out', str(n))
+    assert [text for _, _, text in buffer.tail(10)] == ['2', '3', '4']
+
+
+def test_buffer_byte_cap_counts_encoded_bytes():
+    buffer = LogBuffer(max_bytes=12)
+    buffer.append('out', 'héllo')    # 6 bytes, 5 characters
+    buffer.append('out', 'wörld')    # 6 bytes
+    assert len(buffer) == 2
+    buffer.append('out', '✓')        # 3 bytes: over the cap, the oldest line goes
+    assert [text for _, _, text in buffer.tail(10)] == ['wörld', '✓']
+
+
+def test_long_lines_are_cut_on_a_character_boundary(tmp_path):
+    capture = LogCapture(str(tmp_path))
+    capture._write('3000', 'out', 'a'.encode() + 'é'.encode() * MAX_LINE)
+    text = capture.tail('3000', 1)[0]['text']
+    assert text.endswith(' …')
+    assert '�' not in text
+    assert len(text[:-2].encode('utf-8')) <= MAX_LINE
+    assert os.path.getsize(capture.path('3000')) <= MAX_LINE + 5
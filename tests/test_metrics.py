@@ -0,0 +1,49 @@
+import subprocess
+import sys
+
+import pytest
+
+from localservers.metrics import Metrics
+
+
+def test_successful_run_is_timed_and_fresh():
+    metrics = Metrics()
+    assert metrics.run('servers', lambda: 42) == 42
+    source = metrics.source('servers')
+    assert (source.runs, source.errors) == (1, 0)
+    assert source.last_success is not None
+    assert source.durations.count == 1
+
+
+def test_handled_error_is_not_a_success():
+    metrics = Metrics()
+    metrics.run('tunnels', lambda: metrics.error(ValueError("bad config")))
+    source = metrics.source('tunnels')
+    assert source.errors == 1
+    assert source.last_error == "ValueError: bad config"
+    assert source.last_success is None
+
+
+def test_handled_timeout_is_not_a_success():
+    metrics = Metrics()
+    metrics.run('tunnels', lambda: metrics.error(subprocess.TimeoutExpired('tailscale', 1)))
+    source = metrics.source('tunnels')
+    assert (source.errors, source.timeouts) == (0, 1)
+    assert source.last_success is None
+    metrics.run('tunnels', lambda: None)
+    assert source.last_success is not None
+
+
+def test_raised_error_is_counted_and_reraised():
+    metrics = Metrics()
+    with pytest.raises(KeyError):
+        metrics.run('containers', lambda: {}['missing'])
+    source = metrics.source('containers')
+    assert (source.runs, source.errors, source.last_success) == (1, 1, None)
+
+
+def test_spawns_are_attributed_to_the_running_source():
+    metrics = Metrics()
+    metrics.run('servers', subprocess.run, [sys.executable, '-c', 'pass'])
+    assert metrics.source('servers').spawns == 1
+    assert 'localservers_source_subprocesses_total{source="servers"} 1' in metrics.to_prometheus()
@@ -0,0 +1,48 @@
+from localservers.model import Container, Server, Snapshot, Tunnel, changes_to_dict, diff
+
+
+def snapshot(servers=(), tunnels=(), containers=()):
+    return Snapshot(
+        generation=1, taken_at=0, servers=tuple(servers), categories=frozenset(), tunnels=tuple(tunnels),
+        containers=tuple(containers), health={}, resources={}, process_table=None, stale=frozenset()
+    )
+
+
+def server(port, pid='100', command='node server.js'):
+    return Server(port, pid, 'Node.js', 'node', command, False, False)
+
+
+def test_everything_appears_against_no_snapshot():
+    new = snapshot(
+        [server(3000)],
+        [Tunnel('Cloudflare', 'app.example.com', 3000, 'app.example.com → :3000')],
+        [Container('abc', 'db', 'postgres', 5432, 5432)]
+    )
+    assert [(event.kind, event.key) for event in diff(None, new)] == [
+        ('server_up', 3000),
+        ('tunnel_added', ('app.example.com', 3000)),
+        ('container_up', ('abc', 5432)),
+    ]
+
+
+def test_unchanged_snapshots_have_no_events():
+    assert diff(snapshot([server(3000)]), snapshot([server(3000)])) == []
+
+
+def test_server_kinds():
+    old = snapshot([server(3000), server(4000), server(5000)])
+    new = snapshot([server(3000, pid='200'), server(5000, command='node other.js'), server(8080)])
+    events = {event.key: event for event in diff(old, new)}
+
+    assert events[3000].kind == 'pid_changed'
+    assert events[4000].kind == 'server_down'
+    assert events[4000].new is None
+    assert events[5000].kind == 'server_changed'
+    assert events[8080].kind == 'server_up'
+    assert events[8080].old is None
+
+
+def test_changes_to_dict_buckets_by_section():
+    changes = changes_to_dict(diff(snapshot([server(4000)]), snapshot([server(3000)])))
+    assert [record['port'] for record in changes['servers']['added']] == [3000]
+    assert [record['port'] for record in changes['servers']['removed']] == [4000]
@@ -0,0 +1,132 @@
+import json
+import os
+
+import pytest
+
+from localservers.metrics import Metrics
+from localservers.prefs import SCHEMA_VERSION, PreferencesStore
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / '.localservers.json')
+
+
+def leftovers(path):
+    return [name for name in os.listdir(os.path.dirname(path)) if name.startswith('.localservers-')]
+
+
+def test_missing_file_gives_defaults(path):
+    store = PreferencesStore(path)
+    assert store.prefs == {'show_categories': {}, 'managed_servers': {}}
+    assert not os.path.exists(path)
+
+
+def test_save_writes_after_the_delay_and_flush_writes_now(path):
+    store = PreferencesStore(path, delay=60)
+    store.prefs['managed_servers']['3000'] = {'directory': '/tmp/app', 'command': 'npm start'}
+    store.save()
+    assert not os.path.exists(path)
+
+    store.flush()
+    with open(path) as f:
+        data = json.load(f)
+    assert data['version'] == SCHEMA_VERSION
+    assert data['managed_servers']['3000']['command'] == 'npm start'
+    assert leftovers(path) == []
+
+
+def test_write_keeps_the_file_mode(path):
+    with open(path, 'w') as f:
+        json.dump({'managed_servers': {}}, f)
+    os.chmod(path, 0o600)
+
+    store = PreferencesStore(path)
+    store.save()
+    store.flush()
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+
+def test_failed_write_leaves_the_old_file(path, monkeypatch):
+    with open(path, 'w') as f:
+        json.dump({'managed_servers': {'3000': {'command': 'old'}}}, f)
+    store = PreferencesStore(path)
+    store.prefs['managed_servers']['3000']['command'] = 'new'
+    store.save()
+
+    def fail(*args):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(os, 'replace', fail)
+    with pytest.raises(OSError):
+        store._write(store._pending)
+
+    with open(path) as f:
+        assert json.load(f)['managed_servers']['3000']['command'] == 'old'
+    assert leftovers(path) == []
+
+
+def test_failed_write_behind_is_reported_and_retried(path, monkeypatch):
+    store = PreferencesStore(path)
+    store.metrics = Metrics()
+    store.prefs['health_checks'] = False
+    store.save()
+
+    real_replace = os.replace
+
+    def fail(*args):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(os, 'replace', fail)
+    store._timer.cancel()
+    store._write_behind()
+    assert not os.path.exists(path)
+    assert store.metrics.to_dict()['preferences']['errors'] == 1
+
+    monkeypatch.setattr(os, 'replace', real_replace)
+    store.flush()
+    with open(path) as f:
+        assert json.load(f)['health_checks'] is False
+
+
+def test_unparsable_file_is_kept_aside_before_replacing(path):
+    with open(path, 'w') as f:
+        f.write('{"managed_servers": ')
+    store = PreferencesStore(path)
+    assert store.prefs['managed_servers'] == {}
+
+    store.save()
+    store.flush()
+    with open(f"{path}.corrupt") as f:
+        assert f.read() == '{"managed_servers": '
+    with open(path) as f:
+        json.load(f)
+
+
+def test_external_edit_is_reloaded_into_the_same_dict(path):
+    store = PreferencesStore(path)
+    store.save()
+    store.flush()
+    prefs = store.prefs
+    assert not store.reload_if_changed()
+
+    with open(path, 'w') as f:
+        json.dump({'managed_servers': {'8080': {'command': 'go run .'}}, 'health_checks': False}, f)
+    assert store.reload_if_changed()
+    assert store.prefs is prefs
+    assert prefs['health_checks'] is False
+    assert '8080' in prefs['managed_servers']
+
+
+def test_file_from_a_newer_version_is_never_overwritten(path):
+    newer = {'version': SCHEMA_VERSION + 1, 'managed_servers': {'3000': {'command': 'npm start'}}, 'future': [1]}
+    with open(path, 'w') as f:
+        json.dump(newer, f)
+
+    store = PreferencesStore(path)
+    assert store.read_only
+    assert store.prefs['managed_servers']['3000']['command'] == 'npm start'
+
+    store.prefs['managed_servers'].clear()
+    store.save()
+    store.flush()
+    with open(path) as f:
+        assert json.load(f) == newer
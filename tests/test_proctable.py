@@ -0,0 +1,37 @@
+from localservers.proctable import Process, ProcessTable, _read_proc
+
+
+def table(*pairs, proc_root='/nonexistent'):
+    return ProcessTable([Process(pid, ppid, 'sh', 'sh', '') for pid, ppid in pairs], proc_root)
+
+
+def test_ancestors_walk_up_to_the_root():
+    processes = table(('1', '0'), ('50', '1'), ('60', '50'), ('70', '60'))
+    assert processes.ancestors('70') == ('60', '50', '1')
+    assert processes.ancestors(60) == ('50', '1')
+    assert processes.ancestors('1') == ()
+
+
+def test_ancestors_are_memoized_along_the_walk():
+    processes = table(('1', '0'), ('50', '1'), ('60', '50'))
+    processes.ancestors('60')
+    assert processes._ancestors == {'60': ('50', '1'), '50': ('1',), '1': ()}
+
+
+def test_ancestors_stop_at_unknown_parents_and_cycles():
+    assert table(('60', '50')).ancestors('60') == ('50',)
+    assert table(('60', '50')).ancestors('999') == ()
+    # A PID reused while the table was read can make a loop; the walk still ends
+    assert table(('60', '50'), ('50', '60')).ancestors('60') == ('50',)
+
+
+def test_read_proc_parses_comm_with_spaces_and_parens(tmp_path):
+    process = tmp_path / '42'
+    process.mkdir()
+    fields = ' '.join(['S', '7'] + ['0'] * 17 + ['12345'])
+    (process / 'stat').write_text(f"42 (my (odd) server) {fields}\n")
+    (process / 'cmdline').write_bytes(b'node\0server.js\0')
+    (tmp_path / 'self').mkdir()
+
+    assert _read_proc(str(tmp_path)) == [Process('42', '7', 'my (odd) server', 'node server.js', '12345')]
+    assert ProcessTable.snapshot(str(tmp_path)).parent('42') == '7'
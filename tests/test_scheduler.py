@@ -0,0 +1,51 @@
+from localservers.scheduler import AdaptiveInterval, Scheduler
+
+
+def test_interval_doubles_while_unchanged_up_to_the_maximum():
+    interval = AdaptiveInterval(2, 10)
+    assert [interval.next(False) for _ in range(4)] == [4, 8, 10, 10]
+
+
+def test_interval_snaps_back_on_change_and_reset():
+    interval = AdaptiveInterval(2, 30)
+    interval.next(False)
+    interval.next(False)
+    assert interval.next(True) == 2
+
+    interval.next(False)
+    interval.reset()
+    assert interval.current == 2
+
+
+def test_maximum_is_never_below_base():
+    interval = AdaptiveInterval(5, 1)
+    assert interval.next(False) == 5
+
+
+def test_everything_is_due_at_first():
+    scheduler = Scheduler({'servers': (2, 30), 'tunnels': (10, 120)})
+    assert scheduler.due(now=0) == {'servers', 'tunnels'}
+    assert scheduler.wait_time(now=0) == 0
+
+
+def test_done_schedules_the_next_poll():
+    scheduler = Scheduler({'servers': (2, 30), 'tunnels': (10, 120)})
+    scheduler.done('servers', changed=True, now=100)
+    scheduler.done('tunnels', changed=False, now=100)
+
+    assert scheduler.due(now=101) == set()
+    assert scheduler.wait_time(now=101) == 1
+    assert scheduler.due(now=102) == {'servers'}
+    assert scheduler.due(now=120) == {'servers', 'tunnels'}
+
+
+def test_poke_makes_sources_due_and_tightens_them():
+    scheduler = Scheduler({'servers': (2, 30), 'tunnels': (10, 120)})
+    for _ in range(3):
+        scheduler.done('servers', changed=False, now=0)
+    scheduler.done('tunnels', changed=False, now=0)
+
+    scheduler.poke(['servers'])
+    assert scheduler.due(now=1) == {'servers'}
+    scheduler.done('servers', changed=False, now=1)
+    assert scheduler.due(now=5) == {'servers'}
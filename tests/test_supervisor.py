@@ -0,0 +1,84 @@
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+from localservers.supervisor import Supervisor, terminate_all
+
+
+@pytest.fixture
+def events():
+    return []
+
+
+@pytest.fixture
+def supervisor(events):
+    supervisor = Supervisor(on_event=lambda port, event: events.append((port, event)), grace=2, min_backoff=0.05)
+    yield supervisor
+    supervisor.stop_many(list(supervisor.status()))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def eventually(check, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if check():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_a_server_that_cannot_be_spawned_is_not_left_starting(supervisor, events, tmp_path):
+    port = free_port()
+    server = {'command': 'true', 'directory': str(tmp_path / 'gone')}
+
+    assert supervisor.start(port, server) is False
+    assert (str(port), 'failed') in events
+    assert not supervisor.supervises(port)
+
+    # Fixed, it starts normally
+    os.mkdir(tmp_path / 'gone')
+    assert supervisor.start(port, server) is True
+    assert supervisor.status(port)['pid'] is not None
+
+
+def test_start_waits_until_the_port_accepts_connections(supervisor, events, tmp_path):
+    port = free_port()
+    command = f"{sys.executable} -m http.server {port} --bind 127.0.0.1"
+    assert supervisor.start(port, {'command': command, 'directory': str(tmp_path)}, wait=True, timeout=10)
+    assert supervisor.status(port)['state'] == 'ready'
+
+    assert supervisor.stop(port)
+    assert supervisor.status(port)['state'] == 'stopped'
+    assert [event for _, event in events] == ['started', 'ready', 'stopped']
+
+
+def test_a_crashing_server_is_restarted(supervisor, events, tmp_path):
+    port = free_port()
+    supervisor.start(port, {'command': 'exit 3', 'directory': str(tmp_path)})
+    assert eventually(lambda: supervisor.status(port)['restarts'] >= 2)
+    assert supervisor.status(port)['last_exit'] == 3
+    assert (str(port), 'crashed') in events
+
+
+def test_a_failed_respawn_stops_supervising(supervisor, events, tmp_path):
+    port = free_port()
+    directory = tmp_path / 'app'
+    directory.mkdir()
+    supervisor.start(port, {'command': 'sleep 0.2; exit 3', 'directory': str(directory)})
+    directory.rmdir()
+
+    assert eventually(lambda: (str(port), 'failed') in events)
+    assert supervisor.status(port)['state'] == 'stopped'
+    assert not supervisor.supervises(port)
+
+
+def test_terminate_all_reports_processes_already_gone():
+    assert terminate_all([(2 ** 22 + 12345, False, None)], grace=0.1) == {2 ** 22 + 12345: 'gone'}
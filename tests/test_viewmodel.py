@@ -0,0 +1,69 @@
+from localservers.viewmodel import Group, Row, bulk_summary, diff_rows, group_rows, page, section_layout
+
+
+def test_identical_rows_need_nothing():
+    rows = [Row(3000, "a", 1), Row(4000, "b", 2)]
+    assert diff_rows(rows, list(rows)) == []
+
+
+def test_removals_come_first_then_inserts_after_their_neighbour():
+    old = [Row(3000, "a", 1), Row(4000, "b", 2)]
+    new = [Row(3000, "a", 1), Row(3500, "c", 3)]
+    assert diff_rows(old, new) == [
+        ('remove', 4000),
+        ('insert', Row(3500, "c", 3), 3000),
+    ]
+
+
+def test_first_row_is_inserted_after_none():
+    assert diff_rows([Row(4000, "b", 2)], [Row(3000, "a", 1), Row(4000, "b", 2)]) == [
+        ('insert', Row(3000, "a", 1), None),
+    ]
+
+
+def test_data_change_replaces_and_label_change_relabels():
+    old = [Row(3000, "a", 1), Row(4000, "b", 2)]
+    new = [Row(3000, "a", 9), Row(4000, "b 🟢", 2)]
+    assert diff_rows(old, new) == [
+        ('replace', Row(3000, "a", 9), None),
+        ('relabel', Row(4000, "b 🟢", 2)),
+    ]
+
+
+def rows(count):
+    return [Row(3000 + i, f"server {i}", i) for i in range(count)]
+
+
+def test_group_rows_sorts_groups_by_name_and_keeps_row_order():
+    grouped = group_rows(rows(4), {3000: "web", 3001: "Api", 3003: "web"}, icon="🗂")
+    assert [row.key for row in grouped] == [('group', "Api"), ('group', "Other"), ('group', "web")]
+    assert grouped[2].label == "  🗂 web (2)"
+    assert [row.key for row in grouped[2].data.rows] == [3000, 3003]
+    assert grouped[1].data == Group("Other", (rows(4)[2],))
+
+
+def test_page_caps_rows_with_a_more_row_holding_the_rest():
+    assert page(rows(20), limit=20) == rows(20)
+
+    paged = page(rows(25), limit=20, icon="📡")
+    assert len(paged) == 20
+    assert paged[:19] == rows(19)
+    assert paged[-1].key == ('more', None)
+    assert paged[-1].label == "  📡 6 more…"
+    assert list(paged[-1].data.rows) == rows(25)[19:]
+
+
+def test_section_layout_groups_only_past_the_flat_limit():
+    assert section_layout(rows(15), {}, "📡") == rows(15)
+
+    layout = section_layout(rows(30), {3000 + i: f"group {i:02}" for i in range(30)}, "📡")
+    assert len(layout) == 20
+    assert layout[0].key == ('group', "group 00")
+    assert layout[-1].label == "  📡 11 more…"
+
+
+def test_bulk_summary_lists_servers_that_failed_to_start():
+    title, subtitle, message = bulk_summary('restart', {3000: 'ready', 3001: 'failed', 3002: 'not managed'})
+    assert title == "Restarted 1 of 3 servers"
+    assert "1 failed to start" in subtitle
+    assert message == ":3001 failed to start"